@@ -1,5 +1,6 @@
 from hwt.hdlObjects.operator import Operator
 from hwt.hdlObjects.operatorDefs import AllOps
+from hwt.hdlObjects.types.array import Array
 from hwt.hdlObjects.types.defs import BOOL, INT
 from hwt.hdlObjects.types.slice import Slice
 from hwt.hdlObjects.types.typeCast import toHVal
@@ -20,8 +21,13 @@ class ArrayVal(Value):
             size = size.val
 
         if val is None:
-            v = typeObj.elmType.fromPy(None)
-            elements = [v.clone() for _ in range(size)]
+            if isinstance(typeObj.elmType, Array):
+                # items of multidimensional arrays are updated in place
+                elements = [typeObj.elmType.fromPy(None) for _ in range(size)]
+            else:
+                # items are never modified in place (_setitem__val replaces them)
+                # invalid item can be shared
+                elements = [typeObj.elmType.fromPy(None), ] * size
         else:
             elements = []
             for v in val:
@@ -34,6 +40,13 @@ class ArrayVal(Value):
 
         return cls(elements, typeObj, int(val is not None))
 
+    def clone(self):
+        if isinstance(self._dtype.elmType, Array):
+            val = [v.clone() if isinstance(v, Value) else v for v in self.val]
+        else:
+            val = list(self.val)
+        return self.__class__(val, self._dtype, self.vldMask, self.updateTime)
+
     def _getitem__val(self, key):
         v = self.val[key.val].clone()
         if not key._isFullVld():
@@ -41,6 +54,13 @@ class ArrayVal(Value):
 
         return v
 
+    def _getitemRef__val(self, index):
+        """
+        :return: item on index (not a copy, used to update items
+            of multidimensional arrays)
+        """
+        return self.val[index.val]
+
     def __getitem__(self, key):
         iamVal = isinstance(self, Value)
         key = toHVal(key)
@@ -66,9 +86,14 @@ class ArrayVal(Value):
         if index._isFullVld():
             self.val[index.val] = value.clone()
         else:
-            for v in self.val:
+            # items can be shared with copies of this value,
+            # they are replaced by invalid copies
+            items = self.val
+            for i, v in enumerate(items):
+                v = v.clone()
                 v.vldMask = 0
                 v.updateTime = self.updateTime
+                items[i] = v
             self.vldMask = 0
 
     def __setitem__(self, index, value):
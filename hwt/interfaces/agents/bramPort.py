@@ -1,15 +1,19 @@
 from hwt.hdlObjects.constants import READ, WRITE, NOP
 from hwt.simulator.agentBase import SyncAgentBase
-from hwt.simulator.shortcuts import oscilate
+from hwt.simulator.agentQueue import agentQueueProperty
+from hwt.simulator.mmapMemory import MmapMemory
+from hwt.simulator.shortcuts import clockSource
 
 
 class BramPort_withoutClkAgent(SyncAgentBase):
     """
-    :ivar requests: list of tuples (request type, address, [write data]) - used for driver
+    :ivar requests: AgentQueue of tuples (request type, address, [write data]) - used for driver
     :ivar data: list of data in memory, used for monitor
     :ivar mem: if agent is in monitor mode (= is slave) all reads and writes are performed on
-        mem object
+        mem object (dict of Values or MmapMemory, see useMmapMemory)
     """
+    requests = agentQueueProperty("_requests")
+
     def __init__(self, intf):
         super().__init__(intf, allowNoReset=True)
 
@@ -19,7 +23,20 @@ class BramPort_withoutClkAgent(SyncAgentBase):
 
         self.mem = {}
         self.requireInit = True
-    
+
+    def useMmapMemory(self, fileName=None, size=None):
+        """
+        Replace mem dict by MmapMemory with word width and address space
+        taken from params of interface
+
+        :param fileName: optional file which backs the memory
+        :param size: number of words (whole address space if None,
+            see MmapMemory.forIntf)
+        :return: MmapMemory instance
+        """
+        self.mem = MmapMemory.forIntf(self.intf, fileName=fileName, size=size)
+        return self.mem
+
     def doReq(self, s, req):
         rw = req[0]
         addr = req[1]
@@ -64,21 +81,21 @@ class BramPort_withoutClkAgent(SyncAgentBase):
         yield s.updateComplete
         # now we are after clk edge
         if self.enable:
-            en = s.read(intf.en)
-            assert en.vldMask
-            if en.val:
-                we = s.read(intf.we)
-                assert we.vldMask
+            en, enVld = s.readRaw(intf.en)
+            assert enVld
+            if en:
+                we, weVld = s.readRaw(intf.we)
+                assert weVld
 
                 addr = s.read(intf.addr)
-                if we.val:
+                if we:
                     data = s.read(intf.din)
                     self.onWriteReq(s, addr, data)
                 else:
                     self.onReadReq(s, addr)
 
         if self.requests:
-            req = self.requests.pop(0)
+            req = self.requests.popleft()
             t = req[0]
             addr = req[1]
             assert addr._isFullVld(), s.now
@@ -90,6 +107,12 @@ class BramPort_withoutClkAgent(SyncAgentBase):
                 self.mem[addr.val] = req[2]
 
 
+    def isDrained(self):
+        return not self.requests and not self.readPending
+
+    def monitorProgress(self):
+        return len(self.readed)
+
     def driver(self, s):
         intf = self.intf
         if self.requireInit:
@@ -102,7 +125,7 @@ class BramPort_withoutClkAgent(SyncAgentBase):
         # now we are after clk edge
 
         if self.requests and self.enable:
-            req = self.requests.pop(0)
+            req = self.requests.popleft()
             if req is NOP:
                 s.w(0, intf.en)
                 s.w(0, intf.we)
@@ -128,5 +151,5 @@ class BramPortAgent(BramPort_withoutClkAgent):
 
     def getDrivers(self):
         drivers = super(BramPortAgent, self).getDrivers()
-        drivers.append(oscilate(self.intf.clk))
+        drivers.append(clockSource(self.intf.clk))
         return drivers
@@ -3,19 +3,22 @@ from hwt.simulator.agentBase import AgentBase
 
 
 class OscilatorAgent(AgentBase):
+    """
+    Simulation agent for clock interface, clock is generated
+    by native clock generator of simulator (ClockSource)
+
+    :ivar period: period of clock
+    :ivar initWait: delay of start of first period
+    :ivar dutyCycle: ratio of time of high level to period
+    """
     def __init__(self, intf, period=10 * Time.ns):
         super(OscilatorAgent, self).__init__(intf)
         self.period = period
         self.initWait = 0
-        
-    def driver(self, s):
-        sig = self.intf
-        s.write(False, sig)
-        halfPeriod = self.period / 2
-        yield s.wait(self.initWait)
+        self.dutyCycle = 0.5
 
-        while True:
-            yield s.wait(halfPeriod)
-            s.write(1, sig)
-            yield s.wait(halfPeriod)
-            s.write(0, sig)
+    def driver(self, s):
+        s.addClock(self.intf, self.period, phase=self.initWait,
+                   dutyCycle=self.dutyCycle)
+        return
+        yield
@@ -16,10 +16,10 @@ class FifoReaderAgent(SyncAgentBase):
             self.data.append(d)
             self.readPending = False
 
-        if s.r(self.rst_n).val and self.enable:
-            wait = s.r(intf.wait)
-            assert wait.vldMask
-            rd = not wait.val
+        if s.readRaw(self.rst_n)[0] and self.enable:
+            wait, waitVld = s.readRaw(intf.wait)
+            assert waitVld
+            rd = not wait
             s.w(rd, intf.en)
 
             if rd:
@@ -43,11 +43,11 @@ class FifoWriterAgent(SyncAgentBase):
     def driver(self, s):
         intf = self.intf
 
-        if s.r(self.rst_n).val and self.data and self.enable:
-            wait = s.r(intf.wait)
-            assert wait.vldMask
-            if not wait.val:
-                s.w(self.data.pop(0), intf.data)
+        if s.readRaw(self.rst_n)[0] and self.data and self.enable:
+            wait, waitVld = s.readRaw(intf.wait)
+            assert waitVld
+            if not wait:
+                s.w(self.data.popleft(), intf.data)
                 s.w(1, intf.en)
                 return
 
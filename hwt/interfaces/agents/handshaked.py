@@ -38,7 +38,7 @@ class HandshakedAgent(SyncAgentBase):
         """
         Collect data from interface
         """
-        if s.r(self.rst_n).val and self.enable:
+        if s.readRaw(self.rst_n)[0] and self.enable:
             # update rd signal only if required
             if self._lastRd is not 1:
                 s.w(1, self._rd)
@@ -55,10 +55,10 @@ class HandshakedAgent(SyncAgentBase):
             
             # wait for response of master
             yield s.updateComplete
-            vld = s.r(self._vld)
-            assert vld.vldMask, "valid signal for interface %r is in invalid state, this would cause desynchronization" % (self.intf)
+            vld, vldMask = s.readRaw(self._vld)
+            assert vldMask, "valid signal for interface %r is in invalid state, this would cause desynchronization" % (self.intf)
 
-            if vld.val:
+            if vld:
                 # master responded with positive ack, do read data
                 d = self.doRead(s)
                 if self._debugOutput is not None:
@@ -81,10 +81,13 @@ class HandshakedAgent(SyncAgentBase):
 
     def checkIfRdWillBeValid(self, s):
         yield s.updateComplete
-        rd = s.r(self._rd)
-        assert rd.vldMask, "ready signal for interface %r is in invalid state, this would cause desynchronization" % (self.intf)
+        _, rdVld = s.readRaw(self._rd)
+        assert rdVld, "ready signal for interface %r is in invalid state, this would cause desynchronization" % (self.intf)
 
 
+    def isDrained(self):
+        return not self.data and self.actualData is NOP
+
     def driver(self, s):
         """
         Push data to interface
@@ -94,7 +97,7 @@ class HandshakedAgent(SyncAgentBase):
         
         # pop new data if there are not any pending
         if self.actualData is NOP and self.data:
-            self.actualData = self.data.pop(0)
+            self.actualData = self.data.popleft()
 
         doSend = self.actualData is not NOP
         
@@ -106,7 +109,7 @@ class HandshakedAgent(SyncAgentBase):
                 self.doWrite(s, None)
             self._lastWritten = self.actualData
 
-        en = s.r(self.rst_n).val and self.enable
+        en = s.readRaw(self.rst_n)[0] and self.enable
         vld = int(en and doSend)
         if self._lastVld is not vld:
             s.w(vld, self._vld)
@@ -122,12 +125,12 @@ class HandshakedAgent(SyncAgentBase):
         # wait of response of slave
         yield s.updateComplete
 
-        rd = s.r(self._rd)
-        assert rd.vldMask, "ready signal for interface %r is in invalid state, this would cause desynchronization" % (self.intf)
+        rd, rdVld = s.readRaw(self._rd)
+        assert rdVld, "ready signal for interface %r is in invalid state, this would cause desynchronization" % (self.intf)
         if not vld:
             return
 
-        if rd.val:
+        if rd:
             # slave did read data, take new one 
             if self._debugOutput is not None:
                 self._debugOutput.write("%s, wrote, %d: %r\n" % (
@@ -135,7 +138,7 @@ class HandshakedAgent(SyncAgentBase):
             
             # pop new data, because actual was read by slave
             if self.data:
-                self.actualData = self.data.pop(0)
+                self.actualData = self.data.popleft()
             else:
                 self.actualData = NOP
 
@@ -34,10 +34,13 @@ class RdSyncedAgent(SyncAgentBase):
         """write data to interface"""
         s.w(data, self.intf.data)
 
+    def isDrained(self):
+        return not self.data and self.actualData is NOP
+
     def driver(self, s):
         """Push data to interface"""
         if self.actualData is NOP and self.data:
-            self.actualData = self.data.pop(0)
+            self.actualData = self.data.popleft()
 
         do = self.actualData is not NOP
 
@@ -46,20 +49,20 @@ class RdSyncedAgent(SyncAgentBase):
         else:
             self.doWrite(s, None)
 
-        en = s.r(self.rst_n).val and self.enable
+        en = s.readRaw(self.rst_n)[0] and self.enable
         if not (en and do):
             return
 
         yield s.updateComplete
 
-        rd = s.r(self._rd)
+        rd, rdVld = s.readRaw(self._rd)
         if en:
-            assert rd.vldMask, "%r: ready signal for interface %r is in invalid state, this would cause desynchronization" % (s.now, self.intf)
-        if rd.val:
+            assert rdVld, "%r: ready signal for interface %r is in invalid state, this would cause desynchronization" % (s.now, self.intf)
+        if rd:
             if self._debugOutput is not None:
                 self._debugOutput.write("%s, wrote, %d: %r\n" % (
                                            self.intf._getFullName(), s.now, self.actualData))
             if self.data:
-                self.actualData = self.data.pop(0)
+                self.actualData = self.data.popleft()
             else:
                 self.actualData = NOP
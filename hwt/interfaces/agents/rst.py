@@ -5,12 +5,14 @@ from hwt.simulator.shortcuts import pullUpAfter, pullDownAfter
 
 class PullUpAgent(AgentBase):
     def __init__(self, intf, intDelay=6 * Time.ns):
+        AgentBase.__init__(self, intf)
         self.intDelay = intDelay
         self.data = []
         self.driver = pullUpAfter(intf, intDelay=intDelay)
         
 class PullDownAgent(AgentBase):
     def __init__(self, intf, intDelay=6 * Time.ns):
+        AgentBase.__init__(self, intf)
         self.intDelay = intDelay
         self.data = []
         self.driver = pullDownAfter(intf, intDelay=intDelay)
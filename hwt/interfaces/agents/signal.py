@@ -43,17 +43,13 @@ class SignalAgent(AgentBase):
             # clk tick
             while True:
                 if self.data:
-                    try:
-                        d = self.data.pop(0)
-                    except AttributeError:
-                        d = next(self.data)
-                    self.doWrite(s, d)
+                    self.doWrite(s, self.data.popleft())
                 yield s.wait(self.delay)
         else:
             # if clock is specified this function is periodicaly called every
             # clk tick
             if self.data:
-                self.doWrite(s, self.data.pop(0))
+                self.doWrite(s, self.data.popleft())
 
     def monitor(self, s):
         if self.clk is None:
@@ -17,9 +17,9 @@ class VldSyncedAgent(SyncAgentBase):
         intf = self.intf
         yield s.updateComplete
         if self.enable and self.notReset(s):
-            vld = s.r(intf.vld)
-            assert vld.vldMask, "valid signal for interface %r is in invalid state, this would cause desynchronization in %d" % (self.intf, s.now)
-            if vld.val:
+            vld, vldMask = s.readRaw(intf.vld)
+            assert vldMask, "valid signal for interface %r is in invalid state, this would cause desynchronization in %d" % (self.intf, s.now)
+            if vld:
                 d = self.doRead(s)
 
                 if self._debugOutput is not None:
@@ -31,7 +31,7 @@ class VldSyncedAgent(SyncAgentBase):
         intf = self.intf
 
         if self.enable and self.data and self.notReset(s):
-            d = self.data.pop(0)
+            d = self.data.popleft()
             if d is NOP:
                 self.doWrite(s, None)
                 s.w(0, intf.vld)
@@ -0,0 +1,37 @@
+from hwt.serializer.simModel.intSerializer import SimModelIntSerializer
+from hwt.serializer.simModel.serializer import SimModelSerializer
+
+
+class SimModelSerializer_direct():
+    """
+    Serializer mixin for models where processes are plain functions
+    which write their outputs to next-value slots of signals
+    (SimSignal.simDrive) instead of generators which yield tuples
+    (dst, val, isEvDependent)
+
+    Simulator commits written slots in single pass, there is no generator,
+    set of actions and value updater created for each evaluation of process.
+    """
+    _directWrite = True
+
+    @classmethod
+    def driveStm(cls, indentStr, dstName, val, ev, indexes=None):
+        if indexes is None:
+            return "%sself.%s.simDrive(sim, %s, %s)" % (indentStr, dstName, val, ev)
+        else:
+            return "%sself.%s.simDrive(sim, %s, %s, (%s,))" % (
+                indentStr, dstName, val, ev, indexes)
+
+
+class SimModelDirectSerializer(SimModelSerializer_direct, SimModelSerializer):
+    """
+    SimModelSerializer with direct-write process ABI
+    """
+    pass
+
+
+class SimModelIntDirectSerializer(SimModelSerializer_direct, SimModelIntSerializer):
+    """
+    SimModelIntSerializer with direct-write process ABI
+    """
+    pass
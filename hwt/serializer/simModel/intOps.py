@@ -0,0 +1,364 @@
+from hwt.bitmask import mask
+from hwt.hdlObjects.operator import Operator
+from hwt.hdlObjects.operatorDefs import AllOps
+from hwt.hdlObjects.types.bits import Bits
+from hwt.hdlObjects.types.boolean import Boolean
+from hwt.hdlObjects.types.integer import Integer
+from hwt.hdlObjects.types.slice import Slice
+from hwt.hdlObjects.value import Value
+from hwt.synthesizer.param import Param, evalParam
+from hwt.synthesizer.rtlLevel.mainBases import RtlSignalBase
+
+
+class IntExpr():
+    """
+    Expression lowered to pair of python integers
+
+    :ivar val: python expression (str) which evaluates to value bits
+    :ivar vld: python expression (str) which evaluates to validity mask
+    :ivar width: bit width of expression
+    :ivar isBool: flag if expression has boolean semantic (val is 0/1 and
+        ops use BooleanVal rules)
+    """
+    def __init__(self, val, vld, width, isBool=False):
+        self.val = val
+        self.vld = vld
+        self.width = width
+        self.isBool = isBool
+
+    def fullVld(self):
+        m = mask(self.width)
+        if isinstance(self.vld, int):
+            return repr(self.vld == m)
+        return "(%s == %d)" % (self.vld, m)
+
+
+class IntProcCtx():
+    """
+    Container of temporary variables of single process in integer
+    simulation model
+
+    :ivar lines: lines of code which has to be rendered before actual statement
+    :ivar reads: dict {signal: local name} of signals read by process
+    """
+    def __init__(self):
+        self.lines = []
+        self.reads = {}
+        self._tmpCnt = 0
+
+    def tmp(self):
+        n = "t_%d" % self._tmpCnt
+        self._tmpCnt += 1
+        return n
+
+    def emit(self, line):
+        self.lines.append(line)
+
+    def read(self, sig):
+        try:
+            return self.reads[sig]
+        except KeyError:
+            n = "r_%s" % sig.name
+            self.reads[sig] = n
+            return n
+
+    def popLines(self, indent):
+        lines = self.lines
+        self.lines = []
+        return "".join(map(lambda l: "%s%s\n" % (indent, l), lines))
+
+    def prologue(self, indent):
+        return "".join(map(lambda x: "%s%s = self.%s._oldVal\n" % (indent, x[1], x[0].name),
+                           sorted(self.reads.items(), key=lambda x: x[1])))
+
+
+def isIntLowerableType(t):
+    return isinstance(t, (Bits, Boolean))
+
+
+class SimModelSerializer_intOps():
+    """
+    Lowering of expressions to straight-line integer arithmetic,
+    masks are resolved at the time of code generation.
+    Operators which can not be lowered are evaluated by Value objects
+    and only theirs result is decomposed to integers.
+    """
+
+    @classmethod
+    def _intTmp(cls, ctx, val, vld, width, isBool=False):
+        v = ctx.tmp()
+        m = v + "m"
+        v = v + "v"
+        ctx.emit("%s, %s = %s, %s" % (v, m, val, vld))
+        return IntExpr(v, m, width, isBool)
+
+    @classmethod
+    def _intScalarTmp(cls, ctx, expr):
+        t = ctx.tmp()
+        ctx.emit("%s = %s" % (t, expr))
+        return t
+
+    @classmethod
+    def _intFallback(cls, ctx, expr):
+        """
+        Evaluate expression by Value object and decompose result
+        """
+        t = ctx.tmp()
+        if isinstance(expr, Operator):
+            ctx.emit("%s = %s" % (t, cls.Operator(expr)))
+        else:
+            ctx.emit("%s = %s" % (t, cls.asHdl(expr)))
+
+        dtype = cls._intOpType(expr)
+        if isIntLowerableType(dtype):
+            w = dtype.bit_length()
+        else:
+            w = 1
+        return IntExpr("%s.val" % t, "%s.vldMask" % t, w,
+                       isinstance(dtype, Boolean))
+
+    @classmethod
+    def _intOpType(cls, expr):
+        if isinstance(expr, Operator):
+            if expr.result is not None:
+                return expr.result._dtype
+            elif expr.operator in (AllOps.EQ, AllOps.NEQ):
+                return Boolean()
+            else:
+                return None
+        return expr._dtype
+
+    @classmethod
+    def _intConst(cls, val):
+        t = val._dtype
+        if isinstance(t, Boolean):
+            return IntExpr(int(bool(val.val)), int(val.vldMask), 1, True)
+        elif isinstance(t, Bits):
+            return IntExpr(val.val, val.vldMask, t.bit_length())
+        elif isinstance(t, Integer):
+            return IntExpr(val.val, int(val.vldMask), 1)
+        else:
+            return None
+
+    @classmethod
+    def intExpr(cls, ctx, expr):
+        """
+        Lower expression to IntExpr, required code is emitted to ctx
+
+        :return: IntExpr instance
+        """
+        if isinstance(expr, Param):
+            expr = evalParam(expr)
+
+        if isinstance(expr, Value):
+            e = cls._intConst(expr)
+            if e is None:
+                return cls._intFallback(ctx, expr)
+            return e
+        elif isinstance(expr, RtlSignalBase):
+            if expr.hidden and hasattr(expr, "origin"):
+                return cls.intExpr(ctx, expr.origin)
+
+            t = expr._dtype
+            if not isIntLowerableType(t):
+                return cls._intFallback(ctx, expr)
+
+            r = ctx.read(expr)
+            return IntExpr(r + ".val", r + ".vldMask", t.bit_length(),
+                           isinstance(t, Boolean))
+        elif isinstance(expr, Operator):
+            return cls.intOperator(ctx, expr)
+        else:
+            return cls._intFallback(ctx, expr)
+
+    @classmethod
+    def _intEdge(cls, ctx, op):
+        sig = op.ops[0]
+        if not isinstance(sig, RtlSignalBase) or sig.hidden:
+            return cls._intFallback(ctx, op)
+
+        r = ctx.read(sig)
+        o = op.operator
+        ev = "(%s.updateTime == sim.now)" % r
+        if o == AllOps.RISING_EDGE:
+            v = "(%s and %s.val)" % (ev, r)
+        elif o == AllOps.FALLIGN_EDGE:
+            v = "(%s and not %s.val)" % (ev, r)
+        else:
+            v = ev
+
+        return cls._intTmp(ctx, v, "%s.vldMask" % r, 1, True)
+
+    @classmethod
+    def _intIndex(cls, ctx, op):
+        src, key = op.ops
+        if not isinstance(src._dtype, Bits):
+            return cls._intFallback(ctx, op)
+
+        if isinstance(key, Param):
+            key = evalParam(key)
+
+        if not isinstance(key, Value):
+            return cls._intFallback(ctx, op)
+
+        a = cls.intExpr(ctx, src)
+        if isinstance(key._dtype, Integer):
+            if not key._isFullVld():
+                return IntExpr(0, 0, 1)
+            i = key.val
+            return cls._intTmp(ctx,
+                               "(%s >> %d) & 1" % (a.val, i),
+                               "(%s >> %d) & 1" % (a.vld, i),
+                               1)
+        elif isinstance(key._dtype, Slice):
+            size = key._size()
+            if not key._isFullVld():
+                return IntExpr(0, 0, size)
+            lsb = key.val[1].val
+            m = mask(size)
+            return cls._intTmp(ctx,
+                               "(%s >> %d) & %d" % (a.val, lsb, m),
+                               "(%s >> %d) & %d" % (a.vld, lsb, m),
+                               size)
+        else:
+            return cls._intFallback(ctx, op)
+
+    @classmethod
+    def _intConvSign(cls, ctx, op, signed):
+        src = op.ops[0]
+        t = src._dtype
+        if not isinstance(t, Bits):
+            return cls._intFallback(ctx, op)
+
+        a = cls.intExpr(ctx, src)
+        selfSign = t.signed
+        if selfSign == signed:
+            return a
+
+        msbVal = 1 << (a.width - 1)
+        if selfSign and not signed:
+            v = "(%s + %d if %s < 0 else %s)" % (a.val, msbVal, a.val, a.val)
+        elif not selfSign and signed:
+            v = "(%s - %d if %s >= %d else %s)" % (a.val, msbVal - 1, a.val, msbVal, a.val)
+        else:
+            return a
+
+        return cls._intTmp(ctx, v, a.vld, a.width)
+
+    @classmethod
+    def intOperator(cls, ctx, op):
+        o = op.operator
+        ops = op.ops
+
+        if o in (AllOps.RISING_EDGE, AllOps.FALLIGN_EDGE, AllOps.EVENT):
+            return cls._intEdge(ctx, op)
+        elif o == AllOps.INDEX:
+            return cls._intIndex(ctx, op)
+        elif o == AllOps.BitsAsSigned:
+            return cls._intConvSign(ctx, op, True)
+        elif o == AllOps.BitsAsUnsigned:
+            return cls._intConvSign(ctx, op, False)
+        elif o == AllOps.BitsAsVec:
+            return cls._intConvSign(ctx, op, None)
+
+        # all other supported operators require operands of bits/bool type
+        # (integer constants are allowed for arithmetic)
+        for _o in ops:
+            t = _o._dtype
+            if not (isIntLowerableType(t) or
+                    (isinstance(t, Integer) and isinstance(_o, Value))):
+                return cls._intFallback(ctx, op)
+
+        if o == AllOps.NOT:
+            a = cls.intExpr(ctx, ops[0])
+            if a.isBool:
+                return cls._intTmp(ctx, "int(not %s)" % a.val, a.vld, 1, True)
+            return cls._intTmp(ctx, "~%s & %d" % (a.val, mask(a.width)),
+                               a.vld, a.width)
+        elif o == AllOps.TERNARY:
+            c, ifTrue, ifFalse = map(lambda x: cls.intExpr(ctx, x), ops)
+            # ifTrue/ifFalse are invalidated when condition is invalid
+            v = cls._intScalarTmp(ctx, "%s if %s else %s" % (
+                ifTrue.val, c.val, ifFalse.val))
+            m = cls._intScalarTmp(ctx, "(%s if %s else %s) if %s else 0" % (
+                ifTrue.vld, c.val, ifFalse.vld, c.vld))
+            return IntExpr(v, m, ifTrue.width, ifTrue.isBool)
+
+        a, b = map(lambda x: cls.intExpr(ctx, x), ops)
+        if o in (AllOps.AND_LOG, AllOps.OR_LOG, AllOps.XOR):
+            if o == AllOps.AND_LOG:
+                m = "(%s & %s) | (%s & ~%s) | (%s & ~%s)" % (
+                    a.vld, b.vld, a.vld, a.val, b.vld, b.val)
+                pyOp = "&"
+            elif o == AllOps.OR_LOG:
+                m = "(%s & %s) | (%s & %s) | (%s & %s)" % (
+                    a.vld, b.vld, a.vld, a.val, b.vld, b.val)
+                pyOp = "|"
+            else:
+                m = "%s & %s" % (a.vld, b.vld)
+                pyOp = "^"
+            m = cls._intScalarTmp(ctx, m)
+            if a.isBool:
+                v = "int(bool(%s %s %s))" % (a.val, pyOp, b.val)
+            else:
+                v = "(%s %s %s) & %s" % (a.val, pyOp, b.val, m)
+            return cls._intTmp(ctx, v, m, a.width, a.isBool)
+
+        elif o in (AllOps.EQ, AllOps.NEQ, AllOps.LOWERTHAN, AllOps.LE,
+                   AllOps.GREATERTHAN, AllOps.GE):
+            pyOp = {AllOps.EQ: "==",
+                    AllOps.NEQ: "!=",
+                    AllOps.LOWERTHAN: "<",
+                    AllOps.LE: "<=",
+                    AllOps.GREATERTHAN: ">",
+                    AllOps.GE: ">="}[o]
+            if a.isBool:
+                if o not in (AllOps.EQ, AllOps.NEQ):
+                    return cls._intFallback(ctx, op)
+                m = cls._intScalarTmp(ctx, "%s & %s" % (a.vld, b.vld))
+                v = "int((bool(%s) %s bool(%s)) and %s == %s == 1)" % (
+                    a.val, pyOp, b.val, a.vld, b.vld)
+            else:
+                m = cls._intScalarTmp(ctx, "int((%s & %s) == %d)" % (
+                    a.vld, b.vld, mask(a.width)))
+                v = "int(%s %s %s) & %s" % (a.val, pyOp, b.val, m)
+            return cls._intTmp(ctx, v, m, 1, True)
+
+        elif o in (AllOps.ADD, AllOps.SUB):
+            pyOp = "+" if o == AllOps.ADD else "-"
+            m = mask(a.width)
+            return cls._intTmp(ctx,
+                               "(%s %s %s) & %d" % (a.val, pyOp, b.val, m),
+                               "%d if %s and %s else 0" % (m, a.fullVld(), b.fullVld()),
+                               a.width)
+
+        elif o == AllOps.CONCAT:
+            return cls._intTmp(ctx,
+                               "(%s << %d) | %s" % (a.val, b.width, b.val),
+                               "(%s << %d) | %s" % (a.vld, b.width, b.vld),
+                               a.width + b.width)
+        else:
+            return cls._intFallback(ctx, op)
+
+    @classmethod
+    def intCond(cls, ctx, conds):
+        """
+        Lower condition of if statement
+
+        :return: python expression which evaluates to tuple (cond, condIsValid)
+            same as simEvalCond
+        """
+        conds = list(map(lambda c: cls.intExpr(ctx, c), conds))
+        if len(conds) == 1:
+            c = conds[0]
+            return "bool(%s), %s == 1" % (c.val, c.vld)
+
+        definitelyFalse = " or ".join(map(lambda c: "(not %s and %s == 1)" % (c.val, c.vld),
+                                          conds))
+        df = ctx.tmp()
+        ctx.emit("%s = %s" % (df, definitelyFalse))
+        return "(not %s and %s), (%s or %s)" % (
+            df,
+            " and ".join(map(lambda c: "bool(%s)" % c.val, conds)),
+            df,
+            " and ".join(map(lambda c: "%s == 1" % c.vld, conds)))
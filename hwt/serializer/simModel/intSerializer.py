@@ -0,0 +1,131 @@
+from hwt.hdlObjects.operator import Operator
+from hwt.hdlObjects.operatorDefs import AllOps
+from hwt.hdlObjects.statements import IfContainer
+from hwt.hdlObjects.types.bits import Bits
+from hwt.serializer.simModel.intOps import SimModelSerializer_intOps, IntProcCtx
+from hwt.serializer.simModel.serializer import SimModelSerializer, env, \
+    processTmpl, getIndent
+from hwt.synthesizer.param import Param
+from hwt.synthesizer.rtlLevel.mainBases import RtlSignalBase
+
+
+ifIntTmpl = env.get_template("ifInt.py")
+
+
+class SimModelIntSerializer(SimModelSerializer_intOps, SimModelSerializer):
+    """
+    Serializer of simulation model where processes evaluate expressions
+    on plain python integers (val, vldMask) instead of Value objects
+
+    :attention: values are still stored in signals as Value instances,
+        only result of process is converted to Value,
+        because of this agents, vcd dumping etc. works without modification
+    """
+
+    @classmethod
+    def intStmAsHdl(cls, obj, ctx, indent=0, enclosure=None):
+        try:
+            serFn = getattr(cls, obj.__class__.__name__ + "_int")
+        except AttributeError:
+            raise NotImplementedError("Not implemented for %s" % (repr(obj)))
+        return serFn(obj, ctx, indent, enclosure)
+
+    @classmethod
+    def Assignment_int(cls, a, ctx, indent=0, default=None):
+        dst = a.dst
+        src = a.src
+        if (a.indexes is not None
+                or not isinstance(dst._dtype, Bits)
+                or not (dst._dtype == src._dtype)
+                or not isinstance(src, RtlSignalBase)
+                or isinstance(src, Param)):
+            # values, indexed assignments and type conversions
+            # are serialized in the same way as in Value based model
+            return cls.Assignment(a, indent)
+
+        indentStr = getIndent(indent)
+        ev = a.isEventDependent
+        if not src.hidden:
+            return cls.driveStm(indentStr, dst.name, ctx.read(src), ev)
+
+        v = cls.intExpr(ctx, src)
+        return ctx.popLines(indentStr) + cls.driveStm(
+                indentStr, dst.name,
+                "BitsVal(%s, self.%s._dtype, %s)" % (v.val, dst.name, v.vld), ev)
+
+    @classmethod
+    def IfContainer_int(cls, ifc, ctx, indent, enclosure=None):
+        ifTrue = ifc.ifTrue
+        ifFalse = ifc.ifFalse
+
+        if ifc.elIfs:
+            # if has elifs revind this to tree
+            ifFalse = []
+            topIf = IfContainer(ifc.cond, ifc.ifTrue, ifFalse)
+            for c, stms in ifc.elIfs:
+                _ifFalse = []
+                lastIf = IfContainer(c, stms, _ifFalse)
+                ifFalse.append(lastIf)
+                ifFalse = _ifFalse
+
+            lastIf.ifFalse = ifc.ifFalse
+
+            return cls.IfContainer_int(topIf, ctx, indent, enclosure)
+        else:
+            indentStr = getIndent(indent)
+            cond = cls.intCond(ctx, ifc.cond)
+            condLines = ctx.popLines(indentStr)
+
+            if enclosure is None:
+                _enclosure = getIndent(indent + 1) + "pass"
+            else:
+                _enclosure = cls.intStmAsHdl(enclosure, ctx, indent + 1)
+
+            return ifIntTmpl.render(
+                indent=indentStr,
+                indentNum=indent,
+                condLines=condLines,
+                cond=cond,
+                enclosure=_enclosure,
+                ifTrue=tuple(map(lambda obj: cls.intStmAsHdl(obj, ctx, indent + 1, enclosure),
+                                 ifTrue)),
+                ifFalse=tuple(map(lambda obj: cls.intStmAsHdl(obj, ctx, indent + 1, enclosure),
+                                  ifFalse)))
+
+    @classmethod
+    def SwitchContainer_int(cls, sw, ctx, indent, enclosure=None):
+        switchOn = sw.switchOn
+        mkCond = lambda c: {Operator(AllOps.EQ,
+                                     [switchOn, c])}
+        elIfs = []
+
+        for key, statements in sw.cases:
+            elIfs.append((mkCond(key), statements))
+        ifFalse = sw.default
+
+        topCond = mkCond(sw.cases[0][0])
+        topIf = IfContainer(topCond,
+                            sw.cases[0][1],
+                            ifFalse,
+                            elIfs)
+
+        return cls.IfContainer_int(topIf, ctx, indent, enclosure)
+
+    @classmethod
+    def HWProcess(cls, proc, scope, indentLvl):
+        body = proc.statements
+        proc.name = scope.checkedName(proc.name, proc)
+        sensitivityList = sorted(map(cls.sensitivityListItem, proc.sensitivityList))
+        ctx = IntProcCtx()
+        if len(body) == 1:
+            _body = cls.intStmAsHdl(body[0], ctx, 2)
+        elif len(body) == 2:
+            # first statement is taken as default
+            _body = cls.intStmAsHdl(body[1], ctx, 2, body[0])
+        else:
+            raise NotImplementedError()
+
+        return processTmpl.render({
+              "name": proc.name,
+              "sensitivityList": sensitivityList,
+              "stmLines": [ctx.prologue(getIndent(2)) + _body]})
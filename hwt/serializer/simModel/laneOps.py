@@ -0,0 +1,307 @@
+from hwt.bitmask import mask
+from hwt.hdlObjects.operator import Operator
+from hwt.hdlObjects.operatorDefs import AllOps
+from hwt.hdlObjects.types.bits import Bits
+from hwt.hdlObjects.types.boolean import Boolean
+from hwt.hdlObjects.types.integer import Integer
+from hwt.hdlObjects.types.slice import Slice
+from hwt.hdlObjects.value import Value
+from hwt.serializer.exceptions import SerializerException
+from hwt.synthesizer.param import Param, evalParam
+from hwt.synthesizer.rtlLevel.mainBases import RtlSignalBase
+
+
+# max width of signal in lane simulation model
+LANE_MAX_WIDTH = 64
+
+
+class LaneExpr():
+    """
+    Expression lowered to pair of numpy arrays (one item for each lane)
+
+    :ivar val: python expression (str) which evaluates to raw value bits
+        (or python int for constants)
+    :ivar vld: python expression (str) which evaluates to validity mask
+        (or python int for constants)
+    :ivar width: bit width of expression
+    :ivar isBool: flag if expression has boolean semantic (val is 0/1)
+    :ivar signed: signed flag of type of expression
+    """
+    def __init__(self, val, vld, width, isBool=False, signed=None):
+        self.val = val
+        self.vld = vld
+        self.width = width
+        self.isBool = isBool
+        self.signed = signed
+
+    def isConst(self):
+        return isinstance(self.val, int) and isinstance(self.vld, int)
+
+
+def laneLit(v):
+    """
+    Serialize constant or expression for lane model
+    """
+    if isinstance(v, int):
+        return "U64(%d)" % v
+    return v
+
+
+def isLaneLowerableType(t):
+    return isinstance(t, (Bits, Boolean)) and t.bit_length() <= LANE_MAX_WIDTH
+
+
+class SimModelSerializer_laneOps():
+    """
+    Lowering of expressions to numpy array operations
+    (each item of array is one lane of simulation),
+    only Bits and Boolean types up to 64b are supported
+    """
+
+    @classmethod
+    def _laneTmp(cls, ctx, val, vld, width, isBool=False, signed=None):
+        v = ctx.tmp()
+        m = v + "m"
+        v = v + "v"
+        ctx.emit("%s, %s = %s, %s" % (v, m, laneLit(val), laneLit(vld)))
+        return LaneExpr(v, m, width, isBool, signed)
+
+    @classmethod
+    def _laneScalarTmp(cls, ctx, expr):
+        t = ctx.tmp()
+        ctx.emit("%s = %s" % (t, expr))
+        return t
+
+    @classmethod
+    def _laneNotSupported(cls, expr):
+        raise SerializerException("%r is not supported in lane simulation model" % (expr))
+
+    @classmethod
+    def _laneConst(cls, val):
+        t = val._dtype
+        if isinstance(t, Boolean):
+            return LaneExpr(int(bool(val.val)), int(val.vldMask), 1, True)
+        elif isinstance(t, Bits):
+            if not isLaneLowerableType(t):
+                cls._laneNotSupported(val)
+            m = mask(t.bit_length())
+            return LaneExpr(val.val & m, val.vldMask & m, t.bit_length(),
+                            signed=t.signed)
+        elif isinstance(t, Integer):
+            return LaneExpr(val.val, int(bool(val.vldMask)), 1)
+        else:
+            cls._laneNotSupported(val)
+
+    @classmethod
+    def laneExpr(cls, ctx, expr):
+        """
+        Lower expression to LaneExpr, required code is emitted to ctx
+
+        :return: LaneExpr instance
+        """
+        if isinstance(expr, Param):
+            expr = evalParam(expr)
+
+        if isinstance(expr, Value):
+            return cls._laneConst(expr)
+        elif isinstance(expr, RtlSignalBase):
+            if expr.hidden and hasattr(expr, "origin"):
+                return cls.laneExpr(ctx, expr.origin)
+
+            t = expr._dtype
+            if not isLaneLowerableType(t):
+                cls._laneNotSupported(expr)
+
+            r = ctx.read(expr)
+            return LaneExpr(r + ".val", r + ".vldMask", t.bit_length(),
+                            isinstance(t, Boolean), getattr(t, "signed", None))
+        elif isinstance(expr, Operator):
+            return cls.laneOperator(ctx, expr)
+        else:
+            cls._laneNotSupported(expr)
+
+    @classmethod
+    def _laneEdge(cls, ctx, op):
+        sig = op.ops[0]
+        if not isinstance(sig, RtlSignalBase) or sig.hidden:
+            cls._laneNotSupported(op)
+
+        # time of update is shared for all lanes
+        r = ctx.read(sig)
+        o = op.operator
+        ev = "U64(%s.updateTime == sim.now)" % r
+        if o == AllOps.RISING_EDGE:
+            v = "%s.val & %s" % (r, ev)
+        elif o == AllOps.FALLIGN_EDGE:
+            v = "(%s.val ^ U64(1)) & %s" % (r, ev)
+        else:
+            v = "np.full_like(%s.val, %s)" % (r, ev)
+
+        return cls._laneTmp(ctx, v, "%s.vldMask" % r, 1, True)
+
+    @classmethod
+    def _laneIndex(cls, ctx, op):
+        src, key = op.ops
+        if isinstance(key, Param):
+            key = evalParam(key)
+
+        if not isinstance(src._dtype, Bits) or not isinstance(key, Value):
+            cls._laneNotSupported(op)
+
+        a = cls.laneExpr(ctx, src)
+        if isinstance(key._dtype, Integer):
+            if not key._isFullVld():
+                return LaneExpr(0, 0, 1)
+            lsb = key.val
+            size = 1
+        elif isinstance(key._dtype, Slice):
+            size = key._size()
+            if not key._isFullVld():
+                return LaneExpr(0, 0, size)
+            lsb = key.val[1].val
+        else:
+            cls._laneNotSupported(op)
+
+        m = mask(size)
+        return cls._laneTmp(ctx,
+                            "(%s >> U64(%d)) & U64(%d)" % (laneLit(a.val), lsb, m),
+                            "(%s >> U64(%d)) & U64(%d)" % (laneLit(a.vld), lsb, m),
+                            size)
+
+    @classmethod
+    def _laneSignedOperand(cls, a, signed):
+        if signed:
+            return "laneSigned(%s, %d)" % (laneLit(a.val), a.width)
+        return laneLit(a.val)
+
+    @classmethod
+    def laneOperator(cls, ctx, op):
+        o = op.operator
+        ops = op.ops
+
+        if o in (AllOps.RISING_EDGE, AllOps.FALLIGN_EDGE, AllOps.EVENT):
+            return cls._laneEdge(ctx, op)
+        elif o == AllOps.INDEX:
+            return cls._laneIndex(ctx, op)
+        elif o in (AllOps.BitsAsSigned, AllOps.BitsAsUnsigned, AllOps.BitsAsVec):
+            # values are stored as raw bits, only interpretation changes
+            a = cls.laneExpr(ctx, ops[0])
+            signed = {AllOps.BitsAsSigned: True,
+                      AllOps.BitsAsUnsigned: False,
+                      AllOps.BitsAsVec: None}[o]
+            return LaneExpr(a.val, a.vld, a.width, a.isBool, signed)
+
+        for _o in ops:
+            t = _o._dtype
+            if not (isLaneLowerableType(t) or
+                    (isinstance(t, Integer) and isinstance(_o, Value))):
+                cls._laneNotSupported(op)
+
+        if o == AllOps.NOT:
+            a = cls.laneExpr(ctx, ops[0])
+            if a.isBool:
+                return cls._laneTmp(ctx, "%s ^ U64(1)" % laneLit(a.val), a.vld, 1, True)
+            return cls._laneTmp(ctx, "~%s & U64(%d)" % (laneLit(a.val), mask(a.width)),
+                                a.vld, a.width, signed=a.signed)
+        elif o == AllOps.TERNARY:
+            c, ifTrue, ifFalse = map(lambda x: cls.laneExpr(ctx, x), ops)
+            v = cls._laneScalarTmp(ctx, "np.where(%s, %s, %s)" % (
+                laneLit(c.val), laneLit(ifTrue.val), laneLit(ifFalse.val)))
+            m = cls._laneScalarTmp(ctx, "np.where(%s, np.where(%s, %s, %s), U64(0))" % (
+                laneLit(c.vld), laneLit(c.val), laneLit(ifTrue.vld), laneLit(ifFalse.vld)))
+            return LaneExpr(v, m, ifTrue.width, ifTrue.isBool, ifTrue.signed)
+
+        a, b = map(lambda x: cls.laneExpr(ctx, x), ops)
+        if isinstance(ops[1]._dtype, Integer):
+            # integer constant is used as value of type of first operand
+            m = mask(a.width)
+            b = LaneExpr(b.val & m, m if b.vld else 0, a.width, a.isBool, a.signed)
+        av, am, bv, bm = map(laneLit, (a.val, a.vld, b.val, b.vld))
+        if o in (AllOps.AND_LOG, AllOps.OR_LOG, AllOps.XOR):
+            if o == AllOps.AND_LOG:
+                m = "(%s & %s) | (%s & ~%s) | (%s & ~%s)" % (
+                    am, bm, am, av, bm, bv)
+                pyOp = "&"
+            elif o == AllOps.OR_LOG:
+                m = "(%s & %s) | (%s & %s) | (%s & %s)" % (
+                    am, bm, am, av, bm, bv)
+                pyOp = "|"
+            else:
+                m = "%s & %s" % (am, bm)
+                pyOp = "^"
+            m = cls._laneScalarTmp(ctx, m)
+            if a.isBool:
+                v = "%s %s %s" % (av, pyOp, bv)
+            else:
+                v = "(%s %s %s) & %s" % (av, pyOp, bv, m)
+            return cls._laneTmp(ctx, v, m, a.width, a.isBool, a.signed)
+
+        elif o in (AllOps.EQ, AllOps.NEQ, AllOps.LOWERTHAN, AllOps.LE,
+                   AllOps.GREATERTHAN, AllOps.GE):
+            pyOp = {AllOps.EQ: "==",
+                    AllOps.NEQ: "!=",
+                    AllOps.LOWERTHAN: "<",
+                    AllOps.LE: "<=",
+                    AllOps.GREATERTHAN: ">",
+                    AllOps.GE: ">="}[o]
+            if a.isBool:
+                if o not in (AllOps.EQ, AllOps.NEQ):
+                    cls._laneNotSupported(op)
+                m = cls._laneScalarTmp(ctx, "%s & %s" % (am, bm))
+            else:
+                m = cls._laneScalarTmp(ctx, "U64((%s & %s) == U64(%d))" % (
+                    am, bm, mask(a.width)))
+
+            if o in (AllOps.EQ, AllOps.NEQ):
+                # equality does not depend on interpretation of bits
+                signed = False
+            else:
+                signed = a.signed
+            v = "U64(%s %s %s) & %s" % (
+                cls._laneSignedOperand(a, signed), pyOp,
+                cls._laneSignedOperand(b, signed), m)
+            return cls._laneTmp(ctx, v, m, 1, True)
+
+        elif o in (AllOps.ADD, AllOps.SUB):
+            pyOp = "+" if o == AllOps.ADD else "-"
+            w = a.width
+            m = mask(w)
+            return cls._laneTmp(ctx,
+                                "(%s %s %s) & U64(%d)" % (av, pyOp, bv, m),
+                                "np.where((%s == U64(%d)) & (%s == U64(%d)), U64(%d), U64(0))" % (
+                                    am, m, bm, m, m),
+                                w, signed=a.signed)
+
+        elif o == AllOps.CONCAT:
+            w = a.width + b.width
+            if w > LANE_MAX_WIDTH:
+                cls._laneNotSupported(op)
+            return cls._laneTmp(ctx,
+                                "(%s << U64(%d)) | %s" % (av, b.width, bv),
+                                "(%s << U64(%d)) | %s" % (am, b.width, bm),
+                                w)
+        else:
+            cls._laneNotSupported(op)
+
+    @classmethod
+    def laneCond(cls, ctx, conds):
+        """
+        Lower condition of if statement (semantic is same as simEvalCond)
+
+        :return: tuple (cond, condIsValid) of names of arrays
+            with values 0/1 for each lane
+        """
+        conds = list(map(lambda c: cls.laneExpr(ctx, c), conds))
+        if len(conds) == 1:
+            c = conds[0]
+            return (laneLit(c.val), laneLit(c.vld))
+
+        definitelyFalse = " | ".join(map(lambda c: "((%s ^ U64(1)) & %s)" % (
+                                            laneLit(c.val), laneLit(c.vld)),
+                                         conds))
+        df = cls._laneScalarTmp(ctx, definitelyFalse)
+        c = cls._laneScalarTmp(ctx, "(%s ^ U64(1)) & %s" % (
+            df, " & ".join(map(lambda c: laneLit(c.val), conds))))
+        cVld = cls._laneScalarTmp(ctx, "%s | (%s)" % (
+            df, " & ".join(map(lambda c: laneLit(c.vld), conds))))
+        return (c, cVld)
@@ -0,0 +1,209 @@
+from hwt.hdlObjects.assignment import Assignment
+from hwt.hdlObjects.operator import Operator
+from hwt.hdlObjects.operatorDefs import AllOps
+from hwt.hdlObjects.statements import IfContainer, SwitchContainer
+from hwt.hdlObjects.types.bits import Bits
+from hwt.serializer.exceptions import SerializerException
+from hwt.serializer.simModel.intOps import IntProcCtx
+from hwt.serializer.simModel.laneOps import SimModelSerializer_laneOps, \
+    isLaneLowerableType, laneLit
+from hwt.serializer.simModel.serializer import SimModelSerializer, \
+    processTmpl, getIndent
+from hwt.serializer.utils import procOutputs
+
+
+class SimModelLaneSerializer(SimModelSerializer_laneOps, SimModelSerializer):
+    """
+    Serializer of simulation model for HdlLaneSimulator, every signal holds
+    numpy array of values (one for each lane) and processes are evaluated
+    for all lanes at once
+
+    Processes are lowered to straight-line code, if statements are converted
+    to masked selects (np.where), every process yields value for all lanes
+    if there is any lane where it drives its output
+    (lanes where output is not driven keep original value)
+
+    :attention: only Bits and Boolean types up to 64b are supported,
+        (enums, arrays and indexed assignments are not)
+    """
+    _simSignalCls = "LaneSimSignal"
+    _modelImports = ["import numpy as np",
+                     "from hwt.simulator.laneSimulator import U64, LaneVal, "
+                     "LaneSimSignal, laneArr, laneSigned"]
+    _laneReservedWords = ["np", "U64", "LaneVal", "LaneSimSignal", "laneArr",
+                          "laneSigned"]
+
+    @classmethod
+    def getBaseNameScope(cls):
+        s = super(SimModelLaneSerializer, cls).getBaseNameScope()
+        for w in cls._laneReservedWords:
+            s[0][w] = s[0]["sim"]
+        return s
+
+    @classmethod
+    def _laneSel(cls, ctx, c, a, b):
+        """
+        Select a where c else b
+        """
+        if a == b or c == "True":
+            return a
+        elif c == "False":
+            return b
+        return cls._laneScalarTmp(ctx, "np.where(%s, %s, %s)" % (
+            c, laneLit(a), laneLit(b)))
+
+    @classmethod
+    def _laneMerge(cls, ctx, c, cVld, tState, fState):
+        """
+        Merge states from branches of if statement
+
+        (lanes with invalid condition: if both branches drive output
+        the value is invalid, otherwise value from driving branch is used)
+        """
+        if tState == fState:
+            return tState
+
+        vT, mT, aT = tState
+        vF, mF, aF = fState
+        # value for lanes with invalid condition
+        if aT == "False":
+            vInv, mInv = vF, mF
+        elif aF == "False":
+            vInv, mInv = vT, mT
+        else:
+            vInv = cls._laneSel(ctx, aT, vT, vF)
+            if aT == aF == "True":
+                mInv = 0
+            else:
+                mInv = cls._laneScalarTmp(ctx, "np.where(%s & %s, U64(0), np.where(%s, %s, %s))" % (
+                    aT, aF, aT, laneLit(mT), laneLit(mF)))
+
+        v = cls._laneSel(ctx, cVld, cls._laneSel(ctx, c, vT, vF), vInv)
+        m = cls._laneSel(ctx, cVld, cls._laneSel(ctx, c, mT, mF), mInv)
+
+        if aT == aF:
+            a = aT
+        else:
+            if "True" in (aT, aF):
+                aInv = "True"
+            elif aT == "False":
+                aInv = aF
+            elif aF == "False":
+                aInv = aT
+            else:
+                aInv = "%s | %s" % (aT, aF)
+            a = cls._laneScalarTmp(ctx, "np.where(%s, np.where(%s, %s, %s), %s)" % (
+                cVld, c, aT, aF, aInv))
+
+        return (v, m, a)
+
+    @classmethod
+    def laneStm(cls, ctx, stm, dst, state):
+        """
+        Lower statement to straight-line code
+
+        :param dst: output signal of process
+        :param state: tuple (val, vld, assigned) python expressions
+            for value of dst before this statement
+        :return: state after this statement
+        """
+        if isinstance(stm, Assignment):
+            if stm.indexes is not None or stm.dst is not dst:
+                cls._laneNotSupported(stm)
+            srcT = stm.src._dtype
+            dstT = dst._dtype
+            if not (srcT == dstT or (isinstance(srcT, Bits) and isinstance(dstT, Bits)
+                                     and srcT.bit_length() == dstT.bit_length())):
+                cls._laneNotSupported(stm)
+
+            src = cls.laneExpr(ctx, stm.src)
+            return (src.val, src.vld, "True")
+
+        elif isinstance(stm, IfContainer):
+            ifFalse = stm.ifFalse
+            if stm.elIfs:
+                # if has elifs revind this to tree
+                c, stms = stm.elIfs[0]
+                ifFalse = [IfContainer(c, stms, stm.ifFalse, stm.elIfs[1:])]
+
+            c, cVld = cls.laneCond(ctx, stm.cond)
+            tState = state
+            for _stm in stm.ifTrue:
+                tState = cls.laneStm(ctx, _stm, dst, tState)
+            fState = state
+            for _stm in ifFalse:
+                fState = cls.laneStm(ctx, _stm, dst, fState)
+
+            return cls._laneMerge(ctx, c, cVld, tState, fState)
+
+        elif isinstance(stm, SwitchContainer):
+            switchOn = stm.switchOn
+            mkCond = lambda c: {Operator(AllOps.EQ,
+                                         [switchOn, c])}
+            elIfs = []
+            for key, statements in stm.cases[1:]:
+                elIfs.append((mkCond(key), statements))
+
+            topIf = IfContainer(mkCond(stm.cases[0][0]),
+                                stm.cases[0][1],
+                                stm.default,
+                                elIfs)
+            return cls.laneStm(ctx, topIf, dst, state)
+        else:
+            cls._laneNotSupported(stm)
+
+    @classmethod
+    def _isEventDependent(cls, stm):
+        if isinstance(stm, Assignment):
+            return stm.isEventDependent
+        elif isinstance(stm, IfContainer):
+            stms = list(stm.ifTrue) + list(stm.ifFalse)
+            for _, _stms in stm.elIfs:
+                stms.extend(_stms)
+        elif isinstance(stm, SwitchContainer):
+            stms = list(stm.default)
+            for _, _stms in stm.cases:
+                stms.extend(_stms)
+        else:
+            return False
+
+        return any(map(cls._isEventDependent, stms))
+
+    @classmethod
+    def HWProcess(cls, proc, scope, indentLvl):
+        body = proc.statements
+        proc.name = scope.checkedName(proc.name, proc)
+        sensitivityList = sorted(map(cls.sensitivityListItem, proc.sensitivityList))
+
+        outputs = procOutputs(proc)
+        if len(outputs) != 1:
+            raise SerializerException("Process %s has to drive exactly one signal"
+                                      " in lane simulation model (drives %r)" %
+                                      (proc.name, outputs))
+        dst = outputs[0]
+        if not isLaneLowerableType(dst._dtype):
+            cls._laneNotSupported(dst)
+
+        ctx = IntProcCtx()
+        d = "self.%s._val" % dst.name
+        state = (d + ".val", d + ".vldMask", "False")
+        # first statement is default if there are two of them
+        for stm in body:
+            state = cls.laneStm(ctx, stm, dst, state)
+
+        v, m, a = state
+        ev = any(map(cls._isEventDependent, body))
+        indent = getIndent(2)
+        if a == "False":
+            res = "%sreturn\n%syield" % (indent, indent)
+        else:
+            res = "%syield (self.%s, LaneVal(laneArr(%s, sim.lanes), laneArr(%s, sim.lanes), self.%s._dtype), %s)" % (
+                indent if a == "True" else getIndent(3), dst.name,
+                laneLit(v), laneLit(m), dst.name, ev)
+            if a != "True":
+                res = "%sif %s.any():\n%s" % (indent, a, res)
+
+        return processTmpl.render({
+              "name": proc.name,
+              "sensitivityList": sensitivityList,
+              "stmLines": [ctx.prologue(indent) + ctx.popLines(indent) + res]})
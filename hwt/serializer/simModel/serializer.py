@@ -14,7 +14,7 @@ from hwt.serializer.nameScope import LangueKeyword, NameScope
 from hwt.serializer.simModel.value import SimModelSerializer_value
 from hwt.serializer.simModel.ops import SimModelSerializer_ops
 from hwt.serializer.simModel.types import SimModelSerializer_types
-from hwt.serializer.utils import maxStmId
+from hwt.serializer.utils import maxStmId, procOutputs
 from hwt.synthesizer.param import evalParam
 from hwt.synthesizer.rtlLevel.mainBases import RtlSignalBase
 from hwt.hdlObjects.types.bits import Bits
@@ -31,6 +31,7 @@ simCls_reservedWords = ['sim',
                         'vecT',
                         'Array',
                         'ArrayVal',
+                        'SparseArrayVal',
                         'convertBits__val',
                         'BitsVal',
                         'SLICE',
@@ -73,6 +74,12 @@ class SimModelSerializer(SimModelSerializer_value, SimModelSerializer_ops, SimMo
 
     fileExtension = '.py'
     formater = lambda s: s
+    # class of signals in generated model
+    _simSignalCls = "SimSignal"
+    # extra import lines of generated model
+    _modelImports = []
+    # processes of model write their outputs to signals (SimModel._directWrite)
+    _directWrite = False
 
     @classmethod
     def getBaseNameScope(cls):
@@ -161,6 +168,10 @@ class SimModelSerializer(SimModelSerializer_value, SimModelSerializer_ops, SimMo
             "processObjects"     : arch.processes,
             "processesNames"     : map(lambda p: p.name, arch.processes),
             "componentInstances" : arch.componentInstances,
+            "imports"            : cls._modelImports,
+            "signalCls"          : cls._simSignalCls,
+            "directWrite"        : cls._directWrite,
+            "procOutputs"        : procOutputs,
             "isOp"               : lambda x: isinstance(x, Operator),
             "sensitivityByOp"    : sensitivityByOp
             })
@@ -172,9 +183,8 @@ class SimModelSerializer(SimModelSerializer_value, SimModelSerializer_ops, SimMo
         ev = a.isEventDependent
 
         if a.indexes is not None:
-            return "%syield (self.%s, %s, (%s,), %s)" % (
-                        indentStr, dst.name, cls.Value(a.src),
-                        ", ".join(map(cls.asHdl, a.indexes)), ev)
+            return cls.driveStm(indentStr, dst.name, cls.Value(a.src), ev,
+                                ", ".join(map(cls.asHdl, a.indexes)))
         else:
             if not (dst._dtype == a.src._dtype):
                 srcT = a.src._dtype
@@ -183,19 +193,31 @@ class SimModelSerializer(SimModelSerializer_value, SimModelSerializer_ops, SimMo
                     srcT.bit_length() == dstT.bit_length() == 1):
                     if srcT.forceVector != dstT.forceVector:
                         if srcT.forceVector:
-                            return "%syield (self.%s, (%s)._getitem__val(simHInt(0)), %s)" % (
-                                    indentStr, dst.name, cls.Value(a.src), ev)
+                            return cls.driveStm(
+                                indentStr, dst.name,
+                                "(%s)._getitem__val(simHInt(0))" % cls.Value(a.src), ev)
                         else:
-                            return "%syield (self.%s, %s, (simHInt(0),), %s)" % (
-                                    indentStr, dst.name, cls.Value(a.src), ev)
+                            return cls.driveStm(indentStr, dst.name, cls.Value(a.src),
+                                                ev, "simHInt(0)")
 
                 raise SerializerException(("%s <= %s  is not valid assignment\n" +
                                           " because types are different (%r; %r) ") % 
                                           (cls.asHdl(dst), cls.Value(a.src),
                                           dst._dtype, a.src._dtype))
             else:
-                return "%syield (self.%s, %s, %s)" % (
-                        indentStr, dst.name, cls.Value(a.src), ev)
+                return cls.driveStm(indentStr, dst.name, cls.Value(a.src), ev)
+
+    @classmethod
+    def driveStm(cls, indentStr, dstName, val, ev, indexes=None):
+        """
+        :return: line of process which outputs value for signal
+        :param indexes: serialized indexes if item of array is driven
+        """
+        if indexes is None:
+            return "%syield (self.%s, %s, %s)" % (indentStr, dstName, val, ev)
+        else:
+            return "%syield (self.%s, %s, (%s,), %s)" % (
+                indentStr, dstName, val, indexes, ev)
 
     @classmethod
     def comment(cls, comentStr):
@@ -0,0 +1,25 @@
+{{condLines}}{{indent}}c_{{indentNum}}, cVld_{{ indentNum }} = {{ cond }}
+{{indent}}#if ():
+{{indent}}if c_{{indentNum}} or not cVld_{{ indentNum }}: 
+{{indent}}    cVld_{{ indentNum }} = cVld_{{ indentNum-1 }} and cVld_{{ indentNum }}{%
+if ifTrue|length > 0 %}{% 
+    for stm in ifTrue %}
+{{stm}}{% 
+    endfor %}{% 
+else %}
+{{indent}}    #enclosure
+{{enclosure}}{%
+endif %}
+{{indent}}#else:
+{{indent}}if not c_{{indentNum}} or not cVld_{{ indentNum }}:{% 
+if ifFalse|length > 0 %}{%
+    for stm in ifFalse %}
+{{stm}}{%
+    endfor%}{% 
+else %}
+{{indent}}    #enclosure
+{{enclosure}}
+{% endif %}
+{#
+""" Same as if.py but condition is evaluated as integers """
+#}
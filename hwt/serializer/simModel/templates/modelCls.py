@@ -12,6 +12,7 @@ from hwt.simulator.types.simIntConversions import convertSimInteger__val
 from hwt.simulator.types.simInt import simHInt, SIM_INT
 from hwt.simulator.types.simBits import simBitsT, SIM_BIT
 from hwt.simulator.types.simBitsConversions import convertSimBits__val
+from hwt.simulator.types.sparseArrayVal import SparseArrayVal
 from hwt.simulator.simModel import (SimModel, sensitivity, connectSimPort,
                                             simEvalCond, mkUpdater, mkArrayUpdater)
 from hwt.code import Concat, power
@@ -30,14 +31,15 @@ if "{{c.name}}" not in locals(): # support for all models in single file
 
 class {{ name }}(SimModel):
     _name = "{{ name }}" 
+    _directWrite = {{ directWrite }}
     _cntx = RtlNetlist(){% for t in extraTypes %} 
     {{t}}{% endfor %}
     
     # ports{% for name, dtype in ports %}
-    {{name}} = SimSignal(_cntx, "{{name}}", {{dtype}}){% endfor %}
+    {{name}} = {{ signalCls }}(_cntx, "{{name}}", {{dtype}}){% endfor %}
     
     # internal signals{% for name, dtype, defVal in signals %}
-    {{name}} = SimSignal(_cntx, "{{name}}", {{dtype}}, defaultVal={{defVal}}){% endfor %}
+    {{name}} = {{ signalCls }}(_cntx, "{{name}}", {{dtype}}, defaultVal={{defVal}}){% endfor %}
     
 {% for proc in processes %}
 {{proc}}
@@ -47,8 +49,12 @@ class {{ name }}(SimModel):
         self._interfaces = [{% for name, _ in ports   %}self.{{name}},
                             {% endfor %}{% for name, _, _ in signals %}self.{{name}},
                             {% endfor %}]
+        self._ports = [{% for name, _ in ports %}self.{{name}}, {% endfor %}]
         self._processes = [{% for procName in processesNames %}self.{{procName}},
                            {% endfor %}]
+        self._outputs = {{ '{' }}{% for proc in processObjects %}self.{{proc.name}}: ({%
+                            for o in procOutputs(proc) %}self.{{o.name}}, {% endfor %}),
+                         {% endfor %}{{ '}' }}
         {% for c in componentInstances %}
         # connect ports{% for p in c.ports %}
         connectSimPort(self, {{c.name}},"{{p.src.name}}", "{{p.dst.name}}", {{p.direction}}){% endfor %}
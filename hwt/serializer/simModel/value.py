@@ -10,6 +10,9 @@ from hwt.synthesizer.param import Param, evalParam
 
 
 class SimModelSerializer_value():
+    # arrays with at least this number of items are represented
+    # by SparseArrayVal in sim model (only valid items are serialized)
+    SPARSE_ARRAY_MIN_SIZE = 256
 
     @classmethod
     def Bits_valAsVhdl(cls, dtype, val):
@@ -37,6 +40,13 @@ class SimModelSerializer_value():
 
     @classmethod
     def Array_valAsVhdl(cls, t, val):
+        if evalParam(t.size).val >= cls.SPARSE_ARRAY_MIN_SIZE:
+            items = ",\n".join(map(lambda x: "%d: %s" % (x[0], cls.Value(x[1])),
+                                   filter(lambda x: x[1].vldMask,
+                                          enumerate(val.val))))
+            return "SparseArrayVal.fromPy({%s}, %s, vldMask=%d)" % (
+                items, cls.HdlType(t), val.vldMask)
+
         return "ArrayVal([%s], %s, %d)" % (",\n".join(map(cls.Value, val.val)), cls.HdlType(t), val.vldMask)
 
     @classmethod
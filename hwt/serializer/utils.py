@@ -32,3 +32,29 @@ def maxStmId(proc):
     for stm in proc.statements:
         maxId = max(maxId, getMaxStmIdForStm(stm))
     return maxId
+
+
+def _getOutputsOfStm(stm, outputs):
+    if isinstance(stm, Assignment):
+        if stm.dst not in outputs:
+            outputs.append(stm.dst)
+    elif isinstance(stm, IfContainer):
+        for _stm in chain(stm.ifTrue, *map(lambda _elif: _elif[1], stm.elIfs), stm.ifFalse):
+            _getOutputsOfStm(_stm, outputs)
+    elif isinstance(stm, SwitchContainer):
+        for _stm in chain(*map(lambda _case: _case[1], stm.cases), stm.default):
+            _getOutputsOfStm(_stm, outputs)
+    elif isinstance(stm, WaitStm):
+        pass
+    else:
+        raise NotImplementedError(stm)
+
+
+def procOutputs(proc):
+    """
+    get list of signals driven by process
+    """
+    outputs = []
+    for stm in proc.statements:
+        _getOutputsOfStm(stm, outputs)
+    return outputs
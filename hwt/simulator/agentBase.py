@@ -1,4 +1,5 @@
 from hwt.interfaces.std import Rst_n
+from hwt.simulator.agentQueue import agentQueueProperty
 from hwt.simulator.shortcuts import onRisingEdge
 from hwt.synthesizer.exceptions import IntfLvlConfErr
 
@@ -11,7 +12,11 @@ class AgentBase():
 
     :ivar intf: interface assigned to this agent
     :ivar enable: flag to enable/disable this agent
+    :ivar data: AgentQueue of data for driver or data collected by monitor
+        (list, tuple or iterator can be assigned, iterators are consumed lazily)
     """
+    data = agentQueueProperty("_data")
+
     def __init__(self, intf):
         self.intf = intf
         self.enable = True
@@ -32,6 +37,26 @@ class AgentBase():
         """
         return [self.monitor]
 
+    def isDrained(self):
+        """
+        :return: True if driver of this agent does not have anything
+            to send (used by AgentsDrained stop condition)
+        """
+        try:
+            return not self.data
+        except AttributeError:
+            return True
+
+    def monitorProgress(self):
+        """
+        :return: number of items received by monitor of this agent
+            (used by AgentsDrained stop condition)
+        """
+        try:
+            return len(self.data)
+        except AttributeError:
+            return 0
+
     def driver(self, s):
         """
         Implement this method to drive your interface in simulation/verification
@@ -89,4 +114,4 @@ class SyncAgentBase(AgentBase):
         if self.rst_n is None:
             return True
         else:
-            return s.r(self.rst_n).val
+            return s.readRaw(self.rst_n)[0]
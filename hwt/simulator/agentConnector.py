@@ -46,10 +46,116 @@ def autoAddAgents(unit):
     return proc
 
 
+class LaneAgent(object):
+    """
+    Container of agents of single interface for lane simulation,
+    there is independent agent for every lane
+
+    :ivar lanes: list of agents, index is index of lane
+    """
+    def __init__(self, agents):
+        self.lanes = agents
+
+    def __getitem__(self, lane):
+        return self.lanes[lane]
+
+    def __len__(self):
+        return len(self.lanes)
+
+
+def _laneProc(proc, lane):
+    """
+    Wrap agent process to run on view of lane simulator for specified lane
+    """
+    def laneProc(sim):
+        return proc(sim.laneView(lane))
+    return laneProc
+
+
+def autoAddLaneAgents(unit, lanes):
+    """
+    Same as autoAddAgents but every interface obtains LaneAgent
+    which contains agent for every lane
+
+    :attention: clock and reset interfaces have single agent which drives
+        all lanes (time and clock edges are shared for all lanes)
+
+    :return: all monitor/driver functions which should be added to simulation as processes
+        (for HdlLaneSimulator)
+    """
+    from hwt.interfaces.std import Clk, Rst, Rst_n
+    proc = []
+    for intf in unit._interfaces:
+        if not intf._isExtern:
+            continue
+
+        if intf._multipliedBy is not None:
+            raise NotImplementedError("Interface arrays are not supported in lane simulation (%r)" % (intf))
+
+        try:
+            agentCls = intf._getSimAgent()
+        except NotImplementedError:
+            raise NotImplementedError(("Interface %s\n" + 
+                            "has not any simulation agent class assigned") % (str(intf)))
+
+        if isinstance(intf, (Clk, Rst, Rst_n)):
+            agent = agentCls(intf)
+            intf._ag = agent
+            if intf._direction == INTF_DIRECTION.SLAVE:
+                proc.extend(agent.getDrivers())
+            continue
+
+        agents = [agentCls(intf) for _ in range(lanes)]
+        intf._ag = LaneAgent(agents)
+
+        for lane, a in enumerate(agents):
+            if intf._direction == INTF_DIRECTION.MASTER:
+                agProcs = a.getMonitors()
+            elif intf._direction == INTF_DIRECTION.SLAVE:
+                agProcs = a.getDrivers()
+            else:
+                raise NotImplementedError("intf._direction %s for %r" % (str(intf._direction), intf))
+
+            for p in agProcs:
+                proc.append(_laneProc(p, lane))
+
+    return proc
+
+
+def collectAgents(unit):
+    """
+    :return: list of all agents of interfaces of unit
+        (agents of array items and lanes included)
+    """
+    agents = []
+    for intf in unit._interfaces:
+        if intf._multipliedBy is not None and intf._ag is None:
+            ags = [intf[i]._ag for i in range(evalParam(intf._multipliedBy).val)]
+        else:
+            ags = [intf._ag]
+
+        for a in ags:
+            if a is None:
+                continue
+            elif isinstance(a, LaneAgent):
+                for la in a.lanes:
+                    if la not in agents:
+                        agents.append(la)
+            elif a not in agents:
+                agents.append(a)
+
+    return agents
+
+
 def valuesToInts(values):
     """
     Iterable of values to ints (nonvalid = None)
     """
+    toInts = getattr(values, "toInts", None)
+    if toInts is not None:
+        # container which stores values as ints (NpCaptureBuffer)
+        return toInts()
+
     res = []
     for d in values:
         res.append(valToInt(d))
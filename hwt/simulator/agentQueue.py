@@ -0,0 +1,168 @@
+from collections import deque
+from collections.abc import Iterator
+from itertools import tee
+
+
+class AgentQueue(deque):
+    """
+    Queue of transactions of agent (data for driver or data collected
+    by monitor), items are taken by popleft() in O(1)
+
+    It behaves like list where it is required for compatibility
+    (comparison with list, slicing, pop(index)).
+    """
+    __slots__ = []
+
+    def __eq__(self, other):
+        if isinstance(other, (list, tuple, deque)):
+            return list(self) == list(other)
+        return NotImplemented
+
+    def __ne__(self, other):
+        eq = self.__eq__(other)
+        if eq is NotImplemented:
+            return eq
+        return not eq
+
+    __hash__ = None
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return list(self)[index]
+        return deque.__getitem__(self, index)
+
+    def pop(self, index=-1):
+        if index == 0:
+            return self.popleft()
+        elif index == -1:
+            return deque.pop(self)
+
+        item = self[index]
+        del self[index]
+        return item
+
+
+class LazyAgentQueue(AgentQueue):
+    """
+    AgentQueue which takes items from iterator (e.g. generator or file)
+    only when they are required, len(), iteration and indexing
+    take all remaining items from iterator
+
+    :ivar source: iterator with remaining items or None if it is exhausted
+    """
+    __slots__ = ["source"]
+
+    def __init__(self, source):
+        super(LazyAgentQueue, self).__init__()
+        self.source = source
+
+    def _pull(self):
+        """
+        Take next item from source
+
+        :return: True if there was an item in source
+        """
+        try:
+            self.append(next(self.source))
+            return True
+        except StopIteration:
+            self.source = None
+            return False
+
+    def _pullAll(self):
+        if self.source is not None:
+            self.extend(self.source)
+            self.source = None
+
+    def __bool__(self):
+        return deque.__len__(self) > 0 or (self.source is not None and self._pull())
+
+    def __len__(self):
+        self._pullAll()
+        return deque.__len__(self)
+
+    def __iter__(self):
+        self._pullAll()
+        return deque.__iter__(self)
+
+    def __getitem__(self, index):
+        self._pullAll()
+        return AgentQueue.__getitem__(self, index)
+
+    def __eq__(self, other):
+        self._pullAll()
+        return AgentQueue.__eq__(self, other)
+
+    def __repr__(self):
+        items = list(deque.__iter__(self))
+        if self.source is None:
+            return "%s(%r)" % (self.__class__.__name__, items)
+        return "%s(%r + ...)" % (self.__class__.__name__, items)
+
+    def popleft(self):
+        if not deque.__len__(self) and self.source is not None:
+            self._pull()
+        return deque.popleft(self)
+
+    def pop(self, index=-1):
+        if index == 0:
+            return self.popleft()
+        self._pullAll()
+        return AgentQueue.pop(self, index)
+
+    def copy(self):
+        """
+        :return: copy of this queue with buffered items and copy of source
+            (source is split by itertools.tee, so both queues take the same
+            remaining items)
+        """
+        source = self.source
+        if source is not None:
+            self.source, source = tee(source)
+        c = self.__class__(source)
+        c.extend(deque.__iter__(self))
+        return c
+
+    __copy__ = copy
+
+
+def iterArrayItems(arr, chunkSize=4096):
+    """
+    Iterate items of numpy array as python objects (ints),
+    array is converted in chunks
+    """
+    for i in range(0, len(arr), chunkSize):
+        yield from arr[i:i + chunkSize].tolist()
+
+
+def toAgentQueue(items):
+    """
+    Convert collection or iterator of items to AgentQueue
+    (iterators and numpy arrays are consumed lazily)
+
+    Objects which already implement queue interface (popleft, append,
+    copy, e.g. NpCaptureBuffer) are used as they are.
+    """
+    if isinstance(items, AgentQueue) or hasattr(items, "popleft"):
+        return items
+    elif isinstance(items, Iterator):
+        return LazyAgentQueue(items)
+    elif hasattr(items, "tolist") and hasattr(items, "dtype"):
+        # numpy array
+        return LazyAgentQueue(iterArrayItems(items))
+    else:
+        return AgentQueue(items)
+
+
+def agentQueueProperty(attrName, doc=None):
+    """
+    :return: property which converts every assigned collection
+        or iterator to AgentQueue (see toAgentQueue)
+    """
+    def getter(self):
+        return getattr(self, attrName)
+
+    def setter(self, items):
+        setattr(self, attrName, toAgentQueue(items))
+
+    return property(getter, setter, doc=doc)
@@ -0,0 +1,93 @@
+from hwt.simulator.simulatorCore import PRIORITY_NORMAL
+from hwt.synthesizer.interfaceLevel.mainBases import InterfaceBase
+
+
+class ClockSource(object):
+    """
+    Clock generator planed directly in time queue of simulator,
+    there is no simulation process, clock signal is toggled by preallocated
+    updaters (each with preallocated value)
+
+    Every period starts with low level, clock is high from
+    start + k * period + lowTime until start + (k + 1) * period.
+    Time of every edge is computed from index of period (k),
+    so rounding errors are not accumulated and clocks with rational ratio
+    of periods have exactly aligned edges.
+
+    Index of period is passed as argument of planed actions,
+    this object does not have any mutable state (it can be captured by SimCheckpoint).
+
+    :ivar sig: clock signal
+    :ivar period: period of clock
+    :ivar start: time of start of first period (time of start + phase)
+    :ivar lowTime: time of low level in every period (period * (1 - dutyCycle))
+    """
+    def __init__(self, sim, sig, period, phase=0, dutyCycle=0.5):
+        if isinstance(sig, InterfaceBase):
+            sig = sig._sigInside
+
+        if period <= 0:
+            raise ValueError("Clock period has to be positive (%r)" % period)
+        if not (0 < dutyCycle < 1):
+            raise ValueError("Duty cycle has to be in range (0, 1) (%r)" % dutyCycle)
+
+        self.sim = sim
+        self.sig = sig
+        self.period = period
+        self.start = sim.now + phase
+        lowTime = period - period * dutyCycle
+        if isinstance(lowTime, float) and lowTime.is_integer():
+            # keep integer times if possible
+            lowTime = int(lowTime)
+        self.lowTime = lowTime
+
+        self._low = sim._mkClockUpdater(sig, 0)
+        self._high = sim._mkClockUpdater(sig, 1)
+
+    def _update(self, updater):
+        sim = self.sim
+        sig = self.sig
+        sig.simUpdateVal(sim, updater)
+        if not sig.simSensProcs and sim.applyValPlaned:
+            # see HdlSimulator.write()
+            sim.scheduleApplyValues()
+
+    def _init(self, _):
+        self._update(self._low)
+        self.sim._schedule(self.start + self.lowTime, PRIORITY_NORMAL,
+                           self._rising, 0)
+
+    def _rising(self, k):
+        self._update(self._high)
+        self.sim._schedule(self.start + (k + 1) * self.period, PRIORITY_NORMAL,
+                           self._falling, k + 1)
+
+    def _falling(self, k):
+        self._update(self._low)
+        self.sim._schedule(self.start + k * self.period + self.lowTime, PRIORITY_NORMAL,
+                           self._rising, k)
+
+    def isEdgeAction(self, fn):
+        """
+        :return: True if fn is planed edge of this clock
+        """
+        return fn == self._rising or fn == self._falling
+
+    def _edgeTime(self, fn, k):
+        t = self.start + k * self.period
+        if fn == self._rising:
+            t += self.lowTime
+        return t
+
+    def _fastForward(self, fn, k, target):
+        """
+        Plan edge fn(k) (which was planed before target) again
+        on last equivalent edge before target (same phase of clock)
+        """
+        t = self._edgeTime(fn, k)
+        # number of whole periods which can be skipped
+        n = int(-((t - target) // self.period)) - 1
+        if n > 0:
+            k += n
+            t = self._edgeTime(fn, k)
+        self.sim._schedule(t, PRIORITY_NORMAL, fn, k)
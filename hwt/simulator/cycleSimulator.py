@@ -0,0 +1,340 @@
+from hwt.simulator.exceptions import SimNotSupportedErr
+from hwt.simulator.hdlSimulator import HdlSimulator
+from hwt.simulator.simModel import walkSimModels
+
+
+class HdlCycleSimulator(HdlSimulator):
+    """
+    Cycle based simulator for synchronous designs with single clock
+
+    There are no delta steps, combinational processes are levelized and
+    every triggered combinational process is evaluated exactly once
+    in order of its rank, values are applied immediately.
+    On rising edge of clock all event dependent (register) processes
+    are evaluated and theirs values are committed together.
+
+    Simulation processes (agents) work in the same way as in HdlSimulator,
+    updateComplete is triggered after combinational logic settles,
+    event dependent processes are committed after all simulation processes
+    in edge time reacted on edge (the same order as in HdlSimulator).
+
+    :attention: designs with multiple clocks, falling edge sensitive processes,
+        combinational loops and latches are not supported, SimNotSupportedErr
+        is raised when such a construct is found
+
+    :ivar clk: clock signal of design (None if design has no registers)
+    :ivar clkAliases: set of signals which are only copies of clk
+        (e.g. clk ports of subunits), processes which drive them
+        are evaluated immediately on change of clk
+    :ivar preEdgeHooks: list of functions(sim) called on rising edge of clk
+        just before registers are updated (values are from previous cycle,
+        written inputs of this cycle included)
+    :ivar postEdgeHooks: list of functions(sim) called on rising edge of clk
+        after registers were updated and combinational logic settled
+    """
+
+    def __init__(self, config=None):
+        super(HdlCycleSimulator, self).__init__(config=config)
+        self.clk = None
+        self.clkAliases = set()
+        self._clkAliasProcs = set()
+        self.preEdgeHooks = []
+        self.postEdgeHooks = []
+
+    def _initCombProcRanks(self, unit):
+        super(HdlCycleSimulator, self)._initCombProcRanks(unit)
+        self.clk = self._checkSupported(unit)
+
+    def _checkSupported(self, unit):
+        """
+        Check if design can be simulated by this simulator
+
+        :return: clock signal of design or None if design has no registers
+        :raise SimNotSupportedErr: if design is not supported
+        """
+        clkSigs = []
+        seqProcs = set()
+        procs = []
+        outputs = {}
+        inputs = {}
+        for m in walkSimModels(unit):
+            procs.extend(m._processes)
+            outputs.update(getattr(m, "_outputs", {}))
+            for s in m._interfaces:
+                if s.simFallingSensProcs:
+                    raise SimNotSupportedErr(
+                        "%s: falling edge of %s is used in %r, only rising edge"
+                        " of single clock is supported by %s" % (
+                            m._name, s.name,
+                            list(s.simFallingSensProcs),
+                            self.__class__.__name__))
+                if s.simRisingSensProcs:
+                    if s not in clkSigs:
+                        clkSigs.append(s)
+                    seqProcs.update(s.simRisingSensProcs)
+                for p in s.simSensProcs:
+                    inputs.setdefault(p, set()).add(s)
+
+        aliasOf, aliasProcs = self._resolveClkAliases(
+            clkSigs, outputs, inputs, seqProcs)
+
+        clks = []
+        for s in clkSigs:
+            while s in aliasOf:
+                s = aliasOf[s]
+            if s not in clks:
+                clks.append(s)
+
+        if len(clks) > 1:
+            raise SimNotSupportedErr(
+                "%s: design has multiple clocks (%s), only single clock"
+                " is supported by %s" % (
+                    unit._name,
+                    ", ".join(map(lambda s: s.name, clks)),
+                    self.__class__.__name__))
+
+        # processes which drive aliases of clk are not levelized,
+        # they are evaluated immediately when clk changes
+        self.clkAliases = set(aliasOf)
+        self._clkAliasProcs = aliasProcs
+        for p in aliasProcs:
+            self.combProcRanks.pop(p, None)
+        seqProcs.update(aliasProcs)
+
+        ranks = self.combProcRanks
+        for p in procs:
+            if p not in seqProcs and p not in ranks:
+                raise SimNotSupportedErr(
+                    "%s: %r is part of combinational loop (or latch)"
+                    " or it depends on it, this is not supported by %s" % (
+                        p.__self__._name, p,
+                        self.__class__.__name__))
+
+        if clks:
+            self.clkAliases.add(clks[0])
+            return clks[0]
+        else:
+            return None
+
+    def _resolveClkAliases(self, clkSigs, outputs, inputs, seqProcs):
+        """
+        Find combinational processes which only assign clock signal
+        to other signal (e.g. clk ports of subunits are connected this way),
+        drivers of clock signals are followed until signal which is not
+        driven by such a process is found
+
+        :return: tuple ({alias signal: source signal}, set of processes
+            which drive aliases)
+        """
+        drivers = {}
+        for p, outs in outputs.items():
+            if p not in seqProcs:
+                for o in outs:
+                    drivers[o] = p
+
+        aliasOf = {}
+        aliasProcs = set()
+        toResolve = list(clkSigs)
+        while toResolve:
+            s = toResolve.pop()
+            p = drivers.get(s, None)
+            if s in aliasOf or p is None:
+                continue
+
+            ins = inputs.get(p, ())
+            if len(outputs[p]) != 1 or len(ins) != 1:
+                continue
+
+            src, = ins
+            if src is s or not self._isAssignment(p, src):
+                continue
+
+            aliasOf[s] = src
+            aliasProcs.add(p)
+            toResolve.append(src)
+
+        return aliasOf, aliasProcs
+
+    def _isAssignment(self, proc, src):
+        """
+        :return: True if output of process is always the same
+            as value of src (checked for 0 and 1)
+        """
+        orig = src._oldVal
+        try:
+            for v in (0, 1):
+                src._oldVal = src._dtype.fromPy(v)
+                res = self._evalCombProc(proc)
+                if res is None:
+                    return False
+                dst, updater, _ = res
+                _, newVal = updater(dst._oldVal)
+                if self._directWrite:
+                    dst.simClearNext()
+                if newVal.val != v or newVal.vldMask != 1:
+                    return False
+        finally:
+            src._oldVal = orig
+
+        return True
+
+    def _evalCombProc(self, proc):
+        """
+        Evaluate combinational process without application of its output
+
+        :return: tuple (output signal, value updater, isEvDependent)
+            or None if process did not drive anything
+        """
+        if self._directWrite:
+            s = self._evalDirect(proc)
+            if s is None:
+                return None
+            return s, s._nextUpdater, s._nextEv
+
+        return self.conflictResolvStrategy(set(proc(self)))
+
+    def _runClkAlias(self, proc):
+        """
+        Propagate value of clk to its alias immediately,
+        so registers of all subunits are triggered by the same edge
+        """
+        dst, updater, isEvDependent = self._evalCombProc(proc)
+        log = self.config.logApplyingValues
+        if log:
+            log(self, [(dst, updater, isEvDependent, proc)])
+
+        if self._directWrite:
+            dst.simCommitNext(self)
+        else:
+            dst.simUpdateVal(self, updater)
+
+    def addHwProcToRun(self, trigger, proc):
+        if proc in self._clkAliasProcs:
+            self._runClkAlias(proc)
+            return
+
+        if not self.applyValPlaned:
+            self.scheduleApplyValues()
+
+        rank = self.combProcRanks.get(proc, None)
+        if rank is not None:
+            dirty = self.combProcsDirty
+            if proc not in dirty:
+                dirty.add(proc)
+                self.combProcsToRun[rank].append(proc)
+
+        elif trigger is not None and trigger in self.clkAliases:
+            if self.now == 0:
+                return  # pass event dependent on startup
+
+            self.seqProcsToRun.append(proc)
+            if not self.runSeqProcessesPlaned:
+                self.runSeqProcessesPlaned = True
+                self._planApplySeq()
+
+        # else register process triggered by other signal than clk
+        # or on startup, value of register can change only on clock edge
+
+    def scheduleApplyValues(self):
+        self.applyValPlaned = True
+        self._planApplyComb()
+
+    def runCombProcesses(self):
+        """
+        Evaluate triggered combinational processes in order of their rank
+        (each only once), outputs of process are applied immediately
+        """
+        dirty = self.combProcsDirty
+        if not dirty:
+            return
+
+        log = self.config.logApplyingValues
+        direct = self._directWrite
+        for procs in self.combProcsToRun:
+            if not procs:
+                continue
+
+            for proc in procs:
+                if direct:
+                    s = self._evalDirect(proc)
+                    if s is None:
+                        raise SimNotSupportedErr(
+                            "%r did not drive its output (latch),"
+                            " this is not supported by %s" % (
+                                proc, self.__class__.__name__))
+                    if log:
+                        log(self, [(s, s._nextUpdater, s._nextEv, proc)])
+                    s.simCommitNext(self)
+                    continue
+
+                actionSet = set(proc(self))
+                res = self.conflictResolvStrategy(actionSet)
+                if res is None:
+                    raise SimNotSupportedErr(
+                        "%r did not drive its output (latch),"
+                        " this is not supported by %s" % (
+                            proc, self.__class__.__name__))
+
+                dst, updater, isEvDependent = res
+                if log:
+                    log(self, [(dst, updater, isEvDependent, proc)])
+                dst.simUpdateVal(self, updater)
+
+            procs.clear()
+
+        dirty.clear()
+
+    def settle(self):
+        """
+        Evaluate combinational logic after values were written
+        """
+        self.runCombProcesses()
+        self.applyValPlaned = False
+        self.updateComplete.succeed()
+
+    def commitCycle(self):
+        """
+        Update all registers on rising edge of clock
+        """
+        for h in self.preEdgeHooks:
+            h(self)
+        # inputs written in hooks have to be propagated before registers
+        # are evaluated
+        self.runCombProcesses()
+
+        updates = []
+        if self._directWrite:
+            for proc in self.seqProcsToRun:
+                s = self._evalDirect(proc)
+                if s is not None:
+                    updates.append(s)
+        else:
+            for proc in self.seqProcsToRun:
+                actionSet = set(proc(self))
+                if actionSet:
+                    updates.append(self.conflictResolvStrategy(actionSet))
+
+        self.seqProcsToRun = []
+        self.runSeqProcessesPlaned = False
+
+        # registers are updated together
+        if self._directWrite:
+            for s in updates:
+                s.simCommitNext(self)
+        else:
+            for s, updater, _ in updates:
+                s.simUpdateVal(self, updater)
+
+        self.runCombProcesses()
+
+        for h in self.postEdgeHooks:
+            h(self)
+        self.runCombProcesses()
+
+        if not self.applyValPlaned:
+            # otherwise updateComplete is triggered in settle()
+            self.updateComplete.succeed()
+
+    # phase handlers of HdlEnvironmentCore
+    _applyComb = settle
+    _applySeq = commitCycle
@@ -1,4 +1,8 @@
 
 class SimException(Exception):
     """Error in simulation"""
-    pass
\ No newline at end of file
+    pass
+
+class SimNotSupportedErr(SimException):
+    """Design contains construct which is not supported by used simulator"""
+    pass
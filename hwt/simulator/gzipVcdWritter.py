@@ -0,0 +1,161 @@
+from bisect import bisect_right
+from io import StringIO
+from queue import Queue
+from threading import Thread
+import zlib
+
+from hwt.simulator.vcdWritter import BufferedVcdWritter
+
+
+def _gzipMember(text, compressLevel):
+    c = zlib.compressobj(compressLevel, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    return c.compress(text.encode()) + c.flush()
+
+
+class GzipVcdWritter(BufferedVcdWritter):
+    """
+    VcdWritter which writes gzip compressed vcd, compression runs
+    in background thread fed by bounded queue
+
+    File is a sequence of independent gzip members (frames), so it can be
+    decompressed by any gzip tool. First member contains header, every other
+    member contains frameSize value changes and starts with $dumpall section
+    with values of all variables, so frame can be decompressed on its own.
+    Time and offset of every frame is stored in index file <fileName>.idx
+    (line "time offset" for every frame), see readGzipVcdTimeRange.
+
+    :ivar fileName: name of output file
+    :ivar compressLevel: zlib compression level
+    :ivar index: list of tuples (time of start of frame, offset of frame in file)
+    """
+    def __init__(self, fileName, frameSize=1 << 16, queueSize=16, compressLevel=6):
+        # header is collected as text and it is written as first frame
+        super(GzipVcdWritter, self).__init__(StringIO(), bufferSize=frameSize)
+        self.fileName = fileName
+        self.compressLevel = compressLevel
+        self.index = []
+
+        self._queue = Queue(queueSize)
+        self._thread = None
+        self._file = None
+        # exception from compression thread
+        self._err = None
+        # {signal: last value change line}
+        self._state = {}
+        # value change lines of all variables in start of actual frame
+        self._checkpoint = []
+        self._frameTime = 0
+
+    def enddefinitions(self):
+        super(GzipVcdWritter, self).enddefinitions()
+        self._file = open(self.fileName, "wb")
+        self._thread = Thread(target=self._compressLoop, daemon=True)
+        self._thread.start()
+        self._queue.put((None, [], [self.dumpFile.getvalue()]))
+
+    def _compressLoop(self):
+        q = self._queue
+        f = self._file
+        while True:
+            item = q.get()
+            if item is None:
+                return
+            elif self._err is not None:
+                # only consume items to not block simulation
+                continue
+
+            t, checkpoint, lines = item
+            try:
+                if checkpoint:
+                    lines = ["$dumpall"] + checkpoint + ["$end"] + lines
+                lines.append("")
+                data = _gzipMember("\n".join(lines), self.compressLevel)
+                if t is not None:
+                    self.index.append((t, f.tell()))
+                f.write(data)
+            except Exception as e:
+                self._err = e
+
+    def change(self, time, sig, newVal):
+        # raises KeyError for signal which is not registered
+        line = self._formatters[sig](newVal.val, newVal.vldMask)
+        self._state[sig] = line
+
+        buff = self._buff
+        if time != self.lastTime:
+            self.setTime(time)
+        buff.append(line)
+
+        if len(buff) >= self.bufferSize:
+            self.flush()
+
+    def flush(self):
+        buff = self._buff
+        if not buff:
+            return
+        elif self._err is not None:
+            raise self._err
+
+        self._queue.put((self._frameTime, self._checkpoint, buff))
+        self._buff = []
+        self._checkpoint = list(self._state.values())
+        self._frameTime = self.lastTime
+
+    def close(self):
+        """
+        Write rest of data, wait for compression thread and write index
+        """
+        if self._thread is None:
+            return
+        self.flush()
+        self._queue.put(None)
+        self._thread.join()
+        self._thread = None
+        self._file.close()
+
+        if self._err is not None:
+            raise self._err
+
+        with open(self.fileName + ".idx", "w") as f:
+            for t, offset in self.index:
+                f.write("%d %d\n" % (t, offset))
+
+
+def readGzipVcdTimeRange(fileName, start, end=None):
+    """
+    Read part of vcd written by GzipVcdWritter, only frames which are
+    required are decompressed (seek by index file)
+
+    :return: text of vcd which contains header, values of all variables
+        in time start and all value changes from time start to time end
+        (can contain some changes out of this range)
+    """
+    index = []
+    with open(fileName + ".idx") as f:
+        for line in f:
+            t, offset = line.split()
+            index.append((int(t), int(offset)))
+
+    with open(fileName, "rb") as f:
+        data = f.read()
+
+    if not index:
+        return zlib.decompress(data, 16 + zlib.MAX_WBITS).decode()
+
+    times = [t for t, _ in index]
+    first = max(bisect_right(times, start) - 1, 0)
+    if end is None:
+        last = len(index)
+    else:
+        last = max(bisect_right(times, end), first + 1)
+
+    offsets = [o for _, o in index] + [len(data)]
+    res = [zlib.decompress(data[:offsets[0]], 16 + zlib.MAX_WBITS).decode()]
+    for i in range(first, last):
+        frame = zlib.decompress(data[offsets[i]:offsets[i + 1]],
+                                16 + zlib.MAX_WBITS).decode()
+        if i == first and not frame.startswith("#"):
+            res.append("#%d\n" % times[i])
+        res.append(frame)
+
+    return "".join(res)
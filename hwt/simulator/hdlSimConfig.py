@@ -6,9 +6,11 @@ class HdlSimConfig():
     def __init__(self):
         # set to None to prevent redundant calls
         self.beforeSim = None
+        self.afterSim = None
         self.logChange = None
         self.logPropagation = None
         self.logApplyingValues = None
+        self.logWrite = None
 
     def beforeSim(self, simulator, synthesisedUnit):
         """
@@ -16,6 +18,12 @@ class HdlSimConfig():
         """
         pass
 
+    def afterSim(self, simulator, synthesisedUnit):
+        """
+        called after end of simulation (in simUnit)
+        """
+        pass
+
     def logChange(self, nowTime, sig, nextVal):
         """
         Log change of value for signal
@@ -33,3 +41,9 @@ class HdlSimConfig():
         Log simulator value quantum applied
         """
         pass
+
+    def logWrite(self, simulator, sig, val):
+        """
+        Log value written by simulation process (HdlSimulator.write)
+        """
+        pass
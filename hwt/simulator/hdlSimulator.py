@@ -1,9 +1,14 @@
-from simpy.events import NORMAL
+from heapq import heappop
 
 from hwt.hdlObjects.value import Value
+from hwt.simulator.clockSource import ClockSource
+from hwt.simulator.exceptions import SimException
 from hwt.simulator.hdlSimConfig import HdlSimConfig
-from hwt.simulator.simModel import mkUpdater, mkArrayUpdater
-from hwt.simulator.simulatorCore import HdlEnvironmentCore
+from hwt.simulator.simCheckpoint import SimCheckpoint, runForked
+from hwt.simulator.simModel import mkUpdater, mkArrayUpdater, \
+    rankCombProcesses, walkSimModels
+from hwt.simulator.simulatorCore import HdlEnvironmentCore, PhaseEvent, \
+    Timeout, PRIORITY_URGENT
 from hwt.simulator.utils import valueHasChanged
 from hwt.synthesizer.interfaceLevel.mainBases import InterfaceBase
 from hwt.hdlObjects.types.bits import Bits
@@ -32,6 +37,9 @@ class HdlSimulator(HdlEnvironmentCore):
        and let simulator to update it for others, any other signals are evaluated as expression
        by every process
     every process drives only one signal
+    (processes of models with direct-write ABI (SimModel._directWrite) do not yield,
+    they write outputs to next-value slots of signals (SimSignal.simDrive)
+    and simulator commits written slots in single pass)
     every process uses sensitivity-list like in other languages (but it is generated automatically)
     -> (communication between process solved)
 
@@ -57,18 +65,33 @@ class HdlSimulator(HdlEnvironmentCore):
     Hdl synthesizer of HWToolkit does it automatically.
 
     :ivar updateComplete: this event is triggered when there are not any values to apply in this time
+        (it is the same object for whole simulation)
     :ivar valuesToApply: is container to for quantum of values which should be applied in single time
-    :ivar env: simply environment
-    :ivar applyValuesPlaned: flag if there is planed applyValues for current values quantum
+    :ivar applyValPlaned: flag if there is planed applyValues for current values quantum
+    :ivar runSeqProcessesPlaned: flag if there is planed runSeqProcesses in this time
     :ivar seqProcsToRun: list of event dependent processes which should be evaluated after
-        applyValEv
+        application of combinational values
+    :ivar combProcRanks: dict {process: rank} of levelized combinational processes,
+        (processes in combinational loops are not present and they are evaluated
+        immediately after they are triggered as before)
+    :ivar combProcsToRun: list of lists of ranked combinational processes
+        which should be evaluated after application of values, index is rank
+    :ivar combProcsDirty: set of processes present in combProcsToRun
+        (each process is evaluated only once per delta step)
+    :ivar model: simulation model which is simulated (set in simUnit)
+    :ivar clocks: list of ClockSource instances (see addClock)
+    :ivar stopConditions: list of functions(simulator) evaluated at safe points
+        (after all actions and delta steps of every time), simulation is stopped
+        when any of them returns True (see stopWhen)
+    :ivar idleCycles: if not None idle fast-forward is enabled (see fastForwardIdle)
+    :ivar slotsToCommit: list of signals whose next-value slots should be applied
+        in next applyValues (direct-write process ABI, see SimSignal.simDrive)
     """
     # time after values which are event dependent will be applied
     # this is random number smaller than any clock half-period
     EV_DEPENDENCY_SLOWDOWN = 500
-
-    PRIORITY_APPLY_COMB = NORMAL + 1
-    PRIORITY_APPLY_SEQ = PRIORITY_APPLY_COMB + 1
+    # max number of cached values written by write()
+    VAL_CACHE_SIZE = 4096
 
     # http://heather.cs.ucdavis.edu/~matloff/156/PLN/DESimIntro.pdf
     def __init__(self, config=None):
@@ -77,18 +100,47 @@ class HdlSimulator(HdlEnvironmentCore):
             config = HdlSimConfig()
 
         self.config = config
-        self.updateComplete = self.event()
-        self.applyValEv = None
-        self.runSeqProcessesEv = None
+        self.updateComplete = PhaseEvent(self)
+        self.applyValPlaned = False
+        self.runSeqProcessesPlaned = False
 
         # (signal, value) tupes which should be applied before new round of processes
         #  will be executed
         self.valuesToApply = []
         self.seqProcsToRun = []
 
+        self.combProcRanks = {}
+        self.combProcsToRun = []
+        self.combProcsDirty = set()
+        self.model = None
+        # {(type, python value class, python value): value}
+        self._valCache = {}
+
+        self.clocks = []
+        self._clkSignals = set()
+        self.stopConditions = []
+        self._stopRequested = False
+        self.idleCycles = None
+        # time of last change of signal which is not a clock
+        self._lastActivity = None
+        # config whose logChange is wrapped to track activity
+        self._activityConfig = None
+        # until of actual run()
+        self._runUntil = None
+
+        # processes of model write their outputs to next-value slots
+        # of signals instead of yielding them (see SimSignal.simDrive)
+        self._directWrite = False
+        self.slotsToCommit = []
+        # id of actual evaluation of process, process which is evaluated
+        # and signal written by it (used by SimSignal.simDrive)
+        self._evalStamp = 0
+        self._actProc = None
+        self._lastDriven = None
+
     def addHwProcToRun(self, trigger, proc):
         # first process in time has to plan executing of apply values on the end of this time
-        if self.applyValEv is None:
+        if not self.applyValPlaned:
             # (apply on end of this time to minimalize process reevaluation)
             self.scheduleApplyValues()
 
@@ -98,6 +150,22 @@ class HdlSimulator(HdlEnvironmentCore):
             self.seqProcsToRun.append(proc)
 
         else:
+            rank = self.combProcRanks.get(proc, None)
+            if rank is not None:
+                # evaluation is postponed until all processes
+                # with lower rank are evaluated
+                dirty = self.combProcsDirty
+                if proc not in dirty:
+                    dirty.add(proc)
+                    self.combProcsToRun[rank].append(proc)
+                return
+
+            if self._directWrite:
+                s = self._evalDirect(proc)
+                if s is not None:
+                    self.slotsToCommit.append(s)
+                return
+
             actionSet = set(proc(self))
             res = self.conflictResolvStrategy(actionSet)
             if res:
@@ -106,6 +174,87 @@ class HdlSimulator(HdlEnvironmentCore):
                 #    assert not isEvDependent, "trigger %r, proc %r" % (trigger, proc)
                 self.valuesToApply.append((dst, updater, isEvDependent, proc))
 
+    def _evalDirect(self, proc):
+        """
+        Evaluate process with direct-write ABI
+
+        :return: signal whose next-value slot was written by process
+            or None if process did not drive anything
+        """
+        self._evalStamp += 1
+        self._actProc = proc
+        self._lastDriven = None
+        proc(self)
+        return self._lastDriven
+
+    def _initDirectWrite(self, unit):
+        """
+        Resolve process ABI of model (SimModel._directWrite),
+        all submodels has to use the same
+        """
+        abis = set(m._directWrite for m in walkSimModels(unit))
+        if len(abis) > 1:
+            raise SimException("%s: submodels use different process ABI"
+                               " (yield and direct write)" % (unit._name))
+        self._directWrite = abis.pop()
+        self.slotsToCommit = []
+
+    def _initCombProcRanks(self, unit):
+        """
+        Levelize combinational processes of unit
+        """
+        ranks = rankCombProcesses(unit)
+        self.combProcRanks = ranks
+        if ranks:
+            self.combProcsToRun = [[] for _ in range(max(ranks.values()) + 1)]
+        else:
+            self.combProcsToRun = []
+        self.combProcsDirty = set()
+
+    def runCombProcesses(self):
+        """
+        Evaluate triggered ranked combinational processes in order of their rank,
+        outputs of process are applied immediately, because all processes
+        which can be affected by them have higher rank
+        """
+        dirty = self.combProcsDirty
+        if not dirty:
+            return
+
+        log = self.config.logApplyingValues
+        direct = self._directWrite
+        for procs in self.combProcsToRun:
+            if not procs:
+                continue
+
+            for proc in procs:
+                if direct:
+                    s = self._evalDirect(proc)
+                    if s is not None:
+                        if log:
+                            log(self, [(s, s._nextUpdater, s._nextEv, proc)])
+                        if s._nextEv:
+                            s.simClearNext()
+                            self.seqProcsToRun.append(proc)
+                        else:
+                            s.simCommitNext(self)
+                    continue
+
+                actionSet = set(proc(self))
+                res = self.conflictResolvStrategy(actionSet)
+                if res:
+                    dst, updater, isEvDependent = res
+                    if log:
+                        log(self, [(dst, updater, isEvDependent, proc)])
+                    if isEvDependent:
+                        self.seqProcsToRun.append(proc)
+                    else:
+                        dst.simUpdateVal(self, updater)
+
+            procs.clear()
+
+        dirty.clear()
+
     def _initUnitSignals(self, unit):
         """
         Inject default values to simulation
@@ -113,6 +262,7 @@ class HdlSimulator(HdlEnvironmentCore):
         :return: generator of all HWprocess
         """
         for s in unit._cntx.signals:
+            s.simClearNext()
             v = s.defaultVal.clone()
 
             # force update all signals to deafut values and propagate it
@@ -125,24 +275,15 @@ class HdlSimulator(HdlEnvironmentCore):
             self.addHwProcToRun(None, p)
 
     def scheduleApplyValues(self):
-        applyVal = self.applyValEv = self.event()
-        applyVal._ok = True
-        applyVal._value = None
-        applyVal.callbacks.append(self.applyValues)
+        self.applyValPlaned = True
+        self._planApplyComb()
 
-        self.schedule(applyVal, priority=self.PRIORITY_APPLY_COMB)
-
-        if self.runSeqProcessesEv is not None:
+        if self.runSeqProcessesPlaned:
             return
 
-        # print(self.now, "sched")
         assert not self.seqProcsToRun
-        runSeq = self.runSeqProcessesEv = self.event()
-        runSeq._ok = True
-        runSeq._value = None
-        runSeq.callbacks.append(self.runSeqProcesses)
-
-        self.schedule(runSeq, priority=self.PRIORITY_APPLY_SEQ)
+        self.runSeqProcessesPlaned = True
+        self._planApplySeq()
 
     def conflictResolvStrategy(self, actionSet):
         """
@@ -171,7 +312,20 @@ class HdlSimulator(HdlEnvironmentCore):
             # print(self.now, dst, val)
             return (dst, mkUpdater(val, invalidate), isEvDependent)
 
-    def runSeqProcesses(self, ev):
+    def runSeqProcesses(self):
+        if self._directWrite:
+            updates = []
+            for proc in self.seqProcsToRun:
+                s = self._evalDirect(proc)
+                if s is not None:
+                    updates.append(s)
+
+            self.seqProcsToRun = []
+            self.runSeqProcessesPlaned = False
+            for s in updates:
+                s.simCommitNext(self)
+            return
+
         updates = []
         for proc in self.seqProcsToRun:
             # print(self.now, "runSeq", proc)
@@ -181,11 +335,11 @@ class HdlSimulator(HdlEnvironmentCore):
                 updates.append(v)
 
         self.seqProcsToRun = []
-        self.runSeqProcessesEv = None
+        self.runSeqProcessesPlaned = False
         for s, updater, _ in updates:
             s.simUpdateVal(self, updater)
 
-    def applyValues(self, ev):
+    def applyValues(self):
         va = self.valuesToApply
 
         # log if there are items to log
@@ -203,24 +357,91 @@ class HdlSimulator(HdlEnvironmentCore):
             else:
                 s.simUpdateVal(self, vUpdater)
 
+        sc = self.slotsToCommit
+        if sc:
+            if self.config.logApplyingValues:
+                self.config.logApplyingValues(
+                    self, [(s, s._nextUpdater, s._nextEv, s._nextOwner)
+                           for s in sc if s._nextOwner is not None])
+            self.slotsToCommit = []
+            # single pass over written slots, slot of signal can be
+            # in list multiple times (process evaluated multiple times)
+            for s in sc:
+                proc = s._nextOwner
+                if proc is None:
+                    continue
+                elif s._nextEv:
+                    s.simClearNext()
+                    self.seqProcsToRun.append(proc)
+                else:
+                    s.simCommitNext(self)
+
+        self.runCombProcesses()
+
         # processes triggered from simUpdateVal can add nev values
-        if self.valuesToApply:
+        if self.valuesToApply or self.slotsToCommit:
             self.scheduleApplyValues()
             return
 
         # activate updateComplete if this was last applyValues() in this time
-        self.updateComplete.succeed()  # trigger
-        self.updateComplete = self.event()  # regenerate event
-        self.applyValEv = None
+        self.updateComplete.succeed()
+        self.applyValPlaned = False
 
     def read(self, sig):
         """
         Read value from signal or interface
+        (copy of value, use readInt or readRaw if you do not need value object)
         """
         if isinstance(sig, InterfaceBase):
             sig = sig._sigInside
         return sig._val.clone()
 
+    def readInt(self, sig):
+        """
+        Read value of signal or interface as int (without copy of value)
+
+        :return: int or None if value is not fully valid
+        """
+        if isinstance(sig, InterfaceBase):
+            sig = sig._sigInside
+        v = sig._val
+        if v.vldMask == v._dtype.all_mask():
+            return v.val
+        else:
+            return None
+
+    def readRaw(self, sig):
+        """
+        Read value of signal or interface (without copy of value)
+
+        :return: tuple (val, vldMask) of actual value
+        """
+        if isinstance(sig, InterfaceBase):
+            sig = sig._sigInside
+        v = sig._val
+        return (v.val, v.vldMask)
+
+    def _internVal(self, val, t):
+        """
+        :return: value of type t for python value, values are cached
+            and they are never modified (updater copies value only if it is
+            actually written to signal)
+        """
+        k = (t, val.__class__, val)
+        cache = self._valCache
+        try:
+            return cache[k]
+        except KeyError:
+            pass
+        except TypeError:
+            # unhashable value
+            return t.fromPy(val)
+
+        v = t.fromPy(val)
+        if len(cache) < self.VAL_CACHE_SIZE:
+            cache[k] = v
+        return v
+
     def write(self, val, sig):
         """
         Write value to signal or interface.
@@ -229,25 +450,51 @@ class HdlSimulator(HdlEnvironmentCore):
             sig = sig._sigInside
 
         if isinstance(val, Value):
-            v = val.clone()
+            v = val._convert(sig._dtype)
         else:
             # assert type(sig._dtype) is not Bits, "Bits type is slow and should be automatically replaced by SimBitsT (on: %s)" % (sig._getFullName())
-            v = sig._dtype.fromPy(val)
-
-        v.updateTime = self.now
+            v = self._internVal(val, sig._dtype)
 
-        v = v._convert(sig._dtype)
+        log = self.config.logWrite
+        if log:
+            log(self, sig, v)
 
-        sig.simUpdateVal(self, lambda curentV: (valueHasChanged(curentV, v), v))
+        sig.simUpdateVal(self, mkUpdater(v, False))
 
-        if not sig.simSensProcs and self.applyValEv is not None:
+        if not sig.simSensProcs and self.applyValPlaned:
             # in some cases simulation process can wait on all values applied
             # signal value was changed but there are no sensitive processes to it
             # because of this applyValues is never planed and but should be
             self.scheduleApplyValues()
 
     def wait(self, time):
-        return self.timeout(time)
+        return Timeout(time)
+
+    def addClock(self, sig, period, phase=0, dutyCycle=0.5):
+        """
+        Add clock generator for signal or interface (ClockSource),
+        clock is low in actual time and it starts in actual time + phase
+        (first rising edge is in phase + period * (1 - dutyCycle))
+
+        :return: ClockSource instance
+        """
+        c = ClockSource(self, sig, period, phase=phase, dutyCycle=dutyCycle)
+        self._schedule(self.now, PRIORITY_URGENT, c._init, None)
+        self.clocks.append(c)
+        self._clkSignals.add(c.sig)
+        return c
+
+    def _mkClockUpdater(self, sig, v):
+        """
+        :return: updater for clock signal which writes preallocated value
+            (value is owned by signal, because signal is driven only by clock)
+        """
+        val = sig._dtype.fromPy(v)
+
+        def updater(currentVal):
+            return (valueHasChanged(currentVal, val), val)
+
+        return updater
 
     def simUnit(self, synthesisedUnit, time, extraProcesses=[]):
         """
@@ -257,13 +504,175 @@ class HdlSimulator(HdlEnvironmentCore):
         if beforeSim is not None:
             beforeSim(self, synthesisedUnit)
 
+        self.model = synthesisedUnit
         for p in extraProcesses:
             self.process(p(self))
 
+        self._initDirectWrite(synthesisedUnit)
+        self._initCombProcRanks(synthesisedUnit)
         self._initUnitSignals(synthesisedUnit)
 
         self.run(until=time)
 
+        afterSim = self.config.afterSim
+        if afterSim is not None:
+            afterSim(self, synthesisedUnit)
+
+    def run(self, until):
+        """
+        Run (or continue) simulation until specified time
+
+        :return: True if simulation was stopped before until (see stopWhen)
+        """
+        self._runUntil = until
+        return super(HdlSimulator, self).run(until)
+
+    def stopWhen(self, predicate):
+        """
+        Stop simulation when predicate returns True,
+        predicate is evaluated at safe points (after all actions
+        and delta steps of every time)
+
+        :param predicate: function(simulator) -> bool (e.g. AgentsDrained instance)
+        """
+        self.stopConditions.append(predicate)
+        self._afterSlot = self._safePoint
+
+    def stop(self):
+        """
+        Stop simulation at the end of actual time
+        (can be called from simulation process)
+        """
+        self._stopRequested = True
+        self._afterSlot = self._safePoint
+
+    def fastForwardIdle(self, idleCycles):
+        """
+        Enable idle fast-forward, when no signal except clocks (see addClock)
+        changes for idleCycles periods of slowest clock, simulation skips
+        to the last clock edges before next planed action which is not
+        a clock edge (or before end of simulation)
+
+        :attention: skipped clock edges are not seen by anyone,
+            design has to be in steady state when it is idle
+        """
+        self.idleCycles = idleCycles
+        self._afterSlot = self._safePoint
+
+    def _safePoint(self):
+        if self._stopRequested:
+            self._stopRequested = False
+            return True
+
+        for c in self.stopConditions:
+            if c(self):
+                return True
+
+        if self.idleCycles is not None and self.clocks:
+            self._fastForwardIfIdle()
+
+        return False
+
+    def _trackActivity(self):
+        """
+        Wrap logChange of config to track time of last change
+        of signal which is not a clock
+        """
+        config = self.config
+        log = config.logChange
+        clkSignals = self._clkSignals
+
+        def logChange(nowTime, sig, nextVal):
+            if sig not in clkSignals:
+                self._lastActivity = nowTime
+            if log:
+                log(nowTime, sig, nextVal)
+
+        config.logChange = logChange
+        self._activityConfig = config
+        self._lastActivity = self.now
+
+    @staticmethod
+    def _clockEdgesOfSlot(slot):
+        """
+        :return: list of tuples (ClockSource, edge action, period index)
+            or None if time slot contains anything else than clock edges
+        """
+        if slot.applyComb or slot.applySeq:
+            return None
+
+        edges = []
+        for q in slot.queues:
+            for fn, arg in q:
+                c = getattr(fn, "__self__", None)
+                if not isinstance(c, ClockSource) or not c.isEdgeAction(fn):
+                    return None
+                edges.append((c, fn, arg))
+
+        return edges
+
+    def _fastForwardIfIdle(self):
+        if self._activityConfig is not self.config:
+            self._trackActivity()
+            return
+
+        period = max(map(lambda c: c.period, self.clocks))
+        if self.now - self._lastActivity < self.idleCycles * period:
+            return
+
+        # remove time slots with clock edges only before next other action
+        target = self._runUntil
+        times = self._times
+        slots = self._slots
+        edges = []
+        while times and times[0] < target:
+            slotEdges = self._clockEdgesOfSlot(slots[times[0]])
+            if slotEdges is None:
+                break
+            edges.extend(slotEdges)
+            del slots[heappop(times)]
+
+        if times and times[0] < target:
+            target = times[0]
+            # next action can change state of agents without change of any signal
+            # (e.g. stimulus adds data to agent), idle time is counted from it
+            self._lastActivity = target
+
+        # plan removed edges again on last equivalent edges before target
+        for c, fn, k in edges:
+            c._fastForward(fn, k, target)
+
+    def checkpoint(self, agents=()):
+        """
+        Capture state of simulation, simulation can be continued
+        by run(until=time) and returned to this state by restore()
+
+        :param agents: agents whose state should be captured as well
+            (see collectAgents())
+        :return: SimCheckpoint instance
+        """
+        return SimCheckpoint(self, agents)
+
+    def restore(self, checkpoint):
+        """
+        Return simulation to state captured by checkpoint()
+        """
+        checkpoint.restore(self)
+
+    def runForked(self, fn):
+        """
+        Run fn(sim) in forked process, it can continue simulation
+        from actual state without affecting it (e.g. multiple variants
+        of test after shared reset and configuration)
+
+        :return: return value of fn (has to be picklable)
+        """
+        return runForked(self, fn)
+
+    # phase handlers of HdlEnvironmentCore
+    _applyComb = applyValues
+    _applySeq = runSeqProcesses
+
     # shortcuts
     r = read
     w = write
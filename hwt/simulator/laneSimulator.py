@@ -0,0 +1,406 @@
+import numpy as np
+
+from hwt.bitmask import mask
+from hwt.hdlObjects.types.bits import Bits
+from hwt.hdlObjects.types.boolean import Boolean
+from hwt.hdlObjects.value import Value
+from hwt.simulator.agentConnector import valToInt
+from hwt.simulator.exceptions import SimNotSupportedErr
+from hwt.simulator.hdlSimulator import HdlSimulator
+from hwt.simulator.simSignal import SimSignal
+from hwt.synthesizer.interfaceLevel.mainBases import InterfaceBase
+
+
+U64 = np.uint64
+# max width of signal in lane simulation
+LANE_MAX_WIDTH = 64
+
+
+def isLaneType(t):
+    return isinstance(t, (Bits, Boolean)) and t.bit_length() <= LANE_MAX_WIDTH
+
+
+def laneArr(x, lanes):
+    """
+    Convert result of expression in lane sim model to array
+    (constants are scalars)
+    """
+    if isinstance(x, np.ndarray):
+        return x
+    return np.full(lanes, x, dtype=U64)
+
+
+def laneSigned(x, width):
+    """
+    Interpret raw bits as signed integers
+    """
+    msb = U64(1 << (width - 1))
+    return ((np.asarray(x, dtype=U64) ^ msb) - msb).view(np.int64)
+
+
+def toRaw(v):
+    """
+    Convert scalar value to tuple (raw bits, validity mask)
+    """
+    t = v._dtype
+    if isinstance(t, Boolean):
+        return int(bool(v.val)), int(v.vldMask)
+    m = mask(t.bit_length())
+    return v.val & m, v.vldMask & m
+
+
+def fromRaw(t, val, vld, updateTime):
+    """
+    Convert raw bits to scalar value of type t
+    """
+    if isinstance(t, Boolean):
+        return t.getValueCls()(bool(val), t, vld, updateTime)
+    if t.signed:
+        w = t.bit_length()
+        if val >> (w - 1):
+            val -= 1 << w
+    return t.getValueCls()(val, t, vld, updateTime)
+
+
+class LaneVal(object):
+    """
+    Value of signal in lane simulation, value of each lane is stored
+    as raw bits (two's complement for signed types) in numpy uint64 array
+
+    :attention: arrays are shared between values, they should not be modified
+    """
+    __slots__ = ["val", "vldMask", "_dtype", "updateTime"]
+
+    def __init__(self, val, vldMask, _dtype, updateTime=-1):
+        self.val = val
+        self.vldMask = vldMask
+        self._dtype = _dtype
+        self.updateTime = updateTime
+
+    @classmethod
+    def fromValue(cls, v, lanes):
+        """
+        Broadcast scalar value to all lanes
+        """
+        if not isLaneType(v._dtype):
+            raise SimNotSupportedErr("Type %r is not supported in lane simulation"
+                                     % (v._dtype))
+        val, vld = toRaw(v)
+        return cls(np.full(lanes, val, dtype=U64),
+                   np.full(lanes, vld, dtype=U64),
+                   v._dtype,
+                   v.updateTime)
+
+    def clone(self):
+        return self.__class__(self.val, self.vldMask, self._dtype, self.updateTime)
+
+    def getLane(self, lane):
+        """
+        :return: scalar value of specified lane
+        """
+        return fromRaw(self._dtype, int(self.val[lane]), int(self.vldMask[lane]),
+                       self.updateTime)
+
+    def __repr__(self):
+        return "<LaneVal %r, mask %r, time %r>" % (self.val, self.vldMask,
+                                                  self.updateTime)
+
+
+def laneValueHasChanged(valA, valB):
+    return not (np.array_equal(valA.val, valB.val) and
+                np.array_equal(valA.vldMask, valB.vldMask))
+
+
+def mkLaneUpdater(nextVal, invalidate):
+    """
+    Create value updater for lane simulation
+    """
+    if invalidate:
+        def updater(currentVal):
+            _nextVal = nextVal.clone()
+            _nextVal.vldMask = np.zeros_like(_nextVal.vldMask)
+            return (laneValueHasChanged(currentVal, _nextVal), _nextVal)
+    else:
+        def updater(currentVal):
+            if laneValueHasChanged(currentVal, nextVal):
+                return (True, nextVal.clone())
+            else:
+                return (False, currentVal)
+
+    return updater
+
+
+class LaneSimSignal(SimSignal):
+    """
+    SimSignal which holds LaneVal, processes sensitive on edge
+    are triggered if there is edge in any lane
+    """
+    __slots__ = []
+
+    def _simEdgeOf(self, v):
+        # clock signals have same value in all lanes
+        if not v.vldMask.all():
+            return None
+        elif v.val.all():
+            return True
+        elif not v.val.any():
+            return False
+        return None
+
+    def simPropagateChanges(self, simulator):
+        v = self._val
+        self._oldVal = v
+
+        # run all sensitive processes
+        log = simulator.config.logPropagation
+        for p in self.simSensProcs:
+            if log:
+                log(simulator, self, p)
+
+            simulator.addHwProcToRun(self, p)
+
+        if self.simRisingSensProcs or self.simFallingSensProcs:
+            anyInvalid = not v.vldMask.all()
+            if anyInvalid or v.val.any():
+                for p in self.simRisingSensProcs:
+                    if log:
+                        log(simulator, self, p)
+
+                    simulator.addHwProcToRun(self, p)
+
+            if anyInvalid or not v.val.all():
+                for p in self.simFallingSensProcs:
+                    if log:
+                        log(simulator, self, p)
+
+                    simulator.addHwProcToRun(self, p)
+
+
+class HdlLaneSimulator(HdlSimulator):
+    """
+    Simulator of lane sim model (generated by SimModelLaneSerializer),
+    every signal holds value for each lane (independent testbench)
+    and processes are evaluated for all lanes at once
+
+    Simulation processes can read/write all lanes (read/write with LaneVal)
+    or use laneView(lane) which behaves like normal simulator
+    restricted to single lane (used by lane agents)
+
+    :attention: time and clock edges are shared for all lanes
+    :attention: config should not log values (values are LaneVal instances)
+
+    :ivar lanes: number of lanes
+    """
+
+    def __init__(self, lanes, config=None):
+        super(HdlLaneSimulator, self).__init__(config=config)
+        self.lanes = lanes
+        self._laneViews = {}
+
+    def _initUnitSignals(self, unit):
+        for s in unit._cntx.signals:
+            v = LaneVal.fromValue(s.defaultVal, self.lanes)
+
+            # force update all signals to deafut values and propagate it
+            s.simUpdateVal(self, mkLaneUpdater(v, False))
+
+        for u in unit._units:
+            self._initUnitSignals(u)
+
+        for p in unit._processes:
+            self.addHwProcToRun(None, p)
+
+    def conflictResolvStrategy(self, actionSet):
+        invalidate = False
+        l = len(actionSet)
+        if l == 0:
+            return
+        elif l == 1:
+            res = actionSet.pop()
+        else:
+            # we are driving signal with two different values so we invalidate result
+            res = list(actionSet.pop())
+            invalidate = True
+
+        dst, val, isEvDependent = res
+        return (dst, mkLaneUpdater(val, invalidate), isEvDependent)
+
+    def _writeLaneVal(self, v, sig):
+        v.updateTime = self.now
+        sig.simUpdateVal(self, lambda curentV: (laneValueHasChanged(curentV, v), v))
+
+        if not sig.simSensProcs and self.applyValPlaned:
+            # see HdlSimulator.write()
+            self.scheduleApplyValues()
+
+    def read(self, sig):
+        """
+        Read value of all lanes from signal or interface
+        """
+        if isinstance(sig, InterfaceBase):
+            sig = sig._sigInside
+        v = sig._val
+        return LaneVal(v.val.copy(), v.vldMask.copy(), v._dtype, v.updateTime)
+
+    def readInt(self, sig):
+        """
+        Read value of all lanes as ints
+
+        :return: list of ints (None for lanes where value is not fully valid)
+        """
+        if isinstance(sig, InterfaceBase):
+            sig = sig._sigInside
+        v = sig._val
+        return [valToInt(fromRaw(v._dtype, int(val), int(vld), v.updateTime))
+                for val, vld in zip(v.val, v.vldMask)]
+
+    def readRaw(self, sig):
+        """
+        Read value of all lanes (without copy)
+
+        :return: tuple (val, vldMask) of arrays of raw bits of all lanes
+            (arrays should not be modified)
+        """
+        if isinstance(sig, InterfaceBase):
+            sig = sig._sigInside
+        v = sig._val
+        return (v.val, v.vldMask)
+
+    def readLaneRaw(self, sig, lane):
+        """
+        Read value of signal or interface in specified lane without
+        construction of value object
+
+        :return: tuple (val, vldMask), val is converted to signed int
+            for signed types
+        """
+        if isinstance(sig, InterfaceBase):
+            sig = sig._sigInside
+        v = sig._val
+        t = v._dtype
+        val = int(v.val[lane])
+        if getattr(t, "signed", False):
+            w = t.bit_length()
+            if val >> (w - 1):
+                val -= 1 << w
+        elif isinstance(t, Boolean):
+            val = bool(val)
+        return (val, int(v.vldMask[lane]))
+
+    def write(self, val, sig):
+        """
+        Write value to all lanes of signal or interface
+
+        :param val: LaneVal, sequence of values for each lane
+            or value which should be written to all lanes
+        """
+        if isinstance(sig, InterfaceBase):
+            sig = sig._sigInside
+        t = sig._dtype
+
+        if isinstance(val, LaneVal):
+            v = LaneVal(val.val.copy(), val.vldMask.copy(), t)
+        elif isinstance(val, (list, tuple, np.ndarray)):
+            assert len(val) == self.lanes, (len(val), self.lanes)
+            v = LaneVal(np.zeros(self.lanes, dtype=U64),
+                        np.zeros(self.lanes, dtype=U64),
+                        t)
+            for i, _v in enumerate(val):
+                v.val[i], v.vldMask[i] = self._toRaw(_v, t)
+        else:
+            _v, _m = self._toRaw(val, t)
+            v = LaneVal(np.full(self.lanes, _v, dtype=U64),
+                        np.full(self.lanes, _m, dtype=U64),
+                        t)
+
+        self._writeLaneVal(v, sig)
+
+    def _toRaw(self, val, t):
+        if not isinstance(val, Value):
+            val = t.fromPy(val)
+        return toRaw(val._convert(t))
+
+    def readLane(self, sig, lane):
+        """
+        Read scalar value of signal or interface in specified lane
+        """
+        if isinstance(sig, InterfaceBase):
+            sig = sig._sigInside
+        return sig._val.getLane(lane)
+
+    def writeLane(self, val, sig, lane):
+        """
+        Write scalar value to signal or interface in specified lane
+        """
+        if isinstance(sig, InterfaceBase):
+            sig = sig._sigInside
+
+        cur = sig._val
+        v = LaneVal(cur.val.copy(), cur.vldMask.copy(), cur._dtype)
+        v.val[lane], v.vldMask[lane] = self._toRaw(val, cur._dtype)
+        self._writeLaneVal(v, sig)
+
+    def _mkClockUpdater(self, sig, v):
+        val = LaneVal.fromValue(sig._dtype.fromPy(v), self.lanes)
+
+        def updater(currentVal):
+            return (laneValueHasChanged(currentVal, val), val)
+
+        return updater
+
+    def laneView(self, lane):
+        """
+        :return: LaneSimView for specified lane (cached)
+        """
+        try:
+            return self._laneViews[lane]
+        except KeyError:
+            v = self._laneViews[lane] = LaneSimView(self, lane)
+            return v
+
+    # shortcuts
+    r = read
+    w = write
+
+
+class LaneSimView(object):
+    """
+    View of HdlLaneSimulator restricted on single lane,
+    it has interface of normal simulator, so normal agents can use it
+
+    :ivar sim: HdlLaneSimulator instance
+    :ivar lane: index of lane
+    """
+    def __init__(self, sim, lane):
+        self.sim = sim
+        self.lane = lane
+
+    def __getattr__(self, name):
+        # wait, process, updateComplete, config ...
+        return getattr(self.sim, name)
+
+    @property
+    def now(self):
+        return self.sim.now
+
+    def read(self, sig):
+        return self.sim.readLane(sig, self.lane)
+
+    def readInt(self, sig):
+        if isinstance(sig, InterfaceBase):
+            sig = sig._sigInside
+        val, vld = self.sim.readLaneRaw(sig, self.lane)
+        if vld == sig._dtype.all_mask():
+            return val
+        else:
+            return None
+
+    def readRaw(self, sig):
+        return self.sim.readLaneRaw(sig, self.lane)
+
+    def write(self, val, sig):
+        self.sim.writeLane(val, sig, self.lane)
+
+    # shortcuts
+    r = read
+    w = write
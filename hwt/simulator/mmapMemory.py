@@ -0,0 +1,275 @@
+import mmap
+import os
+import sys
+
+from hwt.bitmask import mask
+from hwt.hdlObjects.value import Value
+from hwt.synthesizer.param import evalParam
+
+
+# memoryview formats for word sizes which can be accessed directly
+_WORD_FORMATS = {1: "B", 2: "H", 4: "I", 8: "Q"}
+
+
+def _allocBuffer(size, fileName=None):
+    """
+    :return: tuple (mmap, file object or None) of size bytes,
+        anonymous mmap is used if fileName is None
+        (physical pages are allocated only when they are used,
+        but whole size has to be available for mapping)
+    """
+    size = max(size, 1)
+    f = None
+    try:
+        if fileName is None:
+            return mmap.mmap(-1, size), None
+
+        f = open(fileName, "a+b")
+        if os.path.getsize(fileName) < size:
+            f.truncate(size)
+        return mmap.mmap(f.fileno(), size), f
+    except OSError as e:
+        if f is not None:
+            f.close()
+        raise MemoryError("Can not map memory of %d bytes%s (%s), use smaller size"
+                          % (size, "" if fileName is None else " for %s" % fileName, e))
+
+
+class MmapMemory(object):
+    """
+    Memory model for memory-like agents (e.g. BramPort_withoutClkAgent.mem)
+    where words are stored in mmap (optionally backed by file)
+    and validity of words is stored in parallel bitmap
+
+    It can be used instead of dict of Values, words are indexed by word address,
+    item is int or None if word is not valid.
+
+    :ivar size: number of words
+    :ivar wordWidth: width of word in bits
+    :ivar wordBytes: number of bytes used for one word (little endian)
+    :ivar buff: mmap with data of words
+    :ivar vld: mmap with validity bitmap (bit i is 1 if word i is valid),
+        if memory is backed by file bitmap is backed by file <fileName>.vld,
+        so validity of words is kept when file is opened again
+    :cvar maxDefaultSize: max size of memory in bytes which is used by forIntf
+        if size is not specified
+    """
+    maxDefaultSize = 1 << 30
+
+    def __init__(self, size, wordWidth, fileName=None):
+        self.size = size
+        self.wordWidth = wordWidth
+        self.wordBytes = (wordWidth + 7) // 8
+        self._mask = mask(wordWidth)
+
+        self.buff, self._file = _allocBuffer(size * self.wordBytes, fileName)
+        try:
+            self.vld, self._vldFile = _allocBuffer(
+                (size + 7) // 8,
+                None if fileName is None else fileName + ".vld")
+        except MemoryError:
+            self.buff.close()
+            if self._file is not None:
+                self._file.close()
+            raise
+
+        fmt = _WORD_FORMATS.get(self.wordBytes)
+        if fmt is None or sys.byteorder != "little":
+            self._words = None
+        else:
+            self._words = memoryview(self.buff).cast(fmt)
+
+    @classmethod
+    def forIntf(cls, intf, fileName=None, size=None):
+        """
+        Create memory for interface with ADDR_WIDTH, DATA_WIDTH params
+        (e.g. BramPort_withoutClk)
+
+        :param size: number of words, if None whole address space is used
+            (it has to be smaller than maxDefaultSize bytes)
+        """
+        wordWidth = evalParam(intf.DATA_WIDTH).val
+        if size is None:
+            size = 2 ** evalParam(intf.ADDR_WIDTH).val
+            byteSize = size * ((wordWidth + 7) // 8)
+            if byteSize > cls.maxDefaultSize:
+                raise ValueError(
+                    "Address space of %s has %d words (%d bytes), which is more"
+                    " than maxDefaultSize, specify size of memory"
+                    % (intf._getFullName(), size, byteSize))
+        return cls(size, wordWidth, fileName=fileName)
+
+    def _checkAddr(self, addr):
+        if addr < 0 or addr >= self.size:
+            raise IndexError("Address %d out of memory of size %d" % (addr, self.size))
+
+    def isValid(self, addr):
+        return (self.vld[addr >> 3] >> (addr & 7)) & 1 == 1
+
+    def _setValid(self, addr, valid):
+        i = addr >> 3
+        b = 1 << (addr & 7)
+        if valid:
+            self.vld[i] |= b
+        else:
+            self.vld[i] &= ~b & 0xff
+
+    def _setValidRange(self, start, end, valid):
+        """
+        Set validity of words in range [start, end)
+        """
+        first = (start + 7) >> 3
+        last = end >> 3
+        if first >= last:
+            for a in range(start, end):
+                self._setValid(a, valid)
+            return
+
+        for a in range(start, first << 3):
+            self._setValid(a, valid)
+        self.vld[first:last] = (b"\xff" if valid else b"\x00") * (last - first)
+        for a in range(last << 3, end):
+            self._setValid(a, valid)
+
+    def __getitem__(self, addr):
+        """
+        :return: word as int or None if it is not valid
+        """
+        self._checkAddr(addr)
+        if not self.isValid(addr):
+            return None
+
+        words = self._words
+        if words is not None:
+            return words[addr]
+        off = addr * self.wordBytes
+        return int.from_bytes(self.buff[off:off + self.wordBytes], "little")
+
+    def __setitem__(self, addr, v):
+        """
+        :param v: int, Value or None (Value which is not fully valid
+            is stored as invalid word)
+        """
+        self._checkAddr(addr)
+        if isinstance(v, Value):
+            if v.vldMask != v._dtype.all_mask():
+                v = None
+            else:
+                v = v.val
+
+        if v is None:
+            self._setValid(addr, False)
+            return
+
+        v &= self._mask
+        words = self._words
+        if words is not None:
+            words[addr] = v
+        else:
+            off = addr * self.wordBytes
+            self.buff[off:off + self.wordBytes] = v.to_bytes(self.wordBytes, "little")
+        self._setValid(addr, True)
+
+    def get(self, addr, default=None):
+        v = self[addr]
+        if v is None:
+            return default
+        return v
+
+    def __contains__(self, addr):
+        return 0 <= addr < self.size and self.isValid(addr)
+
+    def __len__(self):
+        return self.size
+
+    def load(self, data, addr=0):
+        """
+        Write block of words to memory and mark them as valid
+
+        :param data: bytes-like object or name of file with little endian
+            words (last word is padded by zeros if it is not complete)
+        :param addr: word address where data should be written
+        :return: number of written words
+        """
+        if isinstance(data, str):
+            with open(data, "rb") as f:
+                data = f.read()
+
+        wb = self.wordBytes
+        words = (len(data) + wb - 1) // wb
+        if addr < 0 or addr + words > self.size:
+            raise IndexError("Data of %d words at address %d does not fit to memory of size %d"
+                             % (words, addr, self.size))
+
+        off = addr * wb
+        self.buff[off:off + len(data)] = data
+        padding = words * wb - len(data)
+        if padding:
+            self.buff[off + len(data):off + words * wb] = bytes(padding)
+
+        self._setValidRange(addr, addr + words, True)
+        if self.wordWidth != wb * 8:
+            # clear bits above word width
+            for a in range(addr, addr + words):
+                self[a] = self[a]
+
+        return words
+
+    def dump(self, addr=0, size=None):
+        """
+        :return: bytes of words in range [addr, addr + size)
+            (invalid words are also included, see validWords)
+        """
+        if size is None:
+            size = self.size - addr
+        wb = self.wordBytes
+        return self.buff[addr * wb:(addr + size) * wb]
+
+    def validWords(self):
+        """
+        Iterate valid words (bitmap is scanned by bytes)
+
+        :return: generator of tuples (address, word)
+        """
+        vld = self.vld
+        vldSize = (self.size + 7) // 8
+        chunkSize = 1 << 16
+        for chunkStart in range(0, vldSize, chunkSize):
+            chunk = vld[chunkStart:chunkStart + chunkSize]
+            if not chunk.strip(b"\x00"):
+                # skip chunks without valid words
+                continue
+            for i, b in enumerate(chunk, chunkStart):
+                if b:
+                    for bit in range(8):
+                        if (b >> bit) & 1:
+                            a = (i << 3) + bit
+                            yield (a, self[a])
+
+    def toNumpy(self):
+        """
+        :return: numpy array which is a view on data of words
+            (word size has to be 1, 2, 4 or 8 bytes)
+        """
+        import numpy as np
+        if self._words is None:
+            raise TypeError("Words of %d bytes can not be viewed as numpy array"
+                            % self.wordBytes)
+        return np.frombuffer(self.buff, dtype="<u%d" % self.wordBytes,
+                             count=self.size)
+
+    def flush(self):
+        self.buff.flush()
+        self.vld.flush()
+
+    def close(self):
+        if self._words is not None:
+            self._words.release()
+            self._words = None
+        self.buff.close()
+        self.vld.close()
+        for name in ("_file", "_vldFile"):
+            f = getattr(self, name)
+            if f is not None:
+                f.close()
+                setattr(self, name, None)
@@ -0,0 +1,216 @@
+import numpy as np
+
+from hwt.bitmask import mask
+from hwt.simulator.agentQueue import LazyAgentQueue, iterArrayItems
+
+
+def npStimulus(data, vldMask=None, dtype=None):
+    """
+    Create queue of data for driver of agent from numpy arrays
+    (items are taken from arrays lazily)
+
+    :param data: array of values
+    :param vldMask: None (all values are valid) or array of validity masks
+    :param dtype: hdl type of values, required if vldMask is specified
+        (item with vldMask == 0 is None, item with partial mask is Value)
+    """
+    if vldMask is None:
+        return LazyAgentQueue(iterArrayItems(data))
+
+    if dtype is None:
+        raise ValueError("dtype is required if vldMask is specified")
+    if len(data) != len(vldMask):
+        raise ValueError("data and vldMask have different lengths (%d, %d)"
+                         % (len(data), len(vldMask)))
+
+    m = mask(dtype.bit_length())
+    valCls = dtype.getValueCls()
+
+    def items():
+        for d, vld in zip(iterArrayItems(data), iterArrayItems(vldMask)):
+            if vld == m:
+                yield d
+            elif vld == 0:
+                yield None
+            else:
+                yield valCls(d, dtype, vld, -1)
+
+    return LazyAgentQueue(items())
+
+
+class NpCaptureBuffer(object):
+    """
+    Agent queue which stores values collected by monitor in growable numpy
+    arrays of values and validity masks instead of list of Value instances
+
+    Numpy type of arrays is resolved from first value (int64/uint64
+    for types up to 64b, object otherwise).
+
+    usage: intf._ag.data = NpCaptureBuffer()
+
+    :ivar vals: array of values (only first len(self) items are used,
+        use toNumpy())
+    :ivar vldMasks: array of validity masks
+    :ivar fullMask: validity mask of fully valid value
+    """
+    def __init__(self, capacity=1024):
+        self.vals = None
+        self.vldMasks = None
+        self.fullMask = None
+        self._capacity = capacity
+        self._start = 0
+        self._end = 0
+
+    def _alloc(self, v):
+        t = v._dtype
+        w = t.bit_length()
+        if w > 64:
+            npT = object
+        elif getattr(t, "signed", False):
+            npT = np.int64
+        else:
+            npT = np.uint64
+
+        self.fullMask = mask(w)
+        self.vals = np.zeros(self._capacity, dtype=npT)
+        self.vldMasks = np.zeros(self._capacity,
+                                 dtype=np.uint64 if w <= 64 else object)
+
+    def _grow(self):
+        size = max(len(self.vals) * 2, 1)
+        for name in ("vals", "vldMasks"):
+            a = getattr(self, name)
+            b = np.zeros(size, dtype=a.dtype)
+            b[:len(a)] = a
+            setattr(self, name, b)
+
+    def append(self, v):
+        """
+        :param v: Value instance
+        """
+        if self.vals is None:
+            self._alloc(v)
+
+        i = self._end
+        if i == len(self.vals):
+            self._grow()
+        self.vals[i] = v.val
+        self.vldMasks[i] = v.vldMask
+        self._end = i + 1
+
+    def popleft(self):
+        """
+        :return: value as int or None if it is not fully valid
+        """
+        i = self._start
+        if i == self._end:
+            raise IndexError("pop from an empty NpCaptureBuffer")
+        self._start = i + 1
+        return self._item(i)
+
+    def _item(self, i):
+        if self.vldMasks[i] == self.fullMask:
+            return int(self.vals[i])
+        return None
+
+    def clear(self):
+        self._start = self._end = 0
+
+    def copy(self):
+        """
+        :return: NpCaptureBuffer with copy of actual items
+        """
+        c = self.__class__(self._capacity)
+        if self.vals is not None:
+            c.fullMask = self.fullMask
+            c.vals, c.vldMasks = (a.copy() for a in self.toNumpy())
+            c._end = len(c.vals)
+        return c
+
+    __copy__ = copy
+
+    def __len__(self):
+        return self._end - self._start
+
+    def __bool__(self):
+        return self._end != self._start
+
+    def __iter__(self):
+        for i in range(self._start, self._end):
+            yield self._item(i)
+
+    def __getitem__(self, index):
+        return self.toInts()[index]
+
+    def toNumpy(self):
+        """
+        :return: tuple (values, validity masks) numpy arrays
+        """
+        if self.vals is None:
+            return (np.zeros(0, dtype=np.uint64), np.zeros(0, dtype=np.uint64))
+        return (self.vals[self._start:self._end],
+                self.vldMasks[self._start:self._end])
+
+    def toInts(self):
+        """
+        :return: list of ints (None for values which are not fully valid)
+        """
+        return list(self)
+
+    def __repr__(self):
+        return "<%s %r>" % (self.__class__.__name__, self.toInts())
+
+
+def npValsAndValidity(seq):
+    """
+    Convert sequence to numpy arrays (values, validity)
+
+    :param seq: NpCaptureBuffer, numpy array (all items are valid)
+        or sequence of ints/None
+    :return: tuple (values, bool validity) numpy arrays
+    """
+    if isinstance(seq, NpCaptureBuffer):
+        vals, vld = seq.toNumpy()
+        return vals, (vld == seq.fullMask).astype(bool)
+    elif isinstance(seq, np.ndarray):
+        return seq, np.ones(len(seq), dtype=bool)
+
+    seq = list(seq)
+    vld = np.array([v is not None for v in seq], dtype=bool)
+    try:
+        vals = np.array([0 if v is None else v for v in seq], dtype=np.int64)
+    except OverflowError:
+        vals = np.array([0 if v is None else v for v in seq], dtype=object)
+    return vals, vld
+
+
+def npFirstMismatch(seq1, seq2):
+    """
+    :return: None if sequences are equal else tuple
+        (index of first mismatch, len of seq1, len of seq2)
+        (index is min of lengths if sequences differ only in length)
+    """
+    vals1, vld1 = npValsAndValidity(seq1)
+    vals2, vld2 = npValsAndValidity(seq2)
+    l1 = len(vals1)
+    l2 = len(vals2)
+    n = min(l1, l2)
+    vals1, vld1, vals2, vld2 = vals1[:n], vld1[:n], vals2[:n], vld2[:n]
+    if vals1.dtype != vals2.dtype and object not in (vals1.dtype, vals2.dtype):
+        # numpy can not compare uint64 with int64 directly,
+        # values are compared as python ints only if it is required
+        if vals1.dtype == np.uint64 and vals2.dtype == np.int64 and (vals2 >= 0).all():
+            vals2 = vals2.astype(np.uint64)
+        elif vals2.dtype == np.uint64 and vals1.dtype == np.int64 and (vals1 >= 0).all():
+            vals1 = vals1.astype(np.uint64)
+        else:
+            vals1 = vals1.astype(object)
+            vals2 = vals2.astype(object)
+
+    diff = (vld1 != vld2) | (vld1 & (vals1 != vals2).astype(bool))
+    idx = np.flatnonzero(diff)
+    if len(idx):
+        return (int(idx[0]), l1, l2)
+    elif l1 != l2:
+        return (n, l1, l2)
+    return None
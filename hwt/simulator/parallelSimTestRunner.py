@@ -0,0 +1,240 @@
+import multiprocessing
+import random
+import sys
+import time
+import traceback
+import unittest
+from unittest.suite import _ErrorHolder
+
+from hwt.simulator.simModelCache import SimModelCache
+from hwt.simulator.simTestCase import SimTestCase
+
+
+# tests of actually running ParallelSimTestRunner and groups of indexes
+# of tests which have to be run in single suite (because of class/module
+# fixtures), workers are forked so they inherit these lists
+# and only indexes are sent
+_tests = []
+_groups = []
+
+
+def iterTests(suite):
+    """
+    Walk test suite recursively and yield all test cases
+    """
+    if isinstance(suite, unittest.TestSuite):
+        for t in suite:
+            yield from iterTests(t)
+    else:
+        yield suite
+
+
+def _hasClassFixtures(cls):
+    return (getattr(cls.setUpClass, "__func__", None) is not unittest.TestCase.setUpClass.__func__
+            or getattr(cls.tearDownClass, "__func__", None) is not unittest.TestCase.tearDownClass.__func__)
+
+
+def groupTests(tests):
+    """
+    Group tests which share fixtures, tests of class with setUpClass/tearDownClass
+    are in same group, tests of module with setUpModule/tearDownModule
+    are in same group as well, other tests are in groups on its own
+
+    :return: list of lists of indexes of tests (in original order)
+    """
+    groups = {}
+    for i, t in enumerate(tests):
+        cls = t.__class__
+        module = sys.modules.get(cls.__module__)
+        if hasattr(module, "setUpModule") or hasattr(module, "tearDownModule"):
+            key = cls.__module__
+        elif _hasClassFixtures(cls):
+            key = (cls.__module__, cls.__qualname__)
+        else:
+            key = i
+        groups.setdefault(key, []).append(i)
+
+    return list(groups.values())
+
+
+class _OutcomeCollector(unittest.TestResult):
+    """
+    Test result used in worker, it collects events of tests as picklable
+    tuples (index of test or None, description of test, method name
+    of TestResult, formated error or reason or None)
+
+    Index is None for errors of class and module fixtures
+    (they are reported for _ErrorHolder with description as unittest does).
+    """
+    def __init__(self, testIndexes):
+        super(_OutcomeCollector, self).__init__()
+        self.testIndexes = testIndexes
+        self.outcomes = []
+
+    def _add(self, test, m, arg=None):
+        index = self.testIndexes.get(id(test))
+        if index is None:
+            description = test.id()
+        else:
+            description = None
+        self.outcomes.append((index, description, m, arg))
+
+    def startTest(self, test):
+        # seed does not depend on order of tests or on worker
+        random.seed(getattr(test, "_defaultSeed", 0))
+        super(_OutcomeCollector, self).startTest(test)
+        self._add(test, "startTest")
+
+    def stopTest(self, test):
+        super(_OutcomeCollector, self).stopTest(test)
+        self._add(test, "stopTest")
+
+    def addSuccess(self, test):
+        super(_OutcomeCollector, self).addSuccess(test)
+        self._add(test, "addSuccess")
+
+    def addError(self, test, err):
+        super(_OutcomeCollector, self).addError(test, err)
+        self._add(test, "addError", self._exc_info_to_string(err, test))
+
+    def addFailure(self, test, err):
+        super(_OutcomeCollector, self).addFailure(test, err)
+        self._add(test, "addFailure", self._exc_info_to_string(err, test))
+
+    def addSkip(self, test, reason):
+        super(_OutcomeCollector, self).addSkip(test, reason)
+        self._add(test, "addSkip", reason)
+
+    def addExpectedFailure(self, test, err):
+        super(_OutcomeCollector, self).addExpectedFailure(test, err)
+        self._add(test, "addExpectedFailure", self._exc_info_to_string(err, test))
+
+    def addUnexpectedSuccess(self, test):
+        super(_OutcomeCollector, self).addUnexpectedSuccess(test)
+        self._add(test, "addUnexpectedSuccess")
+
+    def addSubTest(self, test, subtest, err):
+        super(_OutcomeCollector, self).addSubTest(test, subtest, err)
+        if err is not None:
+            if issubclass(err[0], test.failureException):
+                m = "addFailure"
+            else:
+                m = "addError"
+            self._add(test, m, "%s\n%s" % (subtest, self._exc_info_to_string(err, test)))
+
+
+def _initWorker():
+    # one cache for each worker, sim model of (unit class, params)
+    # is generated only once per worker
+    # (persistent cache is shared if it was set by user)
+    if SimTestCase._simModelCache is None:
+        SimTestCase._simModelCache = SimModelCache()
+
+
+def _runGroup(groupIndex):
+    """
+    Run group of tests as TestSuite (class and module fixtures
+    are handled by suite)
+    """
+    indexes = _groups[groupIndex]
+    tests = [_tests[i] for i in indexes]
+    result = _OutcomeCollector({id(t): i for i, t in zip(indexes, tests)})
+    start = time.time()
+    try:
+        unittest.TestSuite(tests)(result)
+    except Exception:
+        result.outcomes.append((None, "%s (group of tests)" % tests[0].id(),
+                                "addError", traceback.format_exc()))
+
+    return result.outcomes, time.time() - start
+
+
+class ParallelTextTestResult(unittest.TextTestResult):
+    """
+    TextTestResult which accepts already formated errors from workers
+    """
+    def _exc_info_to_string(self, err, test):
+        if isinstance(err, str):
+            return err
+        return super(ParallelTextTestResult, self)._exc_info_to_string(err, test)
+
+
+class _ParallelSuite(object):
+    """
+    Callable which runs suite in pool of processes and replays results
+    to result object of runner
+    """
+    def __init__(self, suite, processes):
+        self.suite = suite
+        self.processes = processes
+
+    def __call__(self, result):
+        global _tests, _groups
+        tests = list(iterTests(self.suite))
+        if not tests:
+            return result
+
+        _tests = tests
+        _groups = groupTests(tests)
+        processes = self.processes
+        if processes is None:
+            processes = multiprocessing.cpu_count()
+        processes = min(processes, len(_groups))
+
+        # neighbouring tests (usually of same class) are sent to same worker
+        # and theirs sim model is reused
+        chunksize = max(1, len(_groups) // (processes * 8))
+        ctx = multiprocessing.get_context("fork")
+        try:
+            with ctx.Pool(processes, initializer=_initWorker) as pool:
+                for outcomes, _ in pool.imap_unordered(_runGroup, range(len(_groups)),
+                                                       chunksize=chunksize):
+                    for index, description, m, arg in outcomes:
+                        if index is None:
+                            test = _ErrorHolder(description)
+                        else:
+                            test = tests[index]
+                        if arg is None:
+                            getattr(result, m)(test)
+                        else:
+                            getattr(result, m)(test, arg)
+
+                    if result.shouldStop:
+                        pool.terminate()
+                        break
+        finally:
+            _tests = []
+            _groups = []
+
+        return result
+
+
+class ParallelSimTestRunner(unittest.TextTestRunner):
+    """
+    Test runner which runs tests (usually SimTestCase instances)
+    in pool of processes (fork is used, Linux only), results are reported
+    in the same way as by unittest.TextTestRunner
+
+    Every worker has its own SimModelCache, so sim model for each
+    (unit class, params) is generated only once per worker
+    (if SimTestCase._simModelCache is set it is used instead).
+    Global random generator is seeded by _defaultSeed of test before
+    each test, so results do not depend on distribution of tests.
+    Tests of class with setUpClass/tearDownClass (of module with
+    setUpModule/tearDownModule) are run in one worker as TestSuite,
+    so class and module fixtures are used.
+
+    Usage: unittest.main(testRunner=ParallelSimTestRunner)
+    or ParallelSimTestRunner(processes=4).run(suite)
+
+    :ivar processes: number of worker processes (None = number of cpus)
+    """
+    resultclass = ParallelTextTestResult
+
+    def __init__(self, processes=None, **kwargs):
+        super(ParallelSimTestRunner, self).__init__(**kwargs)
+        self.processes = processes
+
+    def run(self, test):
+        return super(ParallelSimTestRunner, self).run(
+            _ParallelSuite(test, self.processes))
@@ -0,0 +1,531 @@
+from heapq import heappop
+import mmap
+import multiprocessing
+import os
+import sys
+from threading import BrokenBarrierError
+import traceback
+
+from hwt.bitmask import mask
+from hwt.hdlObjects.types.bits import Bits
+from hwt.simulator.clockSource import ClockSource
+from hwt.simulator.exceptions import SimException, SimNotSupportedErr
+from hwt.simulator.hdlSimConfig import HdlSimConfig
+from hwt.simulator.hdlSimulator import HdlSimulator
+from hwt.simulator.simModel import walkSimModels, mkUpdater
+from hwt.simulator.simulatorCore import PRIORITY_NORMAL
+
+
+def _modelWeight(model):
+    return sum(map(lambda m: len(m._processes), walkSimModels(model)))
+
+
+def partitionSimModel(model, partCnt):
+    """
+    Split hierarchy of sim model to groups which can be simulated
+    in separate processes
+
+    Submodels (SimModel._units, component instances of Architecture)
+    are taken as indivisible, the top model (and models which were expanded
+    to get enough submodels) stays in main partition together with all
+    simulation processes (agents).
+
+    Signal which is shared between groups of submodels has to be "registered"
+    (driven by event dependent process or by combinational logic of registers
+    of the same group), otherwise groups connected by such a signal are merged
+    (group is merged to main partition if signal is shared with it).
+    Groups are then distributed to partCnt partitions by number of processes.
+
+    :param partCnt: max number of partitions (main partition not included)
+
+    :return: list of lists of models, first item are models of main partition
+        (there is only main partition with all models if partCnt < 1
+        or if model can not be partitioned)
+    """
+    models = list(walkSimModels(model))
+    if partCnt < 1:
+        # there is no process for other partitions
+        return [models]
+
+    drivers = {}
+    seqProcs = set()
+    procInputs = {}
+    sigUsers = {}
+    for m in models:
+        try:
+            outputs = m._outputs
+        except AttributeError:
+            raise SimNotSupportedErr(
+                "%s: model generated by older serializer does not have _outputs,"
+                " it can not be partitioned" % (m._name))
+        for p, outs in outputs.items():
+            for s in outs:
+                drivers[s] = p
+
+        for s in m._interfaces:
+            sigUsers.setdefault(s, []).append(m)
+            seqProcs.update(s.simRisingSensProcs)
+            seqProcs.update(s.simFallingSensProcs)
+            for p in s.simSensProcs:
+                procInputs.setdefault(p, []).append(s)
+
+    # submodels which are candidates for partitions
+    roots = list(model._units)
+    mainModels = [model]
+    while roots and len(roots) < partCnt:
+        biggest = max(roots, key=_modelWeight)
+        if not biggest._units:
+            break
+        roots.remove(biggest)
+        mainModels.append(biggest)
+        roots.extend(biggest._units)
+
+    # group 0 is main partition, group i + 1 is roots[i]
+    groupOfModel = {m: 0 for m in mainModels}
+    for i, r in enumerate(roots):
+        for m in walkSimModels(r):
+            groupOfModel[m] = i + 1
+
+    parent = list(range(len(roots) + 1))
+
+    def find(g):
+        while parent[g] != g:
+            parent[g] = parent[parent[g]]
+            g = parent[g]
+        return g
+
+    def union(a, b):
+        a = find(a)
+        b = find(b)
+        if a == b:
+            return
+        # main partition is always root of its group
+        if a < b:
+            parent[b] = a
+        else:
+            parent[a] = b
+
+    def groupsOf(s):
+        return set(find(groupOfModel[m]) for m in sigUsers[s])
+
+    def isRegistered(s, g, visiting):
+        p = drivers.get(s, None)
+        if p is None:
+            # constant or value from simulation processes
+            return groupsOf(s) == {g}
+        elif find(groupOfModel[p.__self__]) != g:
+            return False
+        elif p in seqProcs:
+            return True
+        elif p in visiting:
+            # combinational loop
+            return False
+
+        visiting.add(p)
+        res = all(map(lambda i: isRegistered(i, g, visiting),
+                      procInputs.get(p, ())))
+        visiting.discard(p)
+        return res
+
+    changed = True
+    while changed:
+        changed = False
+        for s in sigUsers.keys():
+            gs = groupsOf(s)
+            if len(gs) < 2:
+                continue
+
+            p = drivers.get(s, None)
+            if p is None:
+                continue
+            g = find(groupOfModel[p.__self__])
+            if g == 0 or isRegistered(s, g, set()):
+                continue
+
+            for other in gs:
+                union(g, other)
+            changed = True
+
+    clusters = {}
+    for i, r in enumerate(roots):
+        g = find(i + 1)
+        if g == 0:
+            mainModels.extend(walkSimModels(r))
+        else:
+            clusters.setdefault(g, []).append(r)
+
+    if not clusters:
+        return [models]
+
+    # longest processing time first
+    parts = [[] for _ in range(min(partCnt, len(clusters)))]
+    weights = [0 for _ in parts]
+    for c in sorted(clusters.values(),
+                    key=lambda c: sum(map(_modelWeight, c)), reverse=True):
+        i = weights.index(min(weights))
+        for r in c:
+            parts[i].extend(walkSimModels(r))
+        weights[i] += sum(map(_modelWeight, c))
+
+    return [mainModels] + parts
+
+
+class _PartitionTerminated(Exception):
+    pass
+
+
+class PartitionedHdlSimulator(HdlSimulator):
+    """
+    Simulator which splits sim model to partitions (see partitionSimModel)
+    and simulates each of them in separate OS process (os.fork, Linux only)
+
+    Partitions run in lock-step, they are synchronized on every clock edge
+    (clocks have to be generated by addClock/ClockSource, all partitions
+    have own copy of them), values of signals shared between partitions
+    are exchanged trough shared memory twice per edge:
+
+        1. after all actions and combinational logic before registers are updated
+           (values from simulation processes and main partition)
+        2. after time slot of edge (registered values from partitions)
+
+    Results are the same as in HdlSimulator because all signals shared
+    by partitions are registered and simulation processes (agents)
+    run only in main partition.
+
+    Partitions are started on first clock edge (state of whole model
+    before it is simulated by main process) and they are terminated
+    at the end of simUnit().
+
+    :attention: waveform (and other logs of config) contains only signals
+        of main partition and signals shared between partitions,
+        updateComplete is triggered also after values of partitions are
+        received (processes which waits for updateComplete repeatedly
+        in single time can observe it)
+    :attention: boundary signals has to be of Bits type, fast-forward,
+        checkpoints and clocks added after start of partitions are not supported
+
+    :ivar partCnt: max number of partitions (including main partition)
+    :ivar partitions: list of lists of models of partitions (first is main)
+        or None if partitions were not started yet
+    """
+    def __init__(self, config=None, partCnt=None):
+        super(PartitionedHdlSimulator, self).__init__(config=config)
+        if partCnt is None:
+            partCnt = os.cpu_count() or 1
+        self.partCnt = partCnt
+        self.partitions = None
+        # index of partition simulated by this OS process
+        self._partIndex = 0
+        self._barrier = None
+        self._workerPids = []
+        self._errPipes = []
+        # shared memory with two buffers of values of boundary signals
+        self._shm = None
+        self._bufSize = 0
+        self._exchangeCnt = 0
+        # lists of tuples (signal, offset, number of bytes)
+        self._outSlots = []
+        self._inSlots = []
+        # {signal: (simSensProcs, simRisingSensProcs, simFallingSensProcs)}
+        self._origSens = {}
+
+    def _isSyncSlot(self, slot):
+        """
+        :return: True if time slot contains edge of clock
+        """
+        for fn, _ in slot.queues[PRIORITY_NORMAL]:
+            c = getattr(fn, "__self__", None)
+            if c.__class__ is ClockSource and c.isEdgeAction(fn):
+                return True
+        return False
+
+    def _runSlot(self, slot, withSeq=True):
+        _runSlot = super(PartitionedHdlSimulator, self)._runSlot
+        if self._barrier is None:
+            if self.partitions is None:
+                if not self._isSyncSlot(slot):
+                    return _runSlot(slot, withSeq)
+                # first clock edge
+                self._startPartitions()
+            elif len(self.partitions) > 1:
+                raise SimException("Partitioned simulation was already finished")
+
+            if self._barrier is None:
+                # there is nothing to partition
+                return _runSlot(slot, withSeq)
+
+        elif not self._isSyncSlot(slot):
+            return _runSlot(slot, withSeq)
+
+        # actions and combinational logic before update of registers
+        _runSlot(slot, withSeq=False)
+        self._exchange()
+        # update of registers
+        _runSlot(slot)
+        self._exchange()
+        # reaction on registered values from other partitions
+        _runSlot(slot)
+
+    def _startPartitions(self):
+        if self.idleCycles is not None:
+            raise SimNotSupportedErr(
+                "Idle fast-forward is not supported by %s" % (self.__class__.__name__))
+
+        parts = partitionSimModel(self.model, self.partCnt - 1)
+        self.partitions = parts
+        if len(parts) == 1:
+            return
+
+        procPart = {}
+        for i, models in enumerate(parts):
+            for m in models:
+                for p in m._processes:
+                    procPart[p] = i
+
+        partOfModel = {m: i for i, models in enumerate(parts) for m in models}
+        drivers = {}
+        sigParts = {}
+        for m in walkSimModels(self.model):
+            for p, outs in m._outputs.items():
+                for s in outs:
+                    drivers[s] = p
+            for s in m._interfaces:
+                sigParts.setdefault(s, set()).add(partOfModel[m])
+
+        # layout of shared memory: flag of termination, (val, vldMask) of every
+        # boundary signal
+        boundary = []
+        offset = 1
+        for s, ps in sigParts.items():
+            if len(ps) < 2:
+                continue
+            t = s._dtype
+            if not isinstance(t, Bits):
+                raise SimNotSupportedErr(
+                    "%s of type %r is shared between partitions,"
+                    " only Bits type is supported" % (s.name, t))
+            p = drivers.get(s, None)
+            owner = 0 if p is None else procPart[p]
+            n = (t.bit_length() + 7) // 8
+            boundary.append((s, ps, owner, offset, n))
+            offset += 2 * n
+
+        self._bufSize = offset
+        self._shm = mmap.mmap(-1, 2 * offset)
+        self._barrier = multiprocessing.get_context("fork").Barrier(len(parts))
+
+        for i in range(1, len(parts)):
+            r, w = os.pipe()
+            sys.stdout.flush()
+            sys.stderr.flush()
+            pid = os.fork()
+            if pid == 0:
+                os.close(r)
+                for _r in self._errPipes:
+                    os.close(_r)
+                self._runPartition(i, w, procPart, boundary)
+                # never returns
+            os.close(w)
+            self._workerPids.append(pid)
+            self._errPipes.append(r)
+
+        self._initPartition(0, procPart, boundary)
+
+    def _initPartition(self, index, procPart, boundary):
+        """
+        Remove processes of other partitions and prepare exchange
+        of boundary signals
+        """
+        self._partIndex = index
+        for m in walkSimModels(self.model):
+            for s in m._interfaces:
+                if s in self._origSens:
+                    continue
+                self._origSens[s] = (s.simSensProcs, s.simRisingSensProcs,
+                                     s.simFallingSensProcs)
+                s.simSensProcs = set(p for p in s.simSensProcs if procPart[p] == index)
+                s.simRisingSensProcs = set(p for p in s.simRisingSensProcs
+                                           if procPart[p] == index)
+                s.simFallingSensProcs = set(p for p in s.simFallingSensProcs
+                                            if procPart[p] == index)
+
+        self._outSlots = [(s, offset, n) for s, _, owner, offset, n in boundary
+                          if owner == index]
+        # main partition receives all shared signals (they are in waveform)
+        self._inSlots = [(s, offset, n) for s, parts, owner, offset, n in boundary
+                         if owner != index and (index == 0 or index in parts)]
+
+    def _runPartition(self, index, errPipe, procPart, boundary):
+        """
+        Main loop of forked process which simulates partition index
+        (only clocks are kept from actions of simulation)
+        """
+        code = 0
+        try:
+            self.config = HdlSimConfig()
+            self._afterSlot = None
+            self.stopConditions = []
+            self.updateComplete.callbacks = []
+            for m in walkSimModels(self.model):
+                for s in m._interfaces:
+                    s._writeCallbacks = []
+                    s.simClearEdgeCallbacks()
+
+            for slot in self._slots.values():
+                for q in slot.queues:
+                    clkActions = [(fn, arg) for fn, arg in q
+                                  if getattr(fn, "__self__", None).__class__ is ClockSource]
+                    q.clear()
+                    q.extend(clkActions)
+
+            self._initPartition(index, procPart, boundary)
+
+            times = self._times
+            slots = self._slots
+            while times:
+                t = times[0]
+                self.now = t
+                self._runSlot(slots[t])
+                heappop(times)
+                del slots[t]
+
+            raise SimException("Partition %d does not have any clock" % index)
+        except _PartitionTerminated:
+            pass
+        except BaseException:
+            code = 1
+            tb = traceback.format_exc().encode()
+            try:
+                os.write(errPipe, tb)
+            finally:
+                self._barrier.abort()
+        finally:
+            os.close(errPipe)
+            os._exit(code)
+
+    def _exchange(self, terminate=False):
+        """
+        Write values of owned boundary signals to shared memory,
+        wait for other partitions and apply values from them
+        """
+        shm = self._shm
+        base = (self._exchangeCnt & 1) * self._bufSize
+        self._exchangeCnt += 1
+
+        for s, offset, n in self._outSlots:
+            v = s._val
+            o = base + offset
+            shm[o:o + n] = (v.val & mask(8 * n)).to_bytes(n, "little")
+            shm[o + n:o + 2 * n] = v.vldMask.to_bytes(n, "little")
+        if self._partIndex == 0:
+            shm[base] = int(terminate)
+
+        try:
+            self._barrier.wait()
+        except BrokenBarrierError:
+            if self._partIndex == 0:
+                self._raiseErrOfPartitions()
+            raise _PartitionTerminated()
+
+        if shm[base]:
+            raise _PartitionTerminated()
+
+        now = self.now
+        for s, offset, n in self._inSlots:
+            o = base + offset
+            val = int.from_bytes(shm[o:o + n], "little")
+            vld = int.from_bytes(shm[o + n:o + 2 * n], "little")
+            t = s._dtype
+            if t.signed:
+                w = t.bit_length()
+                if val >> (w - 1):
+                    val -= 1 << w
+
+            cur = s._val
+            if cur.val == val and cur.vldMask == vld:
+                continue
+
+            v = t.getValueCls()(val, t, vld, now)
+            s.simUpdateVal(self, mkUpdater(v, False))
+            if not s.simSensProcs and self.applyValPlaned:
+                # see write()
+                self.scheduleApplyValues()
+
+    def _raiseErrOfPartitions(self):
+        errs = []
+        for i, r in enumerate(self._errPipes):
+            data = []
+            while True:
+                d = os.read(r, 4096)
+                if not d:
+                    break
+                data.append(d)
+            if data:
+                errs.append("Partition %d:\n%s" % (i + 1, b"".join(data).decode()))
+        self.close(abort=True)
+        raise SimException("Simulation of partition failed\n" + "\n".join(errs))
+
+    def close(self, abort=False):
+        """
+        Terminate processes of partitions and return model to original state
+        (all processes in main partition)
+
+        :param abort: if True partitions are terminated immediately
+            (otherwise they are terminated on next clock edge)
+        """
+        if self._barrier is not None:
+            if abort:
+                self._barrier.abort()
+            else:
+                try:
+                    self._exchange(terminate=True)
+                except _PartitionTerminated:
+                    pass
+
+            for pid in self._workerPids:
+                os.waitpid(pid, 0)
+            for r in self._errPipes:
+                os.close(r)
+            self._workerPids = []
+            self._errPipes = []
+            self._barrier = None
+            self._shm.close()
+            self._shm = None
+
+        for s, (sens, rising, falling) in self._origSens.items():
+            s.simSensProcs = sens
+            s.simRisingSensProcs = rising
+            s.simFallingSensProcs = falling
+        self._origSens = {}
+
+    def simUnit(self, synthesisedUnit, time, extraProcesses=[]):
+        try:
+            super(PartitionedHdlSimulator, self).simUnit(
+                synthesisedUnit, time, extraProcesses=extraProcesses)
+        except BaseException:
+            self.close(abort=True)
+            raise
+        self.close()
+
+    def addClock(self, sig, period, phase=0, dutyCycle=0.5):
+        if self._barrier is not None:
+            raise SimNotSupportedErr(
+                "Clock can not be added after partitions were started")
+        return super(PartitionedHdlSimulator, self).addClock(
+            sig, period, phase=phase, dutyCycle=dutyCycle)
+
+    def fastForwardIdle(self, idleCycles):
+        raise SimNotSupportedErr(
+            "Idle fast-forward is not supported by %s" % (self.__class__.__name__))
+
+    def checkpoint(self, agents=()):
+        if self._barrier is not None:
+            raise SimNotSupportedErr(
+                "Checkpoint is not supported after partitions were started")
+        return super(PartitionedHdlSimulator, self).checkpoint(agents)
+
+    def runForked(self, fn):
+        if self._barrier is not None:
+            raise SimNotSupportedErr(
+                "runForked is not supported after partitions were started")
+        return super(PartitionedHdlSimulator, self).runForked(fn)
@@ -0,0 +1,280 @@
+import json
+import sys
+from time import perf_counter
+
+from hwt.simulator.hdlSimConfig import HdlSimConfig
+from hwt.simulator.simModel import walkSimModels
+
+
+class ProcessStats(object):
+    """
+    Statistics of evaluation of single HW process
+
+    :ivar name: name of process (model name.process name)
+    :ivar evals: number of evaluations
+    :ivar sampled: number of evaluations for which time was measured
+    :ivar sampledTime: cumulative wall time of measured evaluations (in seconds)
+    """
+    __slots__ = ["name", "evals", "sampled", "sampledTime"]
+
+    def __init__(self, name):
+        self.name = name
+        self.evals = 0
+        self.sampled = 0
+        self.sampledTime = 0.0
+
+    def time(self):
+        """
+        :return: estimated cumulative wall time of all evaluations
+        """
+        if not self.sampled:
+            return 0.0
+        return self.sampledTime * self.evals / self.sampled
+
+
+class ProfiledProcess(object):
+    """
+    Wrapper of HW process which collects its ProcessStats
+    (it replaces original process in sim model, so simulator
+    does not have to know about profiling)
+    """
+    __slots__ = ["proc", "stats", "samplingPeriod", "__self__"]
+
+    def __init__(self, proc, stats, samplingPeriod):
+        self.proc = proc
+        self.stats = stats
+        self.samplingPeriod = samplingPeriod
+        self.__self__ = proc.__self__
+
+    @property
+    def __name__(self):
+        return self.proc.__name__
+
+    def __call__(self, sim):
+        stats = self.stats
+        stats.evals += 1
+        if stats.evals % self.samplingPeriod:
+            return self.proc(sim)
+
+        t = perf_counter()
+        res = self.proc(sim)
+        if res is not None:
+            # generator of process with yield ABI has to be evaluated
+            res = list(res)
+        stats.sampledTime += perf_counter() - t
+        stats.sampled += 1
+        return res
+
+    def __repr__(self):
+        return "<ProfiledProcess %r>" % (self.proc)
+
+
+def _replaceProcs(container, replacements):
+    return container.__class__(replacements.get(p, p) for p in container)
+
+
+class ProfilingHdlSimConfig(HdlSimConfig):
+    """
+    Simulator config which collects profile of simulation:
+    number of evaluations and wall time of every HW process,
+    number of value changes of every signal and number of delta steps
+    in every time step
+
+    Processes of sim model are wrapped by ProfiledProcess in beforeSim,
+    report or json is written at the end of simulation (afterSim).
+
+    :ivar config: optional config which is wrapped (e.g. VcdHdlSimConfig),
+        all its hooks are called as well
+    :ivar samplingPeriod: wall time is measured only for every n-th evaluation
+        of process (time of others is extrapolated), counts are exact
+    :ivar reportFile: file (or name of file) where report should be written
+        after simulation or None
+    :ivar jsonFile: file (or name of file) where json with profile should be
+        written after simulation or None
+    :ivar processes: list of ProcessStats
+    :ivar signalChanges: dict {signal: number of value changes}
+    :ivar deltaHist: dict {number of delta steps: number of time steps}
+    :ivar deltasPerTime: dict {time: number of delta steps}
+        (collected only if samplingPeriod == 1)
+    :ivar wallTime: wall time of whole simulation
+    """
+    def __init__(self, config=None, samplingPeriod=1, reportFile=None,
+                 jsonFile=None):
+        super(ProfilingHdlSimConfig, self).__init__()
+        assert samplingPeriod >= 1, samplingPeriod
+        self.config = config
+        self.samplingPeriod = samplingPeriod
+        self.reportFile = reportFile
+        self.jsonFile = jsonFile
+
+        self.processes = []
+        self.signalChanges = {}
+        self.deltaHist = {}
+        self.deltasPerTime = {} if samplingPeriod == 1 else None
+        self.wallTime = 0.0
+
+        self._deltaTime = None
+        self._deltas = 0
+        self._startTime = None
+
+        self.beforeSim = self._beforeSim
+        self.afterSim = self._afterSim
+        self.logChange = self._logChange
+        if config is not None:
+            self.logPropagation = config.logPropagation
+            self.logApplyingValues = config.logApplyingValues
+            self.logWrite = config.logWrite
+
+    def _logChange(self, nowTime, sig, nextVal):
+        c = self.signalChanges
+        try:
+            c[sig] += 1
+        except KeyError:
+            c[sig] = 1
+
+        if self.config is not None and self.config.logChange:
+            self.config.logChange(nowTime, sig, nextVal)
+
+    def _instrumentModel(self, model):
+        """
+        Replace all processes in model and its submodels by ProfiledProcess
+        """
+        replacements = {}
+        for m in walkSimModels(model):
+            procs = []
+            for p in m._processes:
+                stats = ProcessStats("%s.%s" % (m._name, p.__name__))
+                self.processes.append(stats)
+                pp = ProfiledProcess(p, stats, self.samplingPeriod)
+                replacements[p] = pp
+                procs.append(pp)
+            m._processes = procs
+
+        for m in walkSimModels(model):
+            try:
+                outputs = m._outputs
+            except AttributeError:
+                outputs = None
+
+            if outputs is not None:
+                m._outputs = {replacements.get(p, p): o for p, o in outputs.items()}
+
+            for s in m._cntx.signals:
+                s.simSensProcs = _replaceProcs(s.simSensProcs, replacements)
+                s.simRisingSensProcs = _replaceProcs(s.simRisingSensProcs, replacements)
+                s.simFallingSensProcs = _replaceProcs(s.simFallingSensProcs, replacements)
+
+    def _instrumentSimulator(self, simulator):
+        """
+        Count delta steps (phases of application of values)
+        """
+        applyComb = simulator._applyComb
+        applySeq = simulator._applySeq
+
+        def countedApplyComb():
+            self._countDelta(simulator.now)
+            applyComb()
+
+        def countedApplySeq():
+            self._countDelta(simulator.now)
+            applySeq()
+
+        simulator._applyComb = countedApplyComb
+        simulator._applySeq = countedApplySeq
+
+    def _countDelta(self, now):
+        if self._deltaTime != now:
+            self._flushDeltas()
+            self._deltaTime = now
+        self._deltas += 1
+
+    def _flushDeltas(self):
+        t = self._deltaTime
+        if t is None:
+            return
+        d = self._deltas
+        h = self.deltaHist
+        h[d] = h.get(d, 0) + 1
+        if self.deltasPerTime is not None:
+            self.deltasPerTime[t] = d
+        self._deltaTime = None
+        self._deltas = 0
+
+    def _beforeSim(self, simulator, synthesisedUnit):
+        self._instrumentModel(synthesisedUnit)
+        self._instrumentSimulator(simulator)
+        c = self.config
+        if c is not None and c.beforeSim is not None:
+            c.beforeSim(simulator, synthesisedUnit)
+        self._startTime = perf_counter()
+
+    def _afterSim(self, simulator, synthesisedUnit):
+        self.wallTime += perf_counter() - self._startTime
+        self._flushDeltas()
+        c = self.config
+        if c is not None and c.afterSim is not None:
+            c.afterSim(simulator, synthesisedUnit)
+
+        if self.reportFile is not None:
+            self._writeTo(self.reportFile, self.report)
+        if self.jsonFile is not None:
+            self._writeTo(self.jsonFile,
+                          lambda f: json.dump(self.toJson(), f, indent=2))
+
+    @staticmethod
+    def _writeTo(fileOrName, fn):
+        if isinstance(fileOrName, str):
+            with open(fileOrName, "w") as f:
+                fn(f)
+        else:
+            fn(fileOrName)
+
+    def _signalName(self, sig):
+        return sig.name
+
+    def toJson(self):
+        """
+        :return: dict with profile which can be serialized to json
+        """
+        procs = sorted(self.processes, key=lambda p: p.time(), reverse=True)
+        sigs = sorted(self.signalChanges.items(), key=lambda x: x[1], reverse=True)
+        d = {
+            "wallTime": self.wallTime,
+            "samplingPeriod": self.samplingPeriod,
+            "processes": [{"name": p.name,
+                           "evals": p.evals,
+                           "time": p.time()} for p in procs],
+            "signalChanges": [{"name": self._signalName(s),
+                               "changes": c} for s, c in sigs],
+            "deltaHist": {str(k): v for k, v in sorted(self.deltaHist.items())},
+        }
+        if self.deltasPerTime is not None:
+            d["deltasPerTime"] = [[t, n] for t, n in sorted(self.deltasPerTime.items())]
+        return d
+
+    def report(self, file=sys.stdout, limit=20):
+        """
+        Write report with most expensive processes, most active signals
+        and histogram of delta steps
+        """
+        w = file.write
+        procs = sorted(self.processes, key=lambda p: p.time(), reverse=True)
+        procTime = sum(map(lambda p: p.time(), procs))
+        w("Simulation wall time %.3fs, HW processes %.3fs (sampling period %d)\n"
+          % (self.wallTime, procTime, self.samplingPeriod))
+
+        w("\n%-50s %10s %10s %6s\n" % ("process", "evals", "time[ms]", "%"))
+        for p in procs[:limit]:
+            t = p.time()
+            w("%-50s %10d %10.3f %6.2f\n" % (
+                p.name, p.evals, t * 1000,
+                (100 * t / procTime) if procTime else 0))
+
+        sigs = sorted(self.signalChanges.items(), key=lambda x: x[1], reverse=True)
+        w("\n%-50s %10s\n" % ("signal", "changes"))
+        for s, c in sigs[:limit]:
+            w("%-50s %10d\n" % (self._signalName(s), c))
+
+        w("\n%-10s %10s\n" % ("deltas", "timesteps"))
+        for d, n in sorted(self.deltaHist.items()):
+            w("%-10d %10d\n" % (d, n))
@@ -0,0 +1,211 @@
+from itertools import tee
+
+from hwt.hdlObjects.value import Value
+from hwt.simulator.agentConnector import valToInt
+
+
+def transactionToInts(d):
+    """
+    Convert transaction (Value or nested list/tuple of them) to ints
+    (not fully valid value = None, lists are converted to tuples)
+    """
+    if isinstance(d, Value):
+        return valToInt(d)
+    elif isinstance(d, (list, tuple)):
+        return tuple(transactionToInts(i) for i in d)
+    return d
+
+
+class ScoreboardChannel(object):
+    """
+    Queue which replaces data of monitor agent and which compares every
+    received transaction with expected one, received transactions
+    are not stored (len() is number of received transactions)
+
+    :ivar name: full name of interface
+    :ivar expected: iterator of expected transactions (e.g. generator
+        which runs reference model)
+    :ivar inOrder: if True transactions have to be received in the same order
+        as expected, else any of next window expected transactions can be
+        received
+    :ivar window: max number of pending expected transactions
+        for out-of-order matching
+    :ivar allowMissing: if True it is not an error when there are some
+        expected transactions which were not received at the end of simulation
+    :ivar received: number of received transactions
+    """
+    def __init__(self, scoreboard, name, expected, inOrder=True, window=1024,
+                 allowMissing=False):
+        self.scoreboard = scoreboard
+        self.name = name
+        self.expected = iter(expected)
+        self.inOrder = inOrder
+        self.window = window
+        self.allowMissing = allowMissing
+        self.received = 0
+        # {expected transaction: count} for out-of-order matching
+        self._pending = {}
+        self._pendingCnt = 0
+
+    def _nextExpected(self):
+        try:
+            return True, transactionToInts(next(self.expected))
+        except StopIteration:
+            return False, None
+
+    def append(self, d):
+        """
+        Called by monitor for every received transaction
+        """
+        i = self.received
+        self.received += 1
+        actual = transactionToInts(d)
+        if self.inOrder:
+            ok, e = self._nextExpected()
+            if not ok:
+                self.scoreboard.onMismatch(
+                    self, "unexpected transaction %d: %r (all expected were received)" % (i, actual))
+            elif e != actual:
+                self.scoreboard.onMismatch(
+                    self, "transaction %d: expected %r, got %r" % (i, e, actual))
+            return
+
+        pending = self._pending
+        while actual not in pending:
+            if self._pendingCnt >= self.window:
+                self.scoreboard.onMismatch(
+                    self, "transaction %d: %r is not in %d pending expected transactions"
+                    % (i, actual, self._pendingCnt))
+                return
+            ok, e = self._nextExpected()
+            if not ok:
+                self.scoreboard.onMismatch(
+                    self, "transaction %d: %r is not expected (%d pending expected transactions)"
+                    % (i, actual, self._pendingCnt))
+                return
+            pending[e] = pending.get(e, 0) + 1
+            self._pendingCnt += 1
+
+        cnt = pending[actual] - 1
+        if cnt:
+            pending[actual] = cnt
+        else:
+            del pending[actual]
+        self._pendingCnt -= 1
+
+    def missing(self):
+        """
+        :return: list of pending expected transactions and next one
+            from expected iterator (if there is any)
+        """
+        m = []
+        for e, cnt in self._pending.items():
+            m.extend([e, ] * cnt)
+        ok, e = self._nextExpected()
+        if ok:
+            m.append(e)
+        return m
+
+    def copy(self):
+        """
+        :return: copy of state of this channel (remaining expected transactions
+            are split by itertools.tee, used by SimCheckpoint)
+        """
+        self.expected, expected = tee(self.expected)
+        c = self.__class__(self.scoreboard, self.name, expected,
+                           inOrder=self.inOrder, window=self.window,
+                           allowMissing=self.allowMissing)
+        c.received = self.received
+        c._pending = self._pending.copy()
+        c._pendingCnt = self._pendingCnt
+        return c
+
+    __copy__ = copy
+
+    def popleft(self):
+        raise IndexError("ScoreboardChannel does not store transactions")
+
+    def __len__(self):
+        return self.received
+
+    def __bool__(self):
+        return self.received > 0
+
+    def __iter__(self):
+        raise TypeError("ScoreboardChannel does not store transactions (%s)" % self.name)
+
+
+class Scoreboard(object):
+    """
+    Checks transactions received by monitor agents during simulation,
+    simulation is stopped on first mismatch
+
+    usage:
+        sb = Scoreboard()
+        sb.addMonitor(u.dataOut, expectedIterable)
+        sim.simUnit(model, time, extraProcesses=procs + [sb.process])
+        sb.check()
+
+    :ivar mismatch: None or tuple (time, interface name, message) of first mismatch
+    """
+    def __init__(self):
+        # agents with ScoreboardChannel as data
+        # (channel can be replaced by its copy on restore of SimCheckpoint)
+        self._agents = []
+        self.mismatch = None
+        self.sim = None
+
+    @property
+    def channels(self):
+        """
+        :return: list of ScoreboardChannel
+        """
+        return [a.data for a in self._agents]
+
+    def addMonitor(self, intf, expected, inOrder=True, window=1024,
+                   allowMissing=False):
+        """
+        Replace data of agent of interface by ScoreboardChannel
+        (see ScoreboardChannel for description of params)
+
+        :return: ScoreboardChannel instance
+        """
+        ch = ScoreboardChannel(self, intf._getFullName(), expected,
+                               inOrder=inOrder, window=window,
+                               allowMissing=allowMissing)
+        intf._ag.data = ch
+        self._agents.append(intf._ag)
+        return ch
+
+    def process(self, sim):
+        """
+        Simulation process which binds scoreboard to simulator
+        """
+        self.sim = sim
+        return
+        yield
+
+    def onMismatch(self, channel, msg):
+        if self.mismatch is None:
+            now = None if self.sim is None else self.sim.now
+            self.mismatch = (now, channel.name, msg)
+            if self.sim is not None:
+                self.sim.stop()
+
+    def check(self):
+        """
+        :raise AssertionError: if there was a mismatch or some expected
+            transactions were not received
+        """
+        if self.mismatch is not None:
+            raise AssertionError("%s: time %r: %s" % (
+                self.mismatch[1], self.mismatch[0], self.mismatch[2]))
+
+        for ch in self.channels:
+            if ch.allowMissing:
+                continue
+            missing = ch.missing()
+            if missing:
+                raise AssertionError(
+                    "%s: %d transactions received, expected transactions missing, next: %r"
+                    % (ch.name, ch.received, missing[:10]))
@@ -7,17 +7,21 @@ import sys
 from hwt.hdlObjects.constants import Time
 from hwt.hdlObjects.types.defs import BIT
 from hwt.serializer.simModel.serializer import SimModelSerializer
-from hwt.simulator.agentConnector import autoAddAgents
+from hwt.simulator.agentConnector import autoAddAgents, autoAddLaneAgents
 from hwt.simulator.hdlSimulator import HdlSimulator
 from hwt.simulator.simModel import SimModel
+from hwt.simulator.simModelCache import SimModelCacheItem, describeInterfaces, \
+    loadInterfaces
 from hwt.simulator.simSignalProxy import IndexSimSignalProxy
 from hwt.simulator.vcdHdlSimConfig import VcdHdlSimConfig
 from hwt.synthesizer.interfaceLevel.interfaceUtils.utils import walkPhysInterfaces
+from hwt.synthesizer.interfaceLevel.mainBases import InterfaceBase
 from hwt.synthesizer.shortcuts import toRtl, synthesised, toRtlAndSave
 from hwt.simulator.types.simBits import simBitsT
 
 
-def simPrepare(unit, modelCls=None, dumpModelIn=None, onAfterToRtl=None):
+def simPrepare(unit, modelCls=None, dumpModelIn=None, onAfterToRtl=None,
+               serializer=SimModelSerializer, lanes=None, cache=None):
     """
     Create simulation model and connect it with interfaces of original unit
     and decorate it with agents
@@ -28,6 +32,14 @@ def simPrepare(unit, modelCls=None, dumpModelIn=None, onAfterToRtl=None):
     :param dumpModelIn: folder to where put sim model files (if is None sim model will be constructed only in memory)
     :param onAfterToRtl: callback fn(unit) which will be called unit after it will
         be synthesised to rtl
+    :param serializer: serializer used for generating of sim model
+        (SimModelIntSerializer for faster integer based model,
+        SimModelLaneSerializer for lane model)
+    :param lanes: number of lanes for HdlLaneSimulator, if is not None
+        LaneAgent with agent for each lane is instantiated for every interface
+    :param cache: optional SimModelCache (or SimModelDiskCache) for generated
+        sim models, unit is not synthesised if its model is found in cache
+        and onAfterToRtl is None
 
     :return: tuple (fully loaded unit with connected sim model,
         connected simulation model,
@@ -35,7 +47,8 @@ def simPrepare(unit, modelCls=None, dumpModelIn=None, onAfterToRtl=None):
         )
     """
     if modelCls is None:
-        modelCls = toSimModel(unit, dumpModelIn=dumpModelIn)
+        modelCls = toSimModel(unit, dumpModelIn=dumpModelIn, serializer=serializer,
+                              cache=cache, elaborate=onAfterToRtl is not None)
     else:
         synthesised(unit)
 
@@ -44,19 +57,29 @@ def simPrepare(unit, modelCls=None, dumpModelIn=None, onAfterToRtl=None):
 
     reconectUnitSignalsToModel(unit, modelCls)
     model = modelCls()
-    procs = autoAddAgents(unit)
+    if lanes is None:
+        procs = autoAddAgents(unit)
+    else:
+        procs = autoAddLaneAgents(unit, lanes)
     return unit, model, procs
 
 
-def toSimModel(unit, dumpModelIn=None):
+def toSimModel(unit, dumpModelIn=None, serializer=SimModelSerializer, cache=None,
+               elaborate=False):
     """
     Create a simulation model for unit
 
     :param unit: interface level unit which you wont prepare for simulation
     :param dumpModelIn: folder to where put sim model files (otherwise sim model will be constructed only in memory)
+    :param serializer: serializer used for generating of sim model
+    :param cache: optional SimModelCache (or SimModelDiskCache), if model
+        for this unit class and params is cached code of model is reused
+        and unit is not synthesised (only its declarations are loaded),
+        (not used if dumpModelIn is specified)
+    :param elaborate: if True unit is synthesised even if its model is cached
     """
     if dumpModelIn is not None:
-        toRtlAndSave(unit, dumpModelIn, serializer=SimModelSerializer)
+        toRtlAndSave(unit, dumpModelIn, serializer=serializer)
         d = os.path.join(os.getcwd(), dumpModelIn)
         dInPath = d in sys.path
         if not dInPath:
@@ -67,8 +90,30 @@ def toSimModel(unit, dumpModelIn=None):
 
         if not dInPath:
             sys.path.remove(d)
+    elif cache is not None:
+        key = cache.getKey(unit, serializer)
+        item = cache.get(key)
+        if item is None:
+            sim_code = toRtl(unit, serializer=serializer)
+            code = compile(sim_code, "<simModel %s>" % key, "exec")
+            item = SimModelCacheItem(code, sim_code, unit._name,
+                                     describeInterfaces(unit))
+            cache.put(key, item, unit)
+            isHit = False
+        else:
+            isHit = True
+
+        simModule = imp.new_module('simModule')
+        exec(item.code, simModule.__dict__)
+        modelCls = simModule.__dict__[item.modelName]
+        if isHit:
+            if elaborate or item.interfaces is None:
+                synthesised(unit)
+            else:
+                loadInterfaces(unit, item, modelCls)
+        return modelCls
     else:
-        sim_code = toRtl(unit, serializer=SimModelSerializer)
+        sim_code = toRtl(unit, serializer=serializer)
         simModule = imp.new_module('simModule')
         exec(sim_code, simModule.__dict__)
 
@@ -141,7 +186,7 @@ def simUnitVcd(simModel, stimulFunctions, outputFile=sys.stdout, time=100 * Time
 def _simUnitVcd(simModel, stimulFunctions, outputFile, time):
     """
     :param unit: interface level unit to simulate
-    :param stimulFunctions: iterable of function with single param env (simpy environment)
+    :param stimulFunctions: iterable of function with single param env (HdlSimulator)
         which are driving the simulation
     :param outputFile: file where vcd will be dumped
     :param time: endtime of simulation, time units are defined in HdlSimulator
@@ -165,17 +210,21 @@ class CallbackLoop(object):
         :attention: if condFn is None callback function is always executed
 
         :ivar isGenerator: flag if callback function is generator or normal function
+        :ivar sim: simulator (or its lane view) which was used to start this loop,
+            callbacks are executed with it
         """
         self.isGenerator = inspect.isgeneratorfunction(fn)
         self.condFn = condFn
         self.fn = fn
+        self.sim = None
         try:
             # if sig is interface we need internal signal
             self.sig = sig._sigInside
         except AttributeError:
             self.sig = sig
 
-    def onWriteCallback(self, sim):
+    def onWriteCallback(self, _sim):
+        sim = self.sim
         s = self.sig
         cond = self.condFn(s, sim)
         if cond is None or cond:
@@ -191,20 +240,49 @@ class CallbackLoop(object):
         """
         Process for injecting of this callback loop into simulator
         """
+        self.sim = sim
         self.sig._writeCallbacks.append(self.onWriteCallback)
         yield sim.wait(0)
 
 
 def isRising(sig, sim):
-    return bool(sim.read(sig)._onRisingEdge(sim.now))
+    if isinstance(sig, InterfaceBase):
+        sig = sig._sigInside
+    val, vld = sim.readRaw(sig)
+    return bool(sig._val.updateTime == sim.now and val and vld)
+
+
+def onEdge(sig, fn, rising=True):
+    """
+    Call function (or generator) everytime when signal is on rising
+    (falling) edge, callback is registered directly on signal
+    (see SimSignal.simAddEdgeCallback)
+
+    :return: simulation process which registers callback
+    """
+    def registerEdgeCallback(sim):
+        s = sig
+        if isinstance(s, InterfaceBase):
+            s = s._sigInside
+        s.simAddEdgeCallback(sim, fn, rising=rising)
+        return
+        yield
+
+    return registerEdgeCallback
 
 
 def onRisingEdge(sig, fn):
     """
     Call function (or generator) everytime when signal is on rising edge
     """
-    c = CallbackLoop(sig, isRising, fn)
-    return c.initProcess
+    return onEdge(sig, fn, rising=True)
+
+
+def onFallingEdge(sig, fn):
+    """
+    Call function (or generator) everytime when signal is on falling edge
+    """
+    return onEdge(sig, fn, rising=False)
 
 
 def onRisingEdgeNoReset(sig, reset, fn):
@@ -225,21 +303,27 @@ def onRisingEdgeNoReset(sig, reset, fn):
 def oscilate(sig, period=10 * Time.ns, initWait=0):
     """
     Oscilative simulation driver for your signal
-    (usually used as clk generator)
+    (usually used as clk generator, see clockSource)
     """
+    return clockSource(sig, period=period, phase=initWait)
 
-    def oscilateStimul(s):
-        s.write(False, sig)
-        halfPeriod = period / 2
-        yield s.wait(initWait)
 
-        while True:
-            yield s.wait(halfPeriod)
-            s.write(True, sig)
-            yield s.wait(halfPeriod)
-            s.write(False, sig)
+def clockSource(sig, period=10 * Time.ns, phase=0, dutyCycle=0.5):
+    """
+    Simulation driver which starts native clock generator of simulator
+    (ClockSource) for signal, there is no simulation process for every clock
+    edge as with generator based drivers
+
+    :param phase: delay of start of first period (clock is low until
+        phase + period * (1 - dutyCycle))
+    :param dutyCycle: ratio of time of high level to period
+    """
+    def clockSourceStimul(s):
+        s.addClock(sig, period, phase=phase, dutyCycle=dutyCycle)
+        return
+        yield
 
-    return oscilateStimul
+    return clockSourceStimul
 
 
 def pullDownAfter(sig, intDelay=6 * Time.ns):
@@ -0,0 +1,216 @@
+from collections import deque
+import os
+import pickle
+import sys
+import traceback
+
+from hwt.simulator.exceptions import SimException
+from hwt.simulator.simModel import walkSimModels
+from hwt.simulator.simulatorCore import Event, HdlProcess, ReusableProcess, \
+    TimeSlot
+
+
+def _copyAttr(v):
+    """
+    Copy containers and agent queues (objects with queue interface
+    popleft/append/copy, e.g. LazyAgentQueue, NpCaptureBuffer,
+    see toAgentQueue), other objects are shared
+    """
+    if isinstance(v, (list, deque, dict, set)) or hasattr(v, "popleft"):
+        return v.copy()
+    return v
+
+
+class SimCheckpoint(object):
+    """
+    Snapshot of state of HdlSimulator (in single process)
+
+    Captured state: time, time queue (with state of events in it
+    and of events/processes waiting on them), values of all signals
+    of sim model and theirs write callbacks, internal queues of simulator
+    and attributes of agents (containers and agent queues are copied,
+    see _copyAttr).
+
+    :attention: generators of simulation processes can not be copied,
+        restore is possible only if processes which were suspended in time
+        of checkpoint were not resumed since then (processes of edge callbacks
+        are started again for every edge, so agents based on SyncAgentBase
+        are not a problem if they are not suspended in time of checkpoint),
+        use HdlSimulator.runForked() for full snapshot of simulation
+    :attention: config of simulator (e.g. vcd writer) is not restored
+
+    :ivar now: time of checkpoint
+    """
+    def __init__(self, sim, agents=()):
+        self.now = sim.now
+        self._times = list(sim._times)
+        self._slots = {}
+        self._events = {}
+        for t, slot in sim._slots.items():
+            s = TimeSlot()
+            for q, sq in zip(s.queues, slot.queues):
+                q.extend(sq)
+                for fn, _ in sq:
+                    self._captureEvent(getattr(fn, "__self__", None))
+            s.applyComb = slot.applyComb
+            s.applySeq = slot.applySeq
+            self._slots[t] = s
+        self._captureEvent(sim.updateComplete)
+
+        self._simState = {k: _copyAttr(getattr(sim, k)) for k in (
+            "applyValPlaned", "runSeqProcessesPlaned", "valuesToApply",
+            "slotsToCommit", "seqProcsToRun", "combProcsDirty")}
+        self._combProcsToRun = [list(procs) for procs in sim.combProcsToRun]
+
+        self._signals = []
+        # [(ReusableProcess, generator, steps)] of edge callbacks
+        self._reusableProcs = []
+        if sim.model is not None:
+            for m in walkSimModels(sim.model):
+                for s in m._cntx.signals:
+                    for _, p in s._risingEdgeCallbacks + s._fallingEdgeCallbacks:
+                        if isinstance(p, ReusableProcess):
+                            self._reusableProcs.append((p, p._generator, p._steps))
+                    val = s._val.clone()
+                    if s._oldVal is s._val:
+                        oldVal = val
+                    else:
+                        oldVal = s._oldVal.clone()
+                    if s._nextOwner is None:
+                        nextSlot = None
+                    else:
+                        nextSlot = (s._next, s._nextIndexes, s._nextEv,
+                                    s._nextInvalid, s._nextOwner)
+                    self._signals.append((s, val, oldVal, list(s._writeCallbacks),
+                                          nextSlot))
+
+        self._agents = [(a, {k: _copyAttr(v) for k, v in a.__dict__.items()})
+                        for a in agents]
+
+    def _captureEvent(self, ev):
+        """
+        Capture state of event and of events (processes) waiting on it
+        """
+        if not isinstance(ev, Event) or ev in self._events:
+            return
+
+        callbacks = ev.callbacks
+        if callbacks is not None:
+            callbacks = list(callbacks)
+        self._events[ev] = (callbacks, ev._value, getattr(ev, "_steps", None))
+
+        if callbacks:
+            for c in callbacks:
+                self._captureEvent(getattr(c, "__self__", None))
+
+    def restore(self, sim):
+        """
+        Restore state of simulator from this checkpoint
+        """
+        for ev, (_, _, steps) in self._events.items():
+            if (isinstance(ev, HdlProcess) and not isinstance(ev, ReusableProcess)
+                    and ev._steps != steps):
+                raise SimException(
+                    "Simulation process %r was resumed after checkpoint in time %r,"
+                    " its state can not be restored (use runForked)" % (
+                        ev._generator, self.now))
+
+        for p, gen, steps in self._reusableProcs:
+            if gen is not None and (p._generator is not gen or p._steps != steps):
+                raise SimException(
+                    "Simulation process %r was resumed after checkpoint in time %r,"
+                    " its state can not be restored (use runForked)" % (
+                        gen, self.now))
+
+        for p, gen, _ in self._reusableProcs:
+            # runs started after checkpoint are discarded
+            p._generator = gen
+
+        sim.now = self.now
+        sim._times = list(self._times)
+        sim._slots = {}
+        for t, slot in self._slots.items():
+            s = TimeSlot()
+            for q, sq in zip(s.queues, slot.queues):
+                q.extend(sq)
+            s.applyComb = slot.applyComb
+            s.applySeq = slot.applySeq
+            sim._slots[t] = s
+
+        for ev, (callbacks, value, _) in self._events.items():
+            if callbacks is not None:
+                callbacks = list(callbacks)
+            ev.callbacks = callbacks
+            ev._value = value
+
+        for k, v in self._simState.items():
+            setattr(sim, k, _copyAttr(v))
+        sim.combProcsToRun = [list(procs) for procs in self._combProcsToRun]
+
+        for s, val, oldVal, callbacks, nextSlot in self._signals:
+            v = val.clone()
+            s._val = v
+            if oldVal is val:
+                s._oldVal = v
+            else:
+                s._oldVal = oldVal.clone()
+            s._writeCallbacks = list(callbacks)
+            s.simClearNext()
+            if nextSlot is not None:
+                (s._next, s._nextIndexes, s._nextEv,
+                 s._nextInvalid, s._nextOwner) = nextSlot
+
+        for a, d in self._agents:
+            a.__dict__.clear()
+            a.__dict__.update({k: _copyAttr(v) for k, v in d.items()})
+
+
+def runForked(sim, fn):
+    """
+    Run fn(sim) in forked process, child process obtains copy-on-write
+    snapshot of whole state of this process (including generators
+    of simulation processes), state of this process is not affected
+
+    :attention: uses os.fork (Linux only), output of child to files
+        which are not flushed is lost
+    :return: return value of fn (has to be picklable)
+    :raise: exception raised by fn (cause contains traceback from child)
+    """
+    sys.stdout.flush()
+    sys.stderr.flush()
+
+    r, w = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        # child
+        os.close(r)
+        try:
+            try:
+                res = (True, fn(sim), None)
+            except BaseException as e:
+                res = (False, e, traceback.format_exc())
+            try:
+                data = pickle.dumps(res)
+            except Exception:
+                data = pickle.dumps((False, SimException(
+                    "Result of forked simulation %r is not picklable" % (res[1], )),
+                    traceback.format_exc()))
+
+            with os.fdopen(w, "wb") as f:
+                f.write(data)
+        finally:
+            os._exit(0)
+
+    os.close(w)
+    with os.fdopen(r, "rb") as f:
+        data = f.read()
+    os.waitpid(pid, 0)
+
+    if not data:
+        raise SimException("Forked simulation process %d died" % pid)
+
+    ok, res, tb = pickle.loads(data)
+    if ok:
+        return res
+    else:
+        raise res from SimException("Forked simulation failed:\n" + tb)
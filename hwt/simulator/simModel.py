@@ -14,7 +14,7 @@ def sensitivity(proc, *sensitiveTo):
             elif sen == SENSITIVITY.RISING:
                 s.simRisingSensProcs.add(proc)
             elif sen == SENSITIVITY.FALLING:
-                s.simRisingSensProcs.add(proc)
+                s.simFallingSensProcs.add(proc)
             else:
                 raise AssertionError(sen)
         else:
@@ -40,7 +40,82 @@ def simEvalCond(simulator, *conds):
     return _cond, _vld
 
 class SimModel(object):
-    pass
+    """
+    Base class of generated simulation models
+
+    :cvar _directWrite: if True processes of model do not yield their outputs
+        but write them to next-value slots of signals (SimSignal.simDrive)
+    """
+    _directWrite = False
+
+
+def walkSimModels(model):
+    """
+    Walk model and all its submodels
+    """
+    yield model
+    for u in model._units:
+        yield from walkSimModels(u)
+
+
+def rankCombProcesses(model):
+    """
+    Levelize combinational processes of model and its submodels,
+    rank of process is length of longest path of combinational processes
+    which drives any of its inputs
+
+    :return: dict {process: rank}, processes which are part of combinational loop
+        (or depends on such a loop) are not present in result,
+        if model does not contain information about outputs of processes
+        result is empty
+    """
+    outputs = {}
+    procs = []
+    evDependent = set()
+    for m in walkSimModels(model):
+        try:
+            outputs.update(m._outputs)
+        except AttributeError:
+            # model generated by older serializer
+            return {}
+        procs.extend(m._processes)
+        for s in m._interfaces:
+            evDependent.update(s.simRisingSensProcs)
+            evDependent.update(s.simFallingSensProcs)
+
+    comb = [p for p in procs if p not in evDependent]
+    combSet = set(comb)
+
+    successors = {}
+    inDegree = {p: 0 for p in comb}
+    for p in comb:
+        succ = set()
+        for s in outputs.get(p, ()):
+            for q in s.simSensProcs:
+                if q in combSet:
+                    succ.add(q)
+
+        for q in succ:
+            inDegree[q] += 1
+        successors[p] = succ
+
+    # Kahn's algorithm, processes in loops never get to zero in degree
+    ranks = {}
+    ready = [p for p in comb if inDegree[p] == 0]
+    for p in ready:
+        ranks[p] = 0
+
+    while ready:
+        p = ready.pop()
+        r = ranks[p] + 1
+        for q in successors[p]:
+            if ranks.get(q, -1) < r:
+                ranks[q] = r
+            inDegree[q] -= 1
+            if inDegree[q] == 0:
+                ready.append(q)
+
+    return {p: r for p, r in ranks.items() if inDegree[p] == 0}
 
 def connectSimPort(simUnit, subSimUnit, srcName, dstName, direction):
     if direction == DIRECTION.OUT:
@@ -58,31 +133,59 @@ def connectSimPort(simUnit, subSimUnit, srcName, dstName, direction):
 def mkUpdater(nextVal, invalidate):
     """
     Create value updater for simulation
+
+    (nextVal is copied only if value of signal changes, otherwise
+    actual value object of signal is kept, so nextVal can be shared
+    with other signals or cached)
     """
-    
-    def updater(currentVal):
-        _nextVal = nextVal.clone()
-        if invalidate:
+    if invalidate:
+        def updater(currentVal):
+            _nextVal = nextVal.clone()
             _nextVal.vldMask = 0
-        return (valueHasChanged(currentVal, _nextVal), _nextVal)
+            return (valueHasChanged(currentVal, _nextVal), _nextVal)
+    else:
+        def updater(currentVal):
+            if valueHasChanged(currentVal, nextVal):
+                return (True, nextVal.clone())
+            else:
+                return (False, currentVal)
+
     return updater
-            
+
+
+def updateArrayItem(currentVal, nextItemVal, indexes, invalidate):
+    """
+    Write item to value of array type (value is modified in place)
+
+    :param indexes: tuple of indexes, there are multiple indexes for items
+        of multidimensional arrays (first index is index to outer array)
+    :return: tuple (valueHasChangedFlag, currentVal)
+    """
+    if invalidate:
+        nextItemVal = nextItemVal.clone()
+        nextItemVal.vldMask = 0
+    # else item is copied in _setitem__val
+
+    arr = currentVal
+    for index in indexes[:-1]:
+        if not index._isFullVld():
+            # invalid index invalidates whole array
+            arr._setitem__val(index, nextItemVal)
+            return (True, currentVal)
+        arr = arr._getitemRef__val(index)
+
+    index = indexes[-1]
+    change = valueHasChanged(arr._getitem__val(index), nextItemVal)
+    arr._setitem__val(index, nextItemVal)
+    return (change, currentVal)
+
 
 def mkArrayUpdater(nextItemVal, indexes, invalidate):
     """
     Create value updater for simulation for value of array type
+    (see updateArrayItem)
     """
     def updater(currentVal):
-        if len(indexes) > 1:
-            raise NotImplementedError()
-
-        _nextItemVal = nextItemVal.clone()        
-        if invalidate:
-            _nextItemVal.vldMask = 0
-            
-        index = indexes[0]
-        change = valueHasChanged(currentVal._getitem__val(index), _nextItemVal)
-        currentVal._setitem__val(index, _nextItemVal) 
-        return (change, currentVal)
+        return updateArrayItem(currentVal, nextItemVal, indexes, invalidate)
 
     return updater
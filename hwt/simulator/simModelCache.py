@@ -0,0 +1,358 @@
+import hashlib
+import marshal
+import os
+import pickle
+import sys
+
+import hwt
+from hwt.synthesizer.param import evalParam
+
+
+class SimModelCacheItem(object):
+    """
+    Cached simulation model
+
+    :ivar code: code object of module of sim model
+    :ivar source: source code of module of sim model
+    :ivar modelName: name of class of top sim model in module
+    :ivar interfaces: list of tuples (direction, name of signal in sim model
+        or None for interfaces with subinterfaces) for all interfaces of unit
+        in pre-order, None if unit can not be loaded without synthesis
+    """
+    def __init__(self, code, source, modelName, interfaces):
+        self.code = code
+        self.source = source
+        self.modelName = modelName
+        self.interfaces = interfaces
+
+
+def walkInterfaces(interfaces):
+    """
+    Walk interfaces and all their subinterfaces (pre-order)
+    """
+    for i in interfaces:
+        yield i
+        yield from walkInterfaces(i._interfaces)
+
+
+def describeInterfaces(unit):
+    """
+    :return: description of interfaces of synthesised unit
+        for SimModelCacheItem.interfaces
+    """
+    descr = []
+    for i in walkInterfaces(unit._interfaces):
+        if i._multipliedBy is not None:
+            # signals of array items are not in sim model
+            return None
+
+        if i._interfaces:
+            sigName = None
+        else:
+            sigName = i._sigInside.name
+        descr.append((i._direction, sigName))
+
+    return descr
+
+
+def loadInterfaces(unit, item, modelCls):
+    """
+    Load declarations of unit and connect its interfaces to sim model,
+    directions of interfaces are restored from cache item
+    so unit does not have to be synthesised
+    """
+    unit._loadDeclarations()
+    unit._name = item.modelName
+    intfs = list(walkInterfaces(unit._interfaces))
+    assert len(intfs) == len(item.interfaces), (unit, item.modelName)
+    for i, (d, sigName) in zip(intfs, item.interfaces):
+        i._direction = d
+        if sigName is not None:
+            i._sigInside = getattr(modelCls, sigName)
+
+
+class SimModelCache(object):
+    """
+    Cache of compiled code of generated simulation models,
+    every use of cached model executes code again, so every model
+    has its own classes and signals
+
+    :attention: unit has to be fully described by its class and values
+        of its params
+    :ivar _items: dict {key: SimModelCacheItem}
+    """
+    def __init__(self):
+        self._items = {}
+
+    @staticmethod
+    def getKey(unit, serializer):
+        """
+        :return: key of sim model for unit, it is string made from name of unit class,
+            values of params and name of serializer class
+        """
+        params = ", ".join(map(lambda p: "%s=%r" % (p.getName(unit), evalParam(p).val),
+                               unit._params))
+        uCls = unit.__class__
+        return "%s.%s(%s):%s.%s" % (uCls.__module__, uCls.__qualname__, params,
+                                    serializer.__module__, serializer.__qualname__)
+
+    def get(self, key):
+        """
+        :return: SimModelCacheItem or None if there is no such a model
+        """
+        return self._items.get(key, None)
+
+    def put(self, key, item, unit):
+        """
+        :param unit: synthesised unit from which sim model was generated
+        """
+        self._items[key] = item
+
+    def invalidate(self, key=None):
+        """
+        Remove item from cache (all items if key is None)
+        """
+        if key is None:
+            self._items.clear()
+        else:
+            self._items.pop(key, None)
+
+    def clear(self):
+        self.invalidate()
+
+
+_hwtFingerprint = None
+
+
+def getHwtFingerprint():
+    """
+    :return: hash of all sources of hwt library (changes with every version
+        of hwt and every modification of serializers of sim model)
+    """
+    global _hwtFingerprint
+    if _hwtFingerprint is None:
+        root = os.path.dirname(hwt.__file__)
+        h = hashlib.sha1()
+        for d, dirs, files in os.walk(root):
+            dirs.sort()
+            for f in sorted(files):
+                if f.endswith((".py", ".vhd", ".v")):
+                    p = os.path.join(d, f)
+                    h.update(os.path.relpath(p, root).encode())
+                    with open(p, "rb") as fp:
+                        h.update(fp.read())
+        _hwtFingerprint = h.hexdigest()
+
+    return _hwtFingerprint
+
+
+def fileHash(fileName):
+    h = hashlib.sha1()
+    with open(fileName, "rb") as f:
+        h.update(f.read())
+    return h.hexdigest()
+
+
+def sourcesOfUnit(unit):
+    """
+    :return: set of names of source files of classes of unit,
+        its subunits and interfaces (including base classes)
+    """
+    files = set()
+    classes = set()
+
+    def addObj(o):
+        for cls in o.__class__.__mro__:
+            if cls in classes:
+                continue
+            classes.add(cls)
+            m = sys.modules.get(cls.__module__, None)
+            f = getattr(m, "__file__", None)
+            if f is not None:
+                files.add(os.path.abspath(f))
+
+    def walkUnit(u):
+        addObj(u)
+        for i in walkInterfaces(u._interfaces):
+            addObj(i)
+        for su in u._units:
+            walkUnit(su)
+
+    walkUnit(unit)
+    return files
+
+
+class SimModelDiskCache(SimModelCache):
+    """
+    Persistent cache of generated simulation models, models are stored
+    in directory and they can be reused by another processes
+    (e.g. next run of tests on unchanged design)
+
+    Every model is stored in two files named by hash of its key
+    (key contains class of unit, values of params, serializer, fingerprint
+    of hwt sources and version of python):
+    .py with source code of model and .simmodel with compiled code
+    and informations required to load unit without synthesis.
+    Hashes of source files of unit and its subunits and interfaces are
+    stored as well and model is invalidated if any of them changes.
+
+    Least recently used models are removed when size of directory exceeds
+    maxSize.
+
+    :ivar path: directory of cache
+    :ivar maxSize: max size of all files in cache (in bytes)
+    :ivar onInvalidate: list of functions(key) called when item is removed
+        from cache because it is invalid (or invalidate() was called)
+    """
+    EXT = ".simmodel"
+
+    def __init__(self, path, maxSize=256 * 1024 * 1024):
+        super(SimModelDiskCache, self).__init__()
+        self.path = path
+        self.maxSize = maxSize
+        self.onInvalidate = []
+        os.makedirs(path, exist_ok=True)
+
+    def getKey(self, unit, serializer):
+        k = super(SimModelDiskCache, self).getKey(unit, serializer)
+        return "%s:hwt-%s:%s" % (k, getHwtFingerprint(), sys.implementation.cache_tag)
+
+    def _fileName(self, key, ext):
+        h = hashlib.sha1(key.encode()).hexdigest()
+        return os.path.join(self.path, h + ext)
+
+    def _load(self, key):
+        fileName = self._fileName(key, self.EXT)
+        try:
+            with open(fileName, "rb") as f:
+                d = pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception:
+            # corrupted file
+            self._remove(key)
+            return None
+
+        if d["key"] != key:
+            # hash collision
+            return None
+
+        try:
+            for src, h in d["sources"].items():
+                if fileHash(src) != h:
+                    raise ValueError(src)
+        except (OSError, ValueError):
+            self.invalidate(key)
+            return None
+
+        try:
+            code = marshal.loads(d["code"])
+        except (EOFError, ValueError, TypeError):
+            code = compile(d["source"], "<simModel %s>" % key, "exec")
+
+        # update time of last use for LRU
+        os.utime(fileName)
+
+        return SimModelCacheItem(code, d["source"], d["modelName"], d["interfaces"])
+
+    def get(self, key):
+        item = super(SimModelDiskCache, self).get(key)
+        if item is None:
+            item = self._load(key)
+            if item is not None:
+                self._items[key] = item
+
+        return item
+
+    def put(self, key, item, unit):
+        super(SimModelDiskCache, self).put(key, item, unit)
+        sources = {f: fileHash(f) for f in sourcesOfUnit(unit)
+                   if os.path.isfile(f)}
+        d = {"key": key,
+             "modelName": item.modelName,
+             "interfaces": item.interfaces,
+             "sources": sources,
+             "source": item.source,
+             "code": marshal.dumps(item.code)}
+
+        # files are written atomically because cache can be shared
+        # between multiple processes
+        for ext, data in [(".py", item.source.encode()),
+                          (self.EXT, pickle.dumps(d))]:
+            fileName = self._fileName(key, ext)
+            tmp = "%s.%d.tmp" % (fileName, os.getpid())
+            with open(tmp, "wb") as f:
+                f.write(data)
+            os.replace(tmp, fileName)
+
+        self.evict()
+
+    def _remove(self, key):
+        for ext in (".py", self.EXT):
+            try:
+                os.remove(self._fileName(key, ext))
+            except FileNotFoundError:
+                pass
+
+    def invalidate(self, key=None):
+        """
+        Remove item from cache (all items if key is None)
+        """
+        super(SimModelDiskCache, self).invalidate(key)
+        if key is None:
+            for f in os.listdir(self.path):
+                if f.endswith((".py", self.EXT)):
+                    try:
+                        os.remove(os.path.join(self.path, f))
+                    except FileNotFoundError:
+                        pass
+        else:
+            self._remove(key)
+
+        for fn in self.onInvalidate:
+            fn(key)
+
+    def size(self):
+        """
+        :return: size of all files in cache (in bytes)
+        """
+        return sum(map(lambda e: e[1], self._entries()))
+
+    def _entries(self):
+        """
+        :return: list of tuples (base of file name, size, time of last use)
+        """
+        entries = {}
+        for f in os.listdir(self.path):
+            base, ext = os.path.splitext(f)
+            if ext not in (".py", self.EXT):
+                continue
+            try:
+                st = os.stat(os.path.join(self.path, f))
+            except FileNotFoundError:
+                continue
+            size, mtime = entries.get(base, (0, 0))
+            entries[base] = (size + st.st_size, max(mtime, st.st_mtime))
+
+        return [(b, s, t) for b, (s, t) in entries.items()]
+
+    def evict(self):
+        """
+        Remove least recently used models until size of cache
+        is lower than maxSize
+        """
+        entries = self._entries()
+        size = sum(map(lambda e: e[1], entries))
+        if size <= self.maxSize:
+            return
+
+        entries.sort(key=lambda e: e[2])
+        for base, s, _ in entries:
+            if size <= self.maxSize:
+                break
+            for ext in (".py", self.EXT):
+                try:
+                    os.remove(os.path.join(self.path, base + ext))
+                except FileNotFoundError:
+                    pass
+            size -= s
@@ -1,4 +1,10 @@
+from inspect import isgeneratorfunction
+
 from hwt.hdlObjects.variables import SignalItem
+from hwt.simulator.exceptions import SimException
+from hwt.simulator.simModel import updateArrayItem
+from hwt.simulator.simulatorCore import PRIORITY_URGENT, ReusableProcess
+from hwt.simulator.utils import valueHasChanged
 
 
 class SimSignal(SignalItem):
@@ -7,17 +13,42 @@ class SimSignal(SignalItem):
 
     :ivar _writeCallbacks: list of callback functions(signal, simulator) which is called
         when new (changed) value is written to this signal
+    :ivar _logChangeSkip: logChange function of simulator config which should not
+        be called for this signal (set by config, e.g. VcdHdlSimConfig) or None
+    :ivar _risingEdgeCallbacks: list of tuples (function, simulator)
+        or (None, ReusableProcess) of callbacks which are called on every
+        rising edge of this signal (see simAddEdgeCallback)
+    :ivar _fallingEdgeCallbacks: same as _risingEdgeCallbacks for falling edge
+
+    Next-value slot (used by processes with direct-write ABI, see simDrive):
+
+    :ivar _next: value written by process
+    :ivar _nextIndexes: tuple of indexes if item of array was written or None
+    :ivar _nextEv: isEventDependent flag of write
+    :ivar _nextInvalid: flag that process wrote different values
+        in single evaluation (value will be invalidated)
+    :ivar _nextOwner: process which wrote slot or None if slot is empty
+    :ivar _nextStamp: id of evaluation of process which wrote slot
+    :ivar _nextUpdater: preallocated value updater which applies slot
     """
     __slots__ = ["name", "_val", "_oldVal", "_writeCallbacks",
-                 "simSensProcs", "simRisingSensProcs", "simFallingSensProcs"]
+                 "simSensProcs", "simRisingSensProcs", "simFallingSensProcs",
+                 "_next", "_nextIndexes", "_nextEv", "_nextInvalid",
+                 "_nextOwner", "_nextStamp", "_nextUpdater", "_logChangeSkip",
+                 "_risingEdgeCallbacks", "_fallingEdgeCallbacks"]
 
     def __init__(self, ctx, name, dtype, defaultVal=None):
         ctx.signals.add(self)
         self.hidden = False
         self._writeCallbacks = []
+        self._logChangeSkip = None
+        self._risingEdgeCallbacks = []
+        self._fallingEdgeCallbacks = []
         self.simSensProcs = set()
         self.simRisingSensProcs = set()
         self.simFallingSensProcs = set()
+        self.simClearNext()
+        self._nextUpdater = self._updateFromNext
         super(SimSignal, self).__init__(name, dtype, defaultVal)
 
     def simPropagateChanges(self, simulator):
@@ -58,7 +89,7 @@ class SimSignal(SignalItem):
 
         if dirtyFlag:
             log = simulator.config.logChange
-            if log:
+            if log and log is not self._logChangeSkip:
                 log(simulator.now, self, newVal)
 
             # run write callbacks we have to create new list to allow 
@@ -69,4 +100,134 @@ class SimSignal(SignalItem):
                 # simulation processes
                 simulator.process(c(simulator))
 
+            if self._risingEdgeCallbacks or self._fallingEdgeCallbacks:
+                self.simRunEdgeCallbacks(simulator, newVal)
+
             self.simPropagateChanges(simulator)
+
+    def simAddEdgeCallback(self, sim, fn, rising=True):
+        """
+        Register function(sim) (or generator function) which is called
+        on every rising (falling) edge of this signal,
+        callback stays registered, for generator function
+        there is one ReusableProcess which is started on every edge
+        (edge only schedules start of it, no process is created)
+
+        :param sim: simulator (or its lane view) which is passed to fn
+        """
+        if isgeneratorfunction(fn):
+            c = (None, ReusableProcess(sim, fn))
+        else:
+            c = (fn, sim)
+
+        if rising:
+            self._risingEdgeCallbacks.append(c)
+        else:
+            self._fallingEdgeCallbacks.append(c)
+
+    def simClearEdgeCallbacks(self):
+        self._risingEdgeCallbacks = []
+        self._fallingEdgeCallbacks = []
+
+    def _simEdgeOf(self, v):
+        """
+        :return: True for rising edge, False for falling edge,
+            None if new value v is not valid
+        """
+        if not v.vldMask:
+            return None
+        return bool(v.val)
+
+    def simRunEdgeCallbacks(self, simulator, newVal):
+        """
+        Dispatch edge callbacks, processes of generator callbacks
+        are started and functions are scheduled
+        (both are executed with urgent priority in actual time)
+        """
+        edge = self._simEdgeOf(newVal)
+        if edge is None:
+            return
+        elif edge:
+            callbacks = self._risingEdgeCallbacks
+        else:
+            callbacks = self._fallingEdgeCallbacks
+
+        now = simulator.now
+        for fn, arg in callbacks:
+            if fn is None:
+                # ReusableProcess
+                arg.start()
+            else:
+                simulator._schedule(now, PRIORITY_URGENT, fn, arg)
+
+    def simDrive(self, simulator, val, isEvDependent, indexes=None):
+        """
+        Write output of process to next-value slot of this signal
+        (called by processes with direct-write ABI instead of yield,
+        slot is committed by simulator, see simCommitNext)
+
+        :param indexes: tuple of indexes if item of array is written
+        """
+        if self._nextStamp == simulator._evalStamp:
+            # second write in single evaluation of process
+            # (condition was invalid and both branches were evaluated)
+            if not (self._nextIndexes is None and indexes is None
+                    and _isSameVal(self._next, val)):
+                self._nextInvalid = True
+            return
+
+        proc = simulator._actProc
+        owner = self._nextOwner
+        if owner is not None and owner is not proc:
+            raise SimException("%s is driven by multiple processes (%r, %r)"
+                               % (self.name, owner, proc))
+
+        self._next = val
+        self._nextIndexes = indexes
+        self._nextEv = isEvDependent
+        self._nextInvalid = False
+        self._nextOwner = proc
+        self._nextStamp = simulator._evalStamp
+        simulator._lastDriven = self
+
+    def _updateFromNext(self, currentVal):
+        indexes = self._nextIndexes
+        if indexes is not None:
+            return updateArrayItem(currentVal, self._next, indexes, self._nextInvalid)
+
+        nextVal = self._next
+        if self._nextInvalid:
+            nextVal = nextVal.clone()
+            nextVal.vldMask = 0
+            return (valueHasChanged(currentVal, nextVal), nextVal)
+        elif valueHasChanged(currentVal, nextVal):
+            return (True, nextVal.clone())
+        else:
+            return (False, currentVal)
+
+    def simCommitNext(self, simulator):
+        """
+        Apply value from next-value slot and release slot
+        (nothing happens if slot is empty)
+        """
+        if self._nextOwner is None:
+            return
+        self._nextOwner = None
+        self._nextStamp = -1
+        self.simUpdateVal(simulator, self._nextUpdater)
+
+    def simClearNext(self):
+        """
+        Release next-value slot without application of its value
+        """
+        self._next = None
+        self._nextIndexes = None
+        self._nextEv = False
+        self._nextInvalid = False
+        self._nextOwner = None
+        self._nextStamp = -1
+
+
+def _isSameVal(a, b):
+    return a is b or (isinstance(a.val, int)
+                      and a.val == b.val and a.vldMask == b.vldMask)
@@ -21,9 +21,14 @@ class IndexSimSignalProxy(SimSignal):
 
         self.hidden = False
         self._writeCallbacks = []
+        self._logChangeSkip = None
+        self._risingEdgeCallbacks = []
+        self._fallingEdgeCallbacks = []
         self.simSensProcs = set()
         self.simRisingSensProcs = set()
         self.simFallingSensProcs = set()
+        self.simClearNext()
+        self._nextUpdater = self._updateFromNext
         self._signal = baseSignal
         if lowerIndex is None:
             self.__index = toHVal(upperIndex)
@@ -1,4 +1,5 @@
 from _random import Random
+from collections import deque
 import difflib
 from inspect import isgenerator
 import os
@@ -9,13 +10,26 @@ from unittest.util import safe_repr, _common_shorten_repr
 from hwt.hdlObjects.constants import Time
 from hwt.hdlObjects.types.arrayVal import ArrayVal
 from hwt.hdlObjects.value import Value
-from hwt.simulator.agentConnector import valToInt
+from hwt.serializer.simModel.serializer import SimModelSerializer
+from hwt.simulator.agentConnector import valToInt, collectAgents
 from hwt.simulator.configVhdlTestbench import HdlSimConfigVhdlTestbench
 from hwt.simulator.hdlSimulator import HdlSimulator
+from hwt.simulator.profilingHdlSimConfig import ProfilingHdlSimConfig
+from hwt.simulator.scoreboard import Scoreboard
 from hwt.simulator.shortcuts import simPrepare
 from hwt.simulator.simSignal import SimSignal
+from hwt.simulator.stimulusTrace import StimulusRecorder, StimulusReplay
+from hwt.simulator.stopConditions import AgentsDrained
 from hwt.simulator.utils import agent_randomize
-from hwt.simulator.vcdHdlSimConfig import VcdHdlSimConfig
+from hwt.simulator.vcdHdlSimConfig import VcdHdlSimConfig, \
+    RingBufferVcdHdlSimConfig
+
+
+def _isNpSequence(seq):
+    """
+    :return: True if seq is numpy array or NpCaptureBuffer
+    """
+    return hasattr(seq, "toNumpy") or (hasattr(seq, "dtype") and hasattr(seq, "tolist"))
 
 
 def allValuesToInts(sequenceOrVal):
@@ -26,7 +40,7 @@ def allValuesToInts(sequenceOrVal):
         return valToInt(sequenceOrVal)
     elif not sequenceOrVal:
         return sequenceOrVal
-    elif isinstance(sequenceOrVal, (list, tuple)) or isgenerator(sequenceOrVal):
+    elif isinstance(sequenceOrVal, (list, tuple, deque)) or isgenerator(sequenceOrVal):
         l = []
         for i in sequenceOrVal:
             l.append(allValuesToInts(i))
@@ -39,35 +53,151 @@ def allValuesToInts(sequenceOrVal):
         return sequenceOrVal
 
 
+class _FailureRecorder(object):
+    """
+    Proxy of TestResult which records if there was any failure or error
+    reported for test
+    """
+    def __init__(self, result):
+        self._result = result
+        self.failed = False
+
+    def __getattr__(self, name):
+        return getattr(self._result, name)
+
+    def addError(self, test, err):
+        self.failed = True
+        self._result.addError(test, err)
+
+    def addFailure(self, test, err):
+        self.failed = True
+        self._result.addFailure(test, err)
+
+    def addSubTest(self, test, subtest, err):
+        if err is not None:
+            self.failed = True
+        self._result.addSubTest(test, subtest, err)
+
+
 class SimTestCase(unittest.TestCase):
     """
     This is TestCase class contains methods which are usually used during
     hdl simulation.
 
     :attention: self.model, self.procs has to be specified before running doSim (you can use prepareUnit method)
+    :cvar _simModelSerializer: serializer used to generate sim model in prepareUnit
+        (SimModelIntSerializer can be used for faster integer based model)
+    :cvar _simulatorCls: simulator class used in doSim
+        (HdlCycleSimulator can be used for faster simulation of single clock designs)
+    :cvar _simModelCache: optional SimModelCache used in prepareUnit
+        (set by ParallelSimTestRunner in every worker, SimModelDiskCache
+        can be used to reuse sim models between runs of tests)
+    :cvar _simProfilingSamplingPeriod: if not None simulation in doSim is profiled
+        by ProfilingHdlSimConfig with this sampling period and profile is written
+        to tmp/<test name>_profile.json
+    :cvar _vcdSignalSelection: dict of selection options for VcdHdlSimConfig
+        used in doSim (include, exclude, maxDepth, portsOnly, sampleOn)
+    :cvar _vcdFullDump: if True waveform of whole simulation is always written
+        to tmp/<test name>.vcd (for debugging), if False only last _vcdRingTime
+        of waveform is kept in memory and it is written only if test fails
+    :cvar _vcdRingTime: length of kept part of waveform (None for whole simulation)
     """
     _defaultSeed = 317
     _rand = Random(_defaultSeed)
+    _simModelSerializer = SimModelSerializer
+    _simulatorCls = HdlSimulator
+    _simModelCache = None
+    _simProfilingSamplingPeriod = None
+    _vcdSignalSelection = {}
+    _vcdFullDump = False
+    _vcdRingTime = 100 * Time.us
+    _vcdRing = None
+    _scoreboard = None
 
     def getTestName(self):
         className, testName = self.id().split(".")[-2:]
         return "%s_%s" % (className, testName)
 
-    def doSim(self, time):
+    def doSim(self, time, stopWhen=None, idleCycles=None, recordStimuli=False):
+        """
+        Run simulation of self.model with processes self.procs,
+        waveform is written to tmp/<test name>.vcd
+        (if _vcdFullDump is False only if test fails)
+
+        :param time: max time of simulation
+        :param stopWhen: optional function(simulator) -> bool, simulation
+            is stopped before time when it returns True (e.g. self.agentsDrained())
+        :param idleCycles: if not None idle fast-forward is enabled
+            (see HdlSimulator.fastForwardIdle)
+        :param recordStimuli: if True values written by agents and stimulus
+            processes are recorded to tmp/<test name>.stim
+            (see StimulusRecorder, doReplay)
+        :raise AssertionError: if scoreboard (see addScoreboard) found
+            a mismatch (simulation is stopped on first mismatch)
+            or some expected transactions were not received
+        """
         outputFileName = "tmp/" + self.getTestName() + ".vcd"
         d = os.path.dirname(outputFileName)
         if d:
             os.makedirs(d, exist_ok=True)
-        with open(outputFileName, 'w') as outputFile:
-            # return _simUnitVcd(simModel, stimulFunctions, outputFile=f, time=time)
-            sim = HdlSimulator()
 
-            # configure simulator to log in vcd
-            sim.config = VcdHdlSimConfig(outputFile)
-
-            # run simulation, stimul processes are register after initial initialization
+        sim = self._simulatorCls()
+        # configure simulator to log in vcd
+        if self._vcdFullDump:
+            outputFile = open(outputFileName, 'w')
+            vcd = VcdHdlSimConfig(outputFile, **self._vcdSignalSelection)
+        else:
+            outputFile = None
+            vcd = RingBufferVcdHdlSimConfig(self._vcdRingTime,
+                                            **self._vcdSignalSelection)
+            # dumped in run() if test fails
+            self._vcdRing = (vcd, outputFileName)
+        sim.config = vcd
+
+        if self._simProfilingSamplingPeriod is not None:
+            sim.config = ProfilingHdlSimConfig(
+                sim.config,
+                samplingPeriod=self._simProfilingSamplingPeriod,
+                jsonFile="tmp/" + self.getTestName() + "_profile.json")
+        if recordStimuli:
+            sim.config = StimulusRecorder(
+                sim.config,
+                traceFile="tmp/" + self.getTestName() + ".stim")
+        if stopWhen is not None:
+            sim.stopWhen(stopWhen)
+        if idleCycles is not None:
+            sim.fastForwardIdle(idleCycles)
+
+        # run simulation, stimul processes are register after initial initialization
+        try:
             sim.simUnit(self.model, time=time, extraProcesses=self.procs)
-            return sim
+        finally:
+            if outputFile is not None:
+                # waveform is written also if simulation failed
+                vcd.vcdWritter.flush()
+                outputFile.close()
+
+        if self._scoreboard is not None:
+            self._scoreboard.check()
+        return sim
+
+    def doReplay(self, trace, time):
+        """
+        Run simulation of self.model where stimuli are not generated
+        by self.procs but by replay of recorded trace (see doSim(recordStimuli=True))
+
+        :param trace: StimulusTrace instance or name of file with trace
+        """
+        self.procs = [StimulusReplay(trace).process]
+        return self.doSim(time)
+
+    def agentsDrained(self, quietCycles=10):
+        """
+        :return: stop condition for doSim, it is satisfied when drivers
+            of all agents of self.u sent all data and monitors did not
+            receive anything for quietCycles clock periods
+        """
+        return AgentsDrained(collectAgents(self.u), quietCycles=quietCycles)
 
     def dumpHdlTestbench(self, time, file=None):
         if file:
@@ -116,7 +246,13 @@ class SimTestCase(unittest.TestCase):
             datatype should be enforced.
         :param msg: Optional message to use on failure instead of a list of
             differences.
+
+        If any sequence is numpy array or NpCaptureBuffer sequences are
+        compared by vectorized comparison (see assertNpSequenceEqual).
         """
+        if _isNpSequence(seq1) or _isNpSequence(seq2):
+            return self.assertNpSequenceEqual(seq1, seq2, msg=msg)
+
         seq1 = allValuesToInts(seq1)
         if seq_type is not None:
             seq_type_name = seq_type.__name__
@@ -203,6 +339,55 @@ class SimTestCase(unittest.TestCase):
         msg = self._formatMessage(msg, standardMsg)
         self.fail(msg)
 
+    def assertNpSequenceEqual(self, seq1, seq2, msg=None):
+        """
+        Vectorized equality assertion for long sequences of ints
+
+        :param seq1: NpCaptureBuffer, numpy array or sequence of ints/None
+        :param seq2: NpCaptureBuffer, numpy array or sequence of ints/None
+        """
+        # numpy is optional dependency
+        from hwt.simulator.npAgentQueue import npFirstMismatch
+
+        mismatch = npFirstMismatch(seq1, seq2)
+        if mismatch is None:
+            return
+
+        i, len1, len2 = mismatch
+        differing = "Sequences differ (lengths %d, %d)" % (len1, len2)
+        if i < len1 and i < len2:
+            item1, item2 = seq1[i], seq2[i]
+            differing += "\nFirst differing element %d:\n%s\n%s\n" % (
+                i, safe_repr(getattr(item1, "item", lambda: item1)()),
+                safe_repr(getattr(item2, "item", lambda: item2)()))
+        else:
+            differing += "\n%s sequence contains additional elements from index %d\n" % (
+                "First" if len1 > len2 else "Second", i)
+
+        self.fail(self._formatMessage(msg, differing))
+
+    def addScoreboard(self, intf, expected, inOrder=True, window=1024,
+                      allowMissing=False):
+        """
+        Check transactions received by monitor agent of intf against expected
+        transactions during simulation, simulation is stopped on first mismatch
+        and it is reported by doSim (received transactions are not stored)
+
+        :param expected: iterable of expected transactions
+            (e.g. generator which runs reference model)
+        :param inOrder: if False transactions can be received in any order
+            within window of pending expected transactions
+        :param allowMissing: if True expected transactions which were
+            not received are not an error
+        :return: ScoreboardChannel instance
+        """
+        if self._scoreboard is None:
+            self._scoreboard = Scoreboard()
+            self.procs.append(self._scoreboard.process)
+        return self._scoreboard.addMonitor(intf, expected, inOrder=inOrder,
+                                           window=window,
+                                           allowMissing=allowMissing)
+
     def randomize(self, intf):
         """
         Randomly disable and enable interface for testing purposes
@@ -226,7 +411,31 @@ class SimTestCase(unittest.TestCase):
         self.u, self.model, self.procs = simPrepare(unit,
                                                     modelCls=modelCls,
                                                     dumpModelIn=dumpModelIn,
-                                                    onAfterToRtl=onAfterToRtl)
+                                                    onAfterToRtl=onAfterToRtl,
+                                                    serializer=self._simModelSerializer,
+                                                    cache=self._simModelCache)
+        self._scoreboard = None
+
+    def run(self, result=None):
+        """
+        Run test and write waveform kept in memory by doSim
+        to tmp/<test name>.vcd if test failed
+        """
+        if result is None:
+            result = self.defaultTestResult()
+        # failure is detected by proxy, because result does not have to store
+        # failures (e.g. result of ParallelSimTestRunner worker)
+        recorder = _FailureRecorder(result)
+        self._vcdRing = None
+        try:
+            super(SimTestCase, self).run(recorder)
+            return result
+        finally:
+            if self._vcdRing is not None:
+                if recorder.failed:
+                    vcd, fileName = self._vcdRing
+                    vcd.dump(fileName)
+                self._vcdRing = None
 
     def setUp(self):
         self._rand.seed(self._defaultSeed)
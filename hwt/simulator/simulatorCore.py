@@ -1,59 +1,338 @@
-from simpy import Environment, Event
-from simpy.events import URGENT, PENDING
-from simpy.core import BoundClass, Process
+from collections import deque
+from heapq import heappush, heappop
 
-class Initialize(Event):
-    """Initializes a process. Only used internally by :class:`Process`.
 
-    This event is automatically triggered when it is created.
+# priorities of actions planed in single time
+PRIORITY_URGENT = 0
+PRIORITY_NORMAL = 1
 
-    """
-    def __init__(self, env, process, priority):
-        # NOTE: The following initialization code is inlined from
-        # Event.__init__() for performance reasons.
-        self.env = env
-        self.callbacks = [process._resume]
-        self._value = None
+# value of event which was not triggered yet
+PENDING = object()
 
-        # The initialization events needs to be scheduled as urgent so that it
-        # will be handled before interrupts. Otherwise a process whose
-        # generator has not yet been started could be interrupted.
-        self._ok = True
-        env.schedule(self, priority)
 
-class HdlProcess(Process):
+class Event(object):
     """
-    Simulation process with optional start priority
+    Simulation event, processes are resumed after event is triggered
+    (processes can wait on event by yielding it)
+
+    :ivar callbacks: list of functions(event) which will be called
+        after event is triggered or None if event was already processed
     """
-    def __init__(self, env, generator, priority=URGENT):
-        """
-        Original __init__ with new Initialize class
-        """
-        if not hasattr(generator, 'throw'):
-            # Implementation note: Python implementations differ in the
-            # generator types they provide. Cython adds its own generator type
-            # in addition to the CPython type, which renders a type check
-            # impractical. To workaround this issue, we check for attribute
-            # name instead of type and optimistically assume that all objects
-            # with a ``throw`` attribute are generators (the more intuitive
-            # name ``__next__`` cannot be used because it was renamed from
-            # ``next`` in Python 2).
-            # Remove this workaround if it causes issues in production!
-            raise ValueError('%s is not a generator.' % generator)
+    __slots__ = ["env", "callbacks", "_value"]
 
-        # NOTE: The following initialization code is inlined from
-        # Event.__init__() for performance reasons.
+    def __init__(self, env):
         self.env = env
         self.callbacks = []
         self._value = PENDING
 
+    @property
+    def triggered(self):
+        return self._value is not PENDING
+
+    @property
+    def processed(self):
+        return self.callbacks is None
+
+    @property
+    def value(self):
+        return self._value
+
+    def succeed(self, value=None):
+        """
+        Trigger this event, callbacks are called in actual time
+        """
+        if self._value is not PENDING:
+            raise RuntimeError("%r has already been triggered" % self)
+        self._value = value
+        self.env._schedule(self.env.now, PRIORITY_NORMAL, self._process, None)
+        return self
+
+    def _process(self, _):
+        callbacks = self.callbacks
+        self.callbacks = None
+        for c in callbacks:
+            c(self)
+
+    def _addWaiter(self, process):
+        if self.callbacks is None:
+            # event was already processed, process can continue in this time
+            self.env._schedule(self.env.now, PRIORITY_NORMAL, process._resume, self)
+        else:
+            self.callbacks.append(process._resume)
+
+
+class PhaseEvent(Event):
+    """
+    Event which is reused for every occurrence of some phase of simulation
+    (e.g. updateComplete), it never becomes processed, trigger only wakes up
+    processes which are waiting for it at the moment
+    """
+    __slots__ = []
+
+    def succeed(self, value=None):
+        callbacks = self.callbacks
+        if callbacks:
+            self.callbacks = []
+            self._value = value
+            env = self.env
+            for c in callbacks:
+                env._schedule(env.now, PRIORITY_NORMAL, c, self)
+        return self
+
+
+class Timeout(object):
+    """
+    Event which is used by process to wait for specified time
+    (planed directly in time queue, there is no callback list)
+    """
+    __slots__ = ["delay", "_value"]
+
+    def __init__(self, delay, value=None):
+        if delay < 0:
+            raise ValueError("Negative delay %r" % delay)
+        self.delay = delay
+        self._value = value
+
+    def _addWaiter(self, process):
+        env = process.env
+        env._schedule(env.now + self.delay, PRIORITY_NORMAL, process._resume, self)
+
+
+class HdlProcess(Event):
+    """
+    Simulation process with optional start priority,
+    process itself is event which is triggered when process ends
+
+    :ivar _generator: generator which yields events (process waits on them)
+    :ivar _steps: number of resumptions of process (used by SimCheckpoint)
+    """
+    __slots__ = ["_generator", "_steps"]
+
+    def __init__(self, env, generator, priority=PRIORITY_URGENT):
+        if not hasattr(generator, 'throw'):
+            raise ValueError('%s is not a generator.' % generator)
+
+        super(HdlProcess, self).__init__(env)
         self._generator = generator
+        self._steps = 0
+        # schedule the start of the execution of the process
+        env._schedule(env.now, priority, self._resume, None)
+
+    def _resume(self, event):
+        self._steps += 1
+        if event is None:
+            v = None
+        else:
+            v = event._value
+
+        try:
+            ev = self._generator.send(v)
+        except StopIteration as e:
+            self.succeed(e.value)
+            return
 
-        # Schedule the start of the execution of the process.
-        self._target = Initialize(env, self, priority)
+        try:
+            addWaiter = ev._addWaiter
+        except AttributeError:
+            raise TypeError("Process %r yielded %r which is not an event"
+                            % (self._generator, ev))
+        addWaiter(self)
 
-class HdlEnvironmentCore(Environment):
+    @property
+    def is_alive(self):
+        return self._value is PENDING
+
+
+class ReusableProcess(HdlProcess):
     """
-    Simpy Environment with patched processes to allow propcess start priotiry tweaks
+    Process which runs new generator of generator function fn(sim)
+    on every start() (e.g. edge callback of agent), the same process object
+    is reused, so start is only scheduling of its resume
+
+    If previous run has not finished yet, new run is started
+    in separate HdlProcess.
+
+    :ivar _fn: generator function fn(sim)
+    :ivar _sim: simulator (or its lane view) which is passed to fn
+    :ivar _generator: generator of actual run or None if process is idle
     """
-    process = BoundClass(HdlProcess)
\ No newline at end of file
+    __slots__ = ["_fn", "_sim"]
+
+    def __init__(self, env, fn, sim=None):
+        Event.__init__(self, env)
+        self._fn = fn
+        self._sim = env if sim is None else sim
+        self._generator = None
+        self._steps = 0
+
+    def start(self, priority=PRIORITY_URGENT):
+        env = self.env
+        if self._generator is not None:
+            HdlProcess(env, self._fn(self._sim), priority)
+            return
+
+        self._generator = self._fn(self._sim)
+        env._schedule(env.now, priority, self._resume, None)
+
+    def _resume(self, event):
+        self._steps += 1
+        if event is None:
+            v = None
+        else:
+            v = event._value
+
+        try:
+            ev = self._generator.send(v)
+        except StopIteration:
+            # process can be started again
+            self._generator = None
+            return
+
+        try:
+            addWaiter = ev._addWaiter
+        except AttributeError:
+            raise TypeError("Process %r yielded %r which is not an event"
+                            % (self._generator, ev))
+        addWaiter(self)
+
+    @property
+    def is_alive(self):
+        return self._generator is not None
+
+
+class TimeSlot(object):
+    """
+    Container of actions planed in single time
+
+    :ivar queues: list of deques of tuples (fn, arg) for each priority
+    :ivar applyComb: number of planed applications of values from combinational processes
+    :ivar applySeq: flag if there is planed application of values
+        from sequential (event dependent) processes
+    """
+    __slots__ = ["queues", "applyComb", "applySeq"]
+
+    def __init__(self):
+        self.queues = (deque(), deque())
+        self.applyComb = 0
+        self.applySeq = False
+
+
+class HdlEnvironmentCore(object):
+    """
+    Discrete event simulation environment made for HDL delta-cycle semantic
+
+    Time queue is bucketed by time, in every time slot there are phases:
+
+        1. urgent actions (start of processes)
+        2. normal actions (timeouts, triggered events)
+        3. application of values from combinational processes (see _applyComb)
+        4. application of values from sequential processes (see _applySeq)
+
+    phase 3 and 4 are only planed (TimeSlot.applyComb/applySeq)
+    there is no event object for them
+
+    :ivar now: actual simulation time
+    :cvar _afterSlot: None or function() called after every time slot
+        (safe point, all actions and delta steps of time were processed),
+        if it returns True simulation is stopped in this time
+    """
+    _afterSlot = None
+
+    def __init__(self, initial_time=0):
+        self.now = initial_time
+        # heap of times which have time slot
+        self._times = []
+        # {time: TimeSlot}
+        self._slots = {}
+
+    def _getSlot(self, time):
+        try:
+            return self._slots[time]
+        except KeyError:
+            s = self._slots[time] = TimeSlot()
+            heappush(self._times, time)
+            return s
+
+    def _schedule(self, time, priority, fn, arg):
+        """
+        Plan call of fn(arg) in specified time and priority
+        """
+        self._getSlot(time).queues[priority].append((fn, arg))
+
+    def _planApplyComb(self):
+        self._getSlot(self.now).applyComb += 1
+
+    def _planApplySeq(self):
+        self._getSlot(self.now).applySeq = True
+
+    def _applyComb(self):
+        """
+        Called in phase of combinational values application
+        """
+        raise NotImplementedError()
+
+    def _applySeq(self):
+        """
+        Called in phase of sequential values application
+        """
+        raise NotImplementedError()
+
+    def event(self):
+        return Event(self)
+
+    def timeout(self, delay, value=None):
+        return Timeout(delay, value)
+
+    def process(self, generator, priority=PRIORITY_URGENT):
+        return HdlProcess(self, generator, priority)
+
+    def _runSlot(self, slot, withSeq=True):
+        """
+        Process all actions and phases of time slot
+
+        :param withSeq: if False return before application of values
+            from sequential processes (phase 4), slot can be processed
+            again later
+        """
+        urgent, normal = slot.queues
+        while True:
+            if urgent:
+                fn, arg = urgent.popleft()
+                fn(arg)
+            elif normal:
+                fn, arg = normal.popleft()
+                fn(arg)
+            elif slot.applyComb:
+                slot.applyComb -= 1
+                self._applyComb()
+            elif slot.applySeq and withSeq:
+                slot.applySeq = False
+                self._applySeq()
+            else:
+                return
+
+    def run(self, until):
+        """
+        Run simulation until specified time
+        (actions planed in time until are not executed)
+
+        :return: True if simulation was stopped before until by _afterSlot
+            (now is time of last processed time slot)
+        """
+        times = self._times
+        slots = self._slots
+        while times:
+            t = times[0]
+            if t >= until:
+                break
+            self.now = t
+            self._runSlot(slots[t])
+            heappop(times)
+            del slots[t]
+
+            afterSlot = self._afterSlot
+            if afterSlot is not None and afterSlot():
+                return True
+
+        self.now = until
+        return False
@@ -0,0 +1,393 @@
+import struct
+
+from hwt.bitmask import mask
+from hwt.hdlObjects.types.bits import Bits
+from hwt.simulator.exceptions import SimException
+from hwt.simulator.hdlSimConfig import HdlSimConfig
+from hwt.simulator.simulatorCore import PRIORITY_NORMAL
+
+
+_MAGIC = b"HWTSTIM1"
+_double = struct.Struct("<d")
+
+
+def _writeVarint(buff, n):
+    while n > 0x7f:
+        buff.append((n & 0x7f) | 0x80)
+        n >>= 7
+    buff.append(n)
+
+
+def _readVarint(data, i):
+    n = 0
+    shift = 0
+    while True:
+        b = data[i]
+        i += 1
+        n |= (b & 0x7f) << shift
+        if b < 0x80:
+            return n, i
+        shift += 7
+
+
+def _writeStr(buff, s):
+    s = s.encode()
+    _writeVarint(buff, len(s))
+    buff.extend(s)
+
+
+def _readStr(data, i):
+    n, i = _readVarint(data, i)
+    return bytes(data[i:i + n]).decode(), i + n
+
+
+def _writeTime(buff, t):
+    """
+    Time is stored as varint (t << 1) or as 1 followed by float64
+    """
+    if isinstance(t, int):
+        _writeVarint(buff, t << 1)
+    else:
+        buff.append(1)
+        buff.extend(_double.pack(t))
+
+
+def _readTime(data, i):
+    n, i = _readVarint(data, i)
+    if n & 1:
+        return _double.unpack_from(data, i)[0], i + _double.size
+    return n >> 1, i
+
+
+def modelSignalNames(model):
+    """
+    :return: dict {signal: name} for all signals of model and its submodels,
+        names of signals of submodels are prefixed by names of instances
+        ("sub0.sub1.sig"), signals shared by multiple models have name
+        from the upper most model
+    """
+    names = {}
+
+    def walk(m, prefix):
+        for s in m._interfaces:
+            names.setdefault(s, prefix + s.name)
+        units = set(map(id, m._units))
+        for k, v in sorted(vars(m).items(), key=lambda x: x[0]):
+            if id(v) in units:
+                walk(v, prefix + k + ".")
+
+    walk(model, "")
+    return names
+
+
+class StimulusTrace(object):
+    """
+    Compact binary trace of values written by simulation processes
+    (agents, stimulus functions) trough HdlSimulator.write()
+
+    File format: magic, table of signals (name, width, signed),
+    table of clocks (ClockSource: signal, period, start, lowTime)
+    and records until end of file, every record is
+
+        varint time delta (from previous record, see _writeTime)
+        varint (signal index << 2 | (vldMask is full) << 1 | phase)
+        varint value (two's complement for signed signals)
+        [varint vldMask] if vldMask is not full
+
+    phase is 1 if value was written after update of registers (event dependent
+    processes) in this time, 0 if it was written before
+
+    :ivar signals: list of tuples (name, width, signed)
+    :ivar clocks: list of tuples (signal index, period, start, lowTime)
+    :ivar data: bytearray with records
+    """
+    def __init__(self, signals=None, clocks=None, data=None):
+        self.signals = [] if signals is None else signals
+        self.clocks = [] if clocks is None else clocks
+        self.data = bytearray() if data is None else data
+
+    def toBytes(self):
+        b = bytearray(_MAGIC)
+        _writeVarint(b, len(self.signals))
+        for name, width, signed in self.signals:
+            _writeStr(b, name)
+            _writeVarint(b, width)
+            b.append(int(bool(signed)))
+
+        _writeVarint(b, len(self.clocks))
+        for sigIndex, period, start, lowTime in self.clocks:
+            _writeVarint(b, sigIndex)
+            for t in (period, start, lowTime):
+                _writeTime(b, t)
+
+        b.extend(self.data)
+        return b
+
+    @classmethod
+    def fromBytes(cls, data):
+        data = memoryview(data)
+        if bytes(data[:len(_MAGIC)]) != _MAGIC:
+            raise SimException("Data are not in format of StimulusTrace")
+        i = len(_MAGIC)
+
+        signals = []
+        n, i = _readVarint(data, i)
+        for _ in range(n):
+            name, i = _readStr(data, i)
+            width, i = _readVarint(data, i)
+            signed = bool(data[i])
+            i += 1
+            signals.append((name, width, signed))
+
+        clocks = []
+        n, i = _readVarint(data, i)
+        for _ in range(n):
+            sigIndex, i = _readVarint(data, i)
+            period, i = _readTime(data, i)
+            start, i = _readTime(data, i)
+            lowTime, i = _readTime(data, i)
+            clocks.append((sigIndex, period, start, lowTime))
+
+        return cls(signals, clocks, bytearray(data[i:]))
+
+    def dump(self, file):
+        """
+        :param file: file opened in binary mode or name of file
+        """
+        if isinstance(file, str):
+            with open(file, "wb") as f:
+                f.write(self.toBytes())
+        else:
+            file.write(self.toBytes())
+
+    @classmethod
+    def load(cls, file):
+        """
+        :param file: file opened in binary mode or name of file
+        """
+        if isinstance(file, str):
+            with open(file, "rb") as f:
+                return cls.fromBytes(f.read())
+        else:
+            return cls.fromBytes(file.read())
+
+    def records(self):
+        """
+        :return: generator of tuples (time, phase, signal index, val, vldMask)
+        """
+        data = self.data
+        signals = self.signals
+        end = len(data)
+        i = 0
+        now = 0
+        while i < end:
+            dt, i = _readTime(data, i)
+            now += dt
+            code, i = _readVarint(data, i)
+            sigIndex = code >> 2
+            val, i = _readVarint(data, i)
+            _, width, signed = signals[sigIndex]
+            if code & 2:
+                vldMask = mask(width)
+            else:
+                vldMask, i = _readVarint(data, i)
+            if signed and val >> (width - 1):
+                val -= 1 << width
+
+            yield (now, code & 1, sigIndex, val, vldMask)
+
+
+class StimulusRecorder(HdlSimConfig):
+    """
+    Simulator config which records all values written by simulation processes
+    (HdlSimulator.write) to StimulusTrace, trace can be replayed
+    by StimulusReplay without any agent
+
+    :ivar config: optional config which is wrapped (e.g. VcdHdlSimConfig),
+        all its hooks are called as well
+    :ivar traceFile: file (or name of file) where trace should be written
+        after simulation or None
+    :ivar trace: recorded StimulusTrace
+    """
+    def __init__(self, config=None, traceFile=None):
+        super(StimulusRecorder, self).__init__()
+        self.config = config
+        self.traceFile = traceFile
+        self.trace = StimulusTrace()
+
+        # {signal: index in trace.signals}
+        self._sigIndex = {}
+        self._sigNames = None
+        self._lastTime = 0
+        # time of last update of registers
+        self._seqTime = None
+
+        self.beforeSim = self._beforeSim
+        self.afterSim = self._afterSim
+        self.logWrite = self._logWrite
+        if config is not None:
+            self.logChange = config.logChange
+            self.logPropagation = config.logPropagation
+            self.logApplyingValues = config.logApplyingValues
+
+    def _beforeSim(self, simulator, synthesisedUnit):
+        self._sigNames = modelSignalNames(synthesisedUnit)
+        applySeq = simulator._applySeq
+
+        def recordedApplySeq():
+            self._seqTime = simulator.now
+            applySeq()
+
+        simulator._applySeq = recordedApplySeq
+
+        c = self.config
+        if c is not None and c.beforeSim is not None:
+            c.beforeSim(simulator, synthesisedUnit)
+
+    def _sigIndexOf(self, sig):
+        try:
+            return self._sigIndex[sig]
+        except KeyError:
+            pass
+
+        t = sig._dtype
+        if not isinstance(t, Bits):
+            raise SimException("Write to %s of type %r can not be recorded,"
+                               " only Bits type is supported" % (sig.name, t))
+        try:
+            name = self._sigNames[sig]
+        except KeyError:
+            raise SimException("%s is not a signal of simulated model" % (sig.name))
+
+        i = self._sigIndex[sig] = len(self.trace.signals)
+        self.trace.signals.append((name, t.bit_length(), bool(t.signed)))
+        return i
+
+    def _logWrite(self, simulator, sig, val):
+        i = self._sigIndexOf(sig)
+        now = simulator.now
+        phase = int(self._seqTime == now)
+        width = self.trace.signals[i][1]
+        m = mask(width)
+        fullVld = val.vldMask == m
+
+        d = self.trace.data
+        _writeTime(d, now - self._lastTime)
+        self._lastTime = now
+        _writeVarint(d, (i << 2) | (fullVld << 1) | phase)
+        _writeVarint(d, val.val & m)
+        if not fullVld:
+            _writeVarint(d, val.vldMask)
+
+        c = self.config
+        if c is not None and c.logWrite:
+            c.logWrite(simulator, sig, val)
+
+    def _afterSim(self, simulator, synthesisedUnit):
+        for c in simulator.clocks:
+            self.trace.clocks.append((self._sigIndexOf(c.sig),
+                                      c.period, c.start, c.lowTime))
+
+        c = self.config
+        if c is not None and c.afterSim is not None:
+            c.afterSim(simulator, synthesisedUnit)
+
+        if self.traceFile is not None:
+            self.trace.dump(self.traceFile)
+
+
+class StimulusReplay(object):
+    """
+    Simulation process which writes values from StimulusTrace to model
+    in the same time (and phase, before or after update of registers)
+    as they were recorded, clocks are restored as well
+
+    Signals are found by name in simulated model (see modelSignalNames),
+    so trace can be replayed on other implementation of the same unit.
+
+    usage: sim.simUnit(model, time, extraProcesses=[StimulusReplay(trace).process])
+
+    :ivar trace: StimulusTrace instance
+    """
+    def __init__(self, trace):
+        if not isinstance(trace, StimulusTrace):
+            trace = StimulusTrace.load(trace)
+        self.trace = trace
+        self._sim = None
+        self._signals = None
+        self._records = None
+        # next record which was not applied yet or None
+        self._next = None
+
+    def _bind(self, model):
+        byName = {n: s for s, n in modelSignalNames(model).items()}
+        signals = []
+        for name, width, _ in self.trace.signals:
+            try:
+                s = byName[name]
+            except KeyError:
+                raise SimException("Signal %s from trace is not in model %s"
+                                   % (name, model._name))
+            if s._dtype.bit_length() != width:
+                raise SimException("Signal %s has width %d but trace contains"
+                                   " values of width %d" % (name, s._dtype.bit_length(), width))
+            signals.append(s)
+        return signals
+
+    def process(self, sim):
+        """
+        Simulation process (function(sim) which returns generator)
+        which starts replay of trace
+        """
+        self._sim = sim
+        self._signals = self._bind(sim.model)
+        for sigIndex, period, start, lowTime in self.trace.clocks:
+            c = sim.addClock(self._signals[sigIndex], period, phase=start - sim.now)
+            # exactly the same times of edges as in record
+            c.lowTime = lowTime
+
+        applySeq = sim._applySeq
+
+        def replayedApplySeq():
+            applySeq()
+            n = self._next
+            if n is not None and n[1] and n[0] == sim.now:
+                self._applyRecords(n[0])
+
+        sim._applySeq = replayedApplySeq
+
+        self._records = self.trace.records()
+        self._planNext()
+        return
+        yield
+
+    def _planNext(self):
+        self._next = n = next(self._records, None)
+        if n is not None and not n[1]:
+            self._sim._schedule(n[0], PRIORITY_NORMAL, self._applyRecords, n[0])
+        # values written after update of registers are applied
+        # from replayedApplySeq
+
+    def _applyRecords(self, time):
+        """
+        Write all values recorded in time which have the same phase
+        """
+        sim = self._sim
+        signals = self._signals
+        n = self._next
+        if n[0] < time:
+            # values which were written after update of registers
+            # in time where there is no update in this simulation
+            self._applyRecords(n[0])
+            n = self._next
+
+        phase = n[1]
+        while n is not None and n[0] == time and n[1] == phase:
+            _, _, sigIndex, val, vldMask = n
+            s = signals[sigIndex]
+            t = s._dtype
+            sim.write(t.getValueCls()(val, t, vldMask, sim.now), s)
+            n = self._next = next(self._records, None)
+
+        if n is not None and not n[1]:
+            sim._schedule(n[0], PRIORITY_NORMAL, self._applyRecords, n[0])
@@ -0,0 +1,52 @@
+from hwt.hdlObjects.constants import INTF_DIRECTION
+
+
+class AgentsDrained(object):
+    """
+    Stop condition for HdlSimulator.stopWhen(), it is satisfied when drivers
+    of all agents do not have anything to send and monitors of all agents
+    did not receive anything for quietCycles clock periods
+
+    :ivar drivers: agents of slave interfaces
+    :ivar monitors: agents of master interfaces
+    :ivar quietCycles: number of clock periods without activity of monitors
+    :ivar period: period of clock, if None period of slowest clock
+        of simulator is used
+    """
+    def __init__(self, agents, quietCycles=10, period=None):
+        self.drivers = []
+        self.monitors = []
+        for a in agents:
+            if a.intf._direction == INTF_DIRECTION.SLAVE:
+                self.drivers.append(a)
+            else:
+                self.monitors.append(a)
+
+        self.quietCycles = quietCycles
+        self.period = period
+
+        self._lastProgress = None
+        # time of last activity of agents
+        self._lastActivity = 0
+
+    def __call__(self, sim):
+        now = sim.now
+        progress = [m.monitorProgress() for m in self.monitors]
+        if progress != self._lastProgress:
+            self._lastProgress = progress
+            self._lastActivity = now
+            return False
+
+        for d in self.drivers:
+            if not d.isDrained():
+                self._lastActivity = now
+                return False
+
+        period = self.period
+        if period is None:
+            if not sim.clocks:
+                raise ValueError("AgentsDrained requires period"
+                                 " if simulator does not have any clock")
+            period = max(map(lambda c: c.period, sim.clocks))
+
+        return now - self._lastActivity >= self.quietCycles * period
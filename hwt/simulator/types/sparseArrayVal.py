@@ -0,0 +1,309 @@
+from array import array
+import sys
+
+from hwt.bitmask import mask
+from hwt.hdlObjects.types.arrayVal import ArrayVal
+from hwt.hdlObjects.types.bits import Bits
+from hwt.hdlObjects.value import Value
+from hwt.synthesizer.param import evalParam
+
+
+# number of items in chunk of SparseArrayItems is 2**CHUNK_BITS
+CHUNK_BITS = 12
+CHUNK_SIZE = 1 << CHUNK_BITS
+CHUNK_MASK = CHUNK_SIZE - 1
+
+# typecodes of array for unsigned words of 1, 2, 4 and 8 bytes
+_wordTypecodes = {}
+for _tc in ("B", "H", "I", "L", "Q"):
+    _wordTypecodes.setdefault(array(_tc).itemsize, _tc)
+
+
+class SparseArrayItems(object):
+    """
+    Lazily allocated container of items of SparseArrayVal,
+    items are stored in chunks of CHUNK_SIZE items, chunk is allocated
+    on first write to any of its items, items which were never written
+    are invalid
+
+    Items of Bits type with width <= 64 are stored packed in array.array
+    (value and validity mask), items of other types are stored as Value
+    instances.
+
+    Chunks are shared between copies of container (copy on write),
+    copy of container is cheap.
+
+    :ivar elmType: type of items
+    :ivar size: number of items
+    :ivar _chunks: dict {index of chunk: chunk}, chunk is tuple (values, vldMasks)
+        for packed items or list of values (None for invalid)
+    :ivar _owned: set of indexes of chunks which are not shared with any copy
+    """
+    __slots__ = ["elmType", "size", "_chunks", "_owned", "_typecode", "_valCls",
+                 "_default"]
+
+    def __init__(self, elmType, size):
+        self.elmType = elmType
+        self.size = size
+        self._chunks = {}
+        self._owned = set()
+        self._valCls = elmType.getValueCls()
+
+        if isinstance(elmType, Bits) and elmType.bit_length() <= 64:
+            self._typecode = "q" if elmType.signed else "Q"
+            self._default = None
+        else:
+            self._typecode = None
+            self._default = elmType.fromPy(None)
+
+    def copy(self):
+        c = SparseArrayItems.__new__(SparseArrayItems)
+        c.elmType = self.elmType
+        c.size = self.size
+        c._chunks = self._chunks.copy()
+        c._owned = set()
+        c._typecode = self._typecode
+        c._valCls = self._valCls
+        c._default = self._default
+        # chunks are shared now
+        self._owned = set()
+        return c
+
+    def _checkIndex(self, index):
+        if index < 0 or index >= self.size:
+            raise IndexError("Index %d out of range of array of size %d" % (index, self.size))
+
+    def _chunkForWrite(self, ci):
+        """
+        :return: chunk which can be modified (allocated or copied if required)
+        """
+        c = self._chunks.get(ci, None)
+        if c is None:
+            if self._typecode is None:
+                c = [None for _ in range(CHUNK_SIZE)]
+            else:
+                zeros = bytes(8 * CHUNK_SIZE)
+                c = (array(self._typecode, zeros), array("Q", zeros))
+            self._chunks[ci] = c
+            self._owned.add(ci)
+        elif ci not in self._owned:
+            if self._typecode is None:
+                c = list(c)
+            else:
+                c = (array(self._typecode, c[0]), array("Q", c[1]))
+            self._chunks[ci] = c
+            self._owned.add(ci)
+
+        return c
+
+    def get(self, index, updateTime=-1):
+        """
+        :return: value of item (new instance for packed items,
+            stored instance otherwise)
+        """
+        self._checkIndex(index)
+        c = self._chunks.get(index >> CHUNK_BITS, None)
+        i = index & CHUNK_MASK
+        if self._typecode is None:
+            if c is None:
+                return self._default
+            v = c[i]
+            if v is None:
+                return self._default
+            return v
+        else:
+            if c is None:
+                return self._valCls(0, self.elmType, 0, updateTime)
+            return self._valCls(c[0][i], self.elmType, c[1][i], updateTime)
+
+    def ref(self, index):
+        """
+        :return: stored instance of item which can be modified
+            (only for items which are not packed, e.g. arrays)
+        """
+        assert self._typecode is None, "Packed items can not be referenced"
+        self._checkIndex(index)
+        c = self._chunkForWrite(index >> CHUNK_BITS)
+        i = index & CHUNK_MASK
+        v = c[i]
+        if v is None:
+            v = c[i] = self._default.clone()
+        return v
+
+    def set(self, index, value):
+        """
+        Store copy of value on index
+        """
+        self._checkIndex(index)
+        c = self._chunkForWrite(index >> CHUNK_BITS)
+        i = index & CHUNK_MASK
+        if self._typecode is None:
+            c[i] = value.clone()
+        else:
+            c[0][i] = value.val
+            c[1][i] = value.vldMask
+
+    def invalidate(self):
+        """
+        Mark all items as invalid (release all chunks)
+        """
+        self._chunks = {}
+        self._owned = set()
+
+    def loadBuffer(self, buff, startIndex=0, byteorder="little"):
+        """
+        Load values of items from buffer of words (each item is stored
+        in ceil(width / 8) bytes), loaded items are valid
+
+        :param buff: bytes-like object
+        :param startIndex: index of item where first word of buffer should be stored
+        :return: number of loaded items
+        """
+        assert self._typecode is not None, "Only Bits items with width <= 64 can be loaded"
+        t = self.elmType
+        width = t.bit_length()
+        wordBytes = (width + 7) // 8
+        buff = memoryview(buff).cast("B")
+        cnt = len(buff) // wordBytes
+        if cnt == 0:
+            return 0
+        self._checkIndex(startIndex)
+        self._checkIndex(startIndex + cnt - 1)
+
+        m = mask(width)
+        signed = bool(t.signed)
+        wordTc = _wordTypecodes.get(wordBytes, None)
+        fullWords = wordBytes * 8 == width
+        index = startIndex
+        end = startIndex + cnt
+        offset = 0
+        while index < end:
+            ci = index >> CHUNK_BITS
+            i = index & CHUNK_MASK
+            n = min(CHUNK_SIZE - i, end - index)
+            vals, vlds = self._chunkForWrite(ci)
+            data = buff[offset:offset + n * wordBytes]
+            if wordTc is not None:
+                words = array(wordTc)
+                words.frombytes(data)
+                if byteorder != sys.byteorder:
+                    words.byteswap()
+            else:
+                words = [int.from_bytes(data[x:x + wordBytes], byteorder)
+                         for x in range(0, len(data), wordBytes)]
+
+            if not fullWords:
+                words = [w & m for w in words]
+            if signed:
+                sign = 1 << (width - 1)
+                words = [w - (sign << 1) if w & sign else w for w in words]
+
+            if not isinstance(words, array) or words.typecode != vals.typecode:
+                words = array(vals.typecode, words)
+            vals[i:i + n] = words
+            vlds[i:i + n] = array("Q", [m]) * n
+
+            index += n
+            offset += n * wordBytes
+
+        return cnt
+
+    def __len__(self):
+        return self.size
+
+    def __getitem__(self, index):
+        return self.get(index)
+
+    def __setitem__(self, index, value):
+        self.set(index, value)
+
+    def __iter__(self):
+        for i in range(self.size):
+            yield self.get(i)
+
+
+class SparseArrayVal(ArrayVal):
+    """
+    Value of Array type for simulation with lazily allocated items
+    (see SparseArrayItems), it is used for large arrays (memories)
+    in simulation models, semantic is the same as for ArrayVal
+
+    Copy of value is cheap, items are copied on write.
+    """
+
+    @classmethod
+    def fromPy(cls, val, typeObj, vldMask=None):
+        """
+        :param val: None (all items invalid), dict {index: value}
+            or iterable of values
+        :param vldMask: validity flag of array (by default valid if val is not None)
+        """
+        size = evalParam(typeObj.size)
+        if isinstance(size, Value):
+            size = size.val
+
+        items = SparseArrayItems(typeObj.elmType, size)
+        if val is not None:
+            if isinstance(val, dict):
+                val = val.items()
+            else:
+                val = enumerate(val)
+
+            elmType = typeObj.elmType
+            for i, v in val:
+                if not isinstance(v, Value):
+                    v = elmType.fromPy(v)
+                items.set(i, v)
+
+        if vldMask is None:
+            vldMask = int(val is not None)
+        return cls(items, typeObj, vldMask)
+
+    @classmethod
+    def fromBuffer(cls, buff, typeObj, byteorder="little"):
+        """
+        Create array value from buffer of words (see SparseArrayItems.loadBuffer),
+        items which are not in buffer are invalid
+        """
+        v = cls.fromPy(None, typeObj, vldMask=1)
+        v.val.loadBuffer(buff, byteorder=byteorder)
+        return v
+
+    @classmethod
+    def fromFile(cls, fileName, typeObj, byteorder="little"):
+        """
+        Create array value from binary file of words
+        """
+        with open(fileName, "rb") as f:
+            return cls.fromBuffer(f.read(), typeObj, byteorder=byteorder)
+
+    def loadBuffer(self, buff, startIndex=0, byteorder="little"):
+        """
+        Load items from buffer of words (see SparseArrayItems.loadBuffer)
+        """
+        return self.val.loadBuffer(buff, startIndex=startIndex, byteorder=byteorder)
+
+    def clone(self):
+        return self.__class__(self.val.copy(), self._dtype, self.vldMask, self.updateTime)
+
+    def _getitem__val(self, key):
+        items = self.val
+        if key._isFullVld():
+            v = items.get(key.val, self.updateTime)
+            if items._typecode is None:
+                v = v.clone()
+        else:
+            v = items.elmType.fromPy(None)
+        return v
+
+    def _getitemRef__val(self, index):
+        return self.val.ref(index.val)
+
+    def _setitem__val(self, index, value):
+        self.updateTime = max(index.updateTime, value.updateTime)
+        if index._isFullVld():
+            self.val.set(index.val, value)
+        else:
+            self.val.invalidate()
+            self.vldMask = 0
+
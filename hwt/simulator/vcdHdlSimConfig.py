@@ -1,21 +1,62 @@
 from datetime import datetime
+from fnmatch import fnmatchcase
 from pprint import pprint
 import sys
 
 from hwt.hdlObjects.types.bits import Bits
 from hwt.hdlObjects.types.boolean import Boolean
 from hwt.simulator.hdlSimConfig import HdlSimConfig
-from hwt.simulator.vcdWritter import VcdWritter
+from hwt.simulator.vcdWritter import BufferedVcdWritter, RingBufferVcdWritter
 from hwt.hdlObjects.types.enum import Enum
+from hwt.simulator.gzipVcdWritter import GzipVcdWritter
+from hwt.synthesizer.interfaceLevel.mainBases import InterfaceBase
 
 
 class VcdHdlSimConfig(HdlSimConfig):
+    """
+    Simulator config which dumps waveform of signals to vcd file
+
+    Signals are selected by hierarchical name "<unit>.<subunit>.<signal>"
+    (names of units are names of their scopes in vcd). Signals which are
+    not selected are marked in beforeSim and simulator does not call
+    logChange for them (if logChange of this config is not wrapped
+    by other config, e.g. ProfilingHdlSimConfig).
+
+    :ivar vcdWritter: writer of vcd (BufferedVcdWritter by default,
+        buffer is flushed in afterSim)
+    :ivar include: None (all signals) or list of glob patterns
+        of hierarchical names of signals which should be dumped
+    :ivar exclude: list of glob patterns of hierarchical names of signals
+        which should not be dumped
+    :ivar maxDepth: None or max depth of unit in hierarchy
+        (top unit has depth 0) whose signals are dumped
+    :ivar portsOnly: if True only ports of units are dumped
+        (all signals for models generated by older serializer)
+    :ivar sampleOn: None or clock signal (hierarchical name, signal
+        or interface), if specified values of dumped signals are written
+        only on rising edge of this clock
+    """
     supported_type_classes = (Boolean, Bits, Enum)
+    _vcdWritterCls = BufferedVcdWritter
 
-    def __init__(self, dumpFile=sys.stdout):
-        self.vcdWritter = VcdWritter(dumpFile)
+    def __init__(self, dumpFile=sys.stdout, include=None, exclude=(),
+                 maxDepth=None, portsOnly=False, sampleOn=None):
+        self.vcdWritter = self._vcdWritterCls(dumpFile)
         self.logPropagation = False
         self.logApplyingValues = False
+        self.logWrite = None
+
+        self.include = include
+        self.exclude = exclude
+        self.maxDepth = maxDepth
+        self.portsOnly = portsOnly
+        self.sampleOn = sampleOn
+        # resolved clock signal for sampleOn
+        self._sampleClk = None
+        # {signal: None} dumped signals changed from last sample
+        self._sampleDirty = {}
+        # {signal: value} last values written for sampled signals
+        self._sampleLast = {}
 
         # unit :  signal | unit
         # signal : None
@@ -29,14 +70,77 @@ class VcdHdlSimConfig(HdlSimConfig):
               % (simulator.now, signal.name, str(process.name))
         )
 
-    def vcdRegisterUnit(self, unit):
+    def isSelected(self, name):
+        """
+        :return: True if signal with hierarchical name should be dumped
+        """
+        if self.include is not None and not any(
+                fnmatchcase(name, p) for p in self.include):
+            return False
+
+        return not any(fnmatchcase(name, p) for p in self.exclude)
+
+    def vcdRegisterUnit(self, unit, prefix="", depth=0):
+        """
+        Register selected signals of unit and its subunits to vcd
+        """
+        prefix = prefix + unit._name + "."
+        if self.portsOnly:
+            signals = getattr(unit, "_ports", unit._cntx.signals)
+        else:
+            signals = unit._cntx.signals
+
+        vcdVars = self.vcdWritter.vars
         with self.vcdWritter.module(unit._name) as m:
-            for se in unit._cntx.signals:
-                if isinstance(se._dtype, self.supported_type_classes):
+            for se in signals:
+                if (isinstance(se._dtype, self.supported_type_classes)
+                        # port of subunit connected directly to port of parent
+                        and se not in vcdVars
+                        and self.isSelected(prefix + se.name)):
                     m.var(se)
 
+            if self.maxDepth is None or depth < self.maxDepth:
+                for u in unit._units:
+                    self.vcdRegisterUnit(u, prefix, depth + 1)
+
+    @staticmethod
+    def _resolveSignal(unit, sig):
+        """
+        :param sig: hierarchical name of signal, signal or interface
+        """
+        if isinstance(sig, InterfaceBase):
+            return sig._sigInside
+        elif not isinstance(sig, str):
+            return sig
+
+        path = sig.split(".")
+        if path[0] != unit._name:
+            raise KeyError("%s is not in unit %s" % (sig, unit._name))
+        for name in path[1:-1]:
             for u in unit._units:
-                self.vcdRegisterUnit(u)
+                if u._name == name:
+                    unit = u
+                    break
+            else:
+                raise KeyError("%s is not in unit %s" % (sig, unit._name))
+
+        return getattr(unit, path[-1])
+
+    def _markSkippedSignals(self, unit, log):
+        """
+        Mark signals whose changes do not have to be logged
+        (simulator will not call logChange for them)
+        """
+        vcdVars = self.vcdWritter.vars
+        clk = self._sampleClk
+        for s in unit._cntx.signals:
+            if s in vcdVars or s is clk:
+                s._logChangeSkip = None
+            else:
+                s._logChangeSkip = log
+
+        for u in unit._units:
+            self._markSkippedSignals(u, log)
 
     def _registerSignal(self, sig):
         self.registered[sig] = None
@@ -51,12 +155,102 @@ class VcdHdlSimConfig(HdlSimConfig):
         self.vcdRegisterUnit(synthesisedUnit)
         self.vcdWritter.enddefinitions()
 
+        if self.sampleOn is None:
+            self._sampleClk = None
+        else:
+            self._sampleClk = self._resolveSignal(synthesisedUnit, self.sampleOn)
+        self._sampleDirty.clear()
+        self._sampleLast.clear()
+
+        config = simulator.config
+        log = config.logChange
+        if config is self and getattr(log, "__func__", None) is type(self).logChange:
+            # logChange is not wrapped, signals which are not dumped can be skipped
+            # (stable instance of bound method is required for this)
+            self.logChange = log
+        else:
+            log = None
+        self._markSkippedSignals(synthesisedUnit, log)
+
+    def afterSim(self, simulator, synthesisedUnit):
+        """
+        This method is called after end of simulation.
+        """
+        self._markSkippedSignals(synthesisedUnit, None)
+        self.vcdWritter.flush()
+
     def logChange(self, nowTime, sig, nextVal):
         """
         This method is called for every value change of any signal.
         """
+        clk = self._sampleClk
+        if clk is not None:
+            if sig is clk:
+                if nextVal.val and nextVal.vldMask:
+                    # rising edge, write actual values of changed signals
+                    change = self.vcdWritter.change
+                    dirty = self._sampleDirty
+                    last = self._sampleLast
+                    for s in dirty:
+                        v = s._val
+                        lv = last.get(s, None)
+                        if lv is None or lv.val != v.val or lv.vldMask != v.vldMask:
+                            change(nowTime, s, v)
+                            last[s] = v
+                    dirty.clear()
+            elif sig in self.vcdWritter.vars:
+                self._sampleDirty[sig] = None
+                return
+
         try:
             self.vcdWritter.change(nowTime, sig, nextVal)
         except KeyError:
             # not every signal has to be registered
             pass
+
+
+class RingBufferVcdHdlSimConfig(VcdHdlSimConfig):
+    """
+    VcdHdlSimConfig which keeps only last ringTime of waveform in memory
+    (RingBufferVcdWritter), vcd is written only if dump() is called
+    (e.g. SimTestCase does it only if test fails)
+    """
+    def __init__(self, ringTime=None, **selection):
+        """
+        :param selection: signal selection options of VcdHdlSimConfig
+        """
+        super(RingBufferVcdHdlSimConfig, self).__init__(None, **selection)
+        self.vcdWritter = RingBufferVcdWritter(ringTime)
+
+    def dump(self, dumpFile):
+        """
+        Write kept part of waveform to dumpFile (file or name of file)
+        """
+        if isinstance(dumpFile, str):
+            with open(dumpFile, "w") as f:
+                self.vcdWritter.dump(f)
+        else:
+            self.vcdWritter.dump(dumpFile)
+
+
+class GzipVcdHdlSimConfig(VcdHdlSimConfig):
+    """
+    VcdHdlSimConfig which writes gzip compressed vcd with time index
+    (GzipVcdWritter), compression runs in background thread
+    """
+    def __init__(self, fileName, frameSize=1 << 16, queueSize=16,
+                 compressLevel=6, **selection):
+        """
+        :param frameSize: number of value changes in compressed frame
+            (time index contains start of every frame)
+        :param queueSize: max number of frames waiting for compression
+        :param selection: signal selection options of VcdHdlSimConfig
+        """
+        super(GzipVcdHdlSimConfig, self).__init__(None, **selection)
+        self.vcdWritter = GzipVcdWritter(fileName, frameSize=frameSize,
+                                         queueSize=queueSize,
+                                         compressLevel=compressLevel)
+
+    def afterSim(self, simulator, synthesisedUnit):
+        super(GzipVcdHdlSimConfig, self).afterSim(simulator, synthesisedUnit)
+        self.vcdWritter.close()
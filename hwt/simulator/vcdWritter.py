@@ -1,7 +1,10 @@
 
+from array import array
 from functools import wraps
+from io import StringIO
 import sys
 
+from hwt.bitmask import mask
 from hwt.hdlObjects.types.defs import BIT
 from hwt.hdlObjects.types.enum import Enum
 from hwt.serializer.vhdl.serializer import VhdlSerializer
@@ -106,6 +109,12 @@ class VcdWritter():
         self.lastTime = -1
         self.defaultTop = None
 
+    def flush(self):
+        """
+        Write all buffered data to dumpFile
+        """
+        pass
+
     @dumpMethod
     def date(self, text):
         return "$date\n   %s\n$end" % text
@@ -156,3 +165,258 @@ class VcdWritter():
                 frmt = "b%s %s"
 
         return frmt % (val, varInfo.id)
+
+
+class BufferedVcdWritter(VcdWritter):
+    """
+    VcdWritter which collects value change lines in buffer
+    and writes them to dumpFile in large blocks
+
+    Formatter function for every variable is prepared in enddefinitions
+    (from VcdVarInfo.width and type) and time lines are written directly
+    in change() only if time has changed.
+
+    :attention: buffer has to be flushed (flush()) at the end of dumping,
+        VcdHdlSimConfig does it in afterSim
+    :ivar bufferSize: number of lines collected before write to dumpFile
+    """
+    def __init__(self, dumpFile=sys.stdout, bufferSize=1 << 14):
+        super(BufferedVcdWritter, self).__init__(dumpFile)
+        self.bufferSize = bufferSize
+        self._buff = []
+        # {signal: function(val, vldMask) -> line}
+        self._formatters = {}
+
+    @staticmethod
+    def _mkFormatter(varInfo):
+        """
+        :return: function(val, vldMask) -> value change line for variable
+        """
+        _id = varInfo.id
+        t = varInfo._dtype
+        if isinstance(t, Enum):
+            suffix = " " + _id
+            invalid = "sXXXX" + suffix
+
+            def formatEnum(val, vldMask):
+                if vldMask:
+                    return "s%s%s" % (val, suffix)
+                return invalid
+
+            return formatEnum
+
+        width = varInfo.width
+        if t == BIT:
+            lines = ("0" + _id, "1" + _id)
+            invalid = "X" + _id
+
+            def formatBit(val, vldMask):
+                if vldMask:
+                    return lines[val & 1]
+                return invalid
+
+            return formatBit
+
+        m = mask(width)
+        suffix = " " + _id
+        binFrmt = "0%db" % width
+        invalid = "b" + "X" * width + suffix
+
+        def formatBits(val, vldMask):
+            vld = vldMask & m
+            if vld == m:
+                return "b" + format(val & m, binFrmt) + suffix
+            elif not vld:
+                return invalid
+
+            vld = format(vld, binFrmt)
+            bits = format(val & m, binFrmt)
+            return "b" + "".join([b if mb == "1" else "X"
+                                  for b, mb in zip(bits, vld)]) + suffix
+
+        return formatBits
+
+    def enddefinitions(self):
+        formatters = self._formatters
+        for sig, varInfo in self.vars.items():
+            formatters[sig] = self._mkFormatter(varInfo)
+
+        super(BufferedVcdWritter, self).enddefinitions()
+
+    def setTime(self, t):
+        lt = self.lastTime
+        if lt == t:
+            return
+        elif lt < t:
+            self.lastTime = t
+            self._buff.append("#%d" % (t))
+        else:
+            raise Exception("VcdWritter invalid time update %d -> %d" % (lt, t))
+
+    def change(self, time, sig, newVal):
+        # raises KeyError for signal which is not registered
+        line = self._formatters[sig](newVal.val, newVal.vldMask)
+
+        buff = self._buff
+        if time != self.lastTime:
+            self.setTime(time)
+        buff.append(line)
+
+        if len(buff) >= self.bufferSize:
+            self.flush()
+
+    def flush(self):
+        buff = self._buff
+        if buff:
+            buff.append("")
+            self.dumpFile.write("\n".join(buff))
+            buff.clear()
+
+
+class RingBufferVcdWritter(BufferedVcdWritter):
+    """
+    VcdWritter which keeps value changes from last ringTime of simulation
+    in memory (parallel arrays of time, variable index, val, vldMask),
+    vcd is written only if dump() is called
+
+    Values of variables up to 64 bits are stored directly in arrays
+    (masked to width of variable), values of wider and enum variables
+    are stored in list and arrays contain only index of item in it.
+
+    Changes which are older than ringTime are folded to state at start
+    of the window, this state is written as $dumpvars section.
+
+    :ivar ringTime: length of kept window of simulation time
+        (None for whole simulation)
+    :ivar windowStart: time of start of kept window
+    """
+    def __init__(self, ringTime=None):
+        # header is small and it is kept as text
+        super(RingBufferVcdWritter, self).__init__(StringIO())
+        self.ringTime = ringTime
+        self.windowStart = 0
+        # {signal: index of variable}
+        self._varIndex = {}
+        # [function(val, vldMask) -> line]
+        self._varFormatters = []
+        # [mask of variable or None if values of variable are stored in _wideVals]
+        self._varMasks = []
+        # [(val, vldMask) or None] state in windowStart
+        self._initState = []
+        # time can be float (e.g. Time.ns), it is exact up to 2**53
+        self._times = array("d")
+        self._ids = array("I")
+        self._vals = array("Q")
+        self._vlds = array("Q")
+        # [(val, vldMask)] of wide variables, item i of list has index
+        # _wideBase + i in _vals
+        self._wideVals = []
+        self._wideBase = 0
+        # index of first valid item in arrays above
+        self._first = 0
+
+    def enddefinitions(self):
+        super(RingBufferVcdWritter, self).enddefinitions()
+        for i, (sig, f) in enumerate(self._formatters.items()):
+            self._varIndex[sig] = i
+            self._varFormatters.append(f)
+            varInfo = self.vars[sig]
+            if isinstance(varInfo._dtype, Enum) or varInfo.width > 64:
+                m = None
+            else:
+                m = mask(varInfo.width)
+            self._varMasks.append(m)
+        self._initState = [None for _ in self._varFormatters]
+
+    def change(self, time, sig, newVal):
+        # raises KeyError for signal which is not registered
+        i = self._varIndex[sig]
+        times = self._times
+        times.append(time)
+        self._ids.append(i)
+        m = self._varMasks[i]
+        if m is None:
+            wideVals = self._wideVals
+            self._vals.append(self._wideBase + len(wideVals))
+            self._vlds.append(0)
+            wideVals.append((newVal.val, newVal.vldMask))
+        else:
+            self._vals.append(newVal.val & m)
+            self._vlds.append(newVal.vldMask & m)
+
+        ringTime = self.ringTime
+        if ringTime is not None:
+            start = time - ringTime
+            if times[self._first] < start:
+                self._shiftWindow(start)
+
+    def _item(self, j):
+        """
+        :return: tuple (val, vldMask) of change j
+        """
+        val = self._vals[j]
+        if self._varMasks[self._ids[j]] is None:
+            return self._wideVals[val - self._wideBase]
+        return (val, self._vlds[j])
+
+    def _shiftWindow(self, start):
+        """
+        Fold changes before start to state of start of window
+        """
+        times = self._times
+        ids = self._ids
+        varMasks = self._varMasks
+        state = self._initState
+        # index of first wide value which is still required
+        wideCut = None
+        j = self._first
+        while times[j] < start:
+            i = ids[j]
+            state[i] = self._item(j)
+            if varMasks[i] is None:
+                wideCut = self._vals[j] + 1
+            j += 1
+
+        self.windowStart = start
+        if j > 1024 and j * 2 > len(times):
+            for a in (times, ids, self._vals, self._vlds):
+                del a[:j]
+            j = 0
+
+        if wideCut is not None:
+            del self._wideVals[:wideCut - self._wideBase]
+            self._wideBase = wideCut
+
+        self._first = j
+
+    def flush(self):
+        pass
+
+    def dump(self, dumpFile):
+        """
+        Write vcd with kept window of simulation to dumpFile
+        """
+        dumpFile.write(self.dumpFile.getvalue())
+        formatters = self._varFormatters
+        buff = []
+        lastTime = None
+        if any(v is not None for v in self._initState):
+            lastTime = self.windowStart
+            buff.append("#%d" % lastTime)
+            buff.append("$dumpvars")
+            for f, v in zip(formatters, self._initState):
+                if v is not None:
+                    buff.append(f(*v))
+            buff.append("$end")
+
+        times = self._times
+        ids = self._ids
+        for j in range(self._first, len(times)):
+            t = times[j]
+            if t != lastTime:
+                lastTime = t
+                buff.append("#%d" % t)
+            buff.append(formatters[ids[j]](*self._item(j)))
+
+        buff.append("")
+        dumpFile.write("\n".join(buff))
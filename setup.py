@@ -11,9 +11,12 @@ setup(name='hwt',
       author='Michal Orsak',
       author_email='michal.o.socials@gmail.com',
       install_requires=[
-        'simpy',  # discrete simulator 
         'jinja2',  # hdl templates renderer
       ],
+      extras_require={
+        'lanes': ['numpy'],  # vectorized multi-lane simulation
+        'bulk': ['numpy'],  # numpy stimulus/capture of agents (npAgentQueue)
+      },
       license='MIT',
       packages=find_packages(),
       package_data={'hwt': ['*.vhd', '*.v']},
@@ -0,0 +1,51 @@
+import copy
+import unittest
+
+from hwt.simulator.agentQueue import AgentQueue, LazyAgentQueue, toAgentQueue
+
+
+class AgentQueueTC(unittest.TestCase):
+    def test_listCompatibility(self):
+        q = toAgentQueue([1, 2, 3])
+        self.assertIsInstance(q, AgentQueue)
+        self.assertEqual(q, [1, 2, 3])
+        self.assertEqual(q[1:], [2, 3])
+        self.assertEqual(q.pop(0), 1)
+        self.assertEqual(q.pop(), 3)
+        self.assertEqual(q, [2])
+
+    def test_lazy(self):
+        q = toAgentQueue(i for i in range(3))
+        self.assertIsInstance(q, LazyAgentQueue)
+        self.assertTrue(q)
+        self.assertEqual(q.popleft(), 0)
+        self.assertEqual(list(q), [1, 2])
+
+    def test_lazyCopy(self):
+        q = toAgentQueue(iter(range(10)))
+        self.assertEqual(q.popleft(), 0)
+        # one item is buffered, rest is in source
+        self.assertTrue(q)
+
+        for c in (q.copy(), copy.copy(q)):
+            self.assertIsInstance(c, LazyAgentQueue)
+            self.assertEqual(c.popleft(), 1)
+            self.assertEqual(c.popleft(), 2)
+
+        self.assertEqual(q.popleft(), 1)
+        c = q.copy()
+        self.assertEqual([q.popleft() for _ in range(3)], [2, 3, 4])
+        self.assertEqual(list(c), list(range(2, 10)))
+        self.assertEqual(list(q), list(range(5, 10)))
+
+    def test_exhaustedLazyCopy(self):
+        q = toAgentQueue(iter([1]))
+        self.assertEqual(len(q), 1)
+        c = q.copy()
+        self.assertEqual(q.popleft(), 1)
+        self.assertEqual(list(c), [1])
+        self.assertFalse(q)
+
+
+if __name__ == "__main__":
+    unittest.main()
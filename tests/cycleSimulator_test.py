@@ -0,0 +1,111 @@
+import unittest
+
+from hwt.code import If
+from hwt.hdlObjects.constants import Time
+from hwt.interfaces.std import Handshaked
+from hwt.interfaces.utils import addClkRstn, propagateClkRstn
+from hwt.serializer.simModel.directSerializer import SimModelDirectSerializer, \
+    SimModelIntDirectSerializer
+from hwt.serializer.simModel.intSerializer import SimModelIntSerializer
+from hwt.serializer.simModel.serializer import SimModelSerializer
+from hwt.simulator.agentConnector import agInts
+from hwt.simulator.cycleSimulator import HdlCycleSimulator
+from hwt.simulator.exceptions import SimNotSupportedErr
+from hwt.simulator.hdlSimulator import HdlSimulator
+from hwt.simulator.shortcuts import simPrepare
+from hwt.synthesizer.interfaceLevel.unit import Unit
+
+
+class HandshakedReg(Unit):
+    def _declr(self):
+        addClkRstn(self)
+        self.dataIn = Handshaked()
+        self.dataOut = Handshaked()
+
+    def _impl(self):
+        isOccupied = self._reg("isOccupied", defVal=0)
+        r = self._reg("r", self.dataIn.data._dtype)
+        dIn = self.dataIn
+        dOut = self.dataOut
+
+        dOut.data ** r
+        dOut.vld ** isOccupied
+        dIn.rd ** ~isOccupied
+
+        If(~isOccupied & dIn.vld,
+           r ** dIn.data,
+           isOccupied ** 1
+        ).Elif(dOut.rd,
+           isOccupied ** 0
+        )
+
+
+class HandshakedRegChain(Unit):
+    """
+    Two HandshakedReg instances, clk of subunits is connected
+    by assignment from clk of this unit
+    """
+    def _declr(self):
+        addClkRstn(self)
+        self.dataIn = Handshaked()
+        self.dataOut = Handshaked()
+        self.a = HandshakedReg()
+        self.b = HandshakedReg()
+
+    def _impl(self):
+        propagateClkRstn(self)
+        self.a.dataIn ** self.dataIn
+        self.b.dataIn ** self.a.dataOut
+        self.dataOut ** self.b.dataOut
+
+
+class InvertedClkReg(Unit):
+    """
+    Register in subunit is clocked by inverted clk
+    """
+    def _declr(self):
+        addClkRstn(self)
+        self.dataIn = Handshaked()
+        self.dataOut = Handshaked()
+        self.a = HandshakedReg()
+        self.b = HandshakedReg()
+
+    def _impl(self):
+        self.a.clk ** self.clk
+        self.a.rst_n ** self.rst_n
+        self.b.clk ** ~self.clk
+        self.b.rst_n ** self.rst_n
+        self.a.dataIn ** self.dataIn
+        self.b.dataIn ** self.a.dataOut
+        self.dataOut ** self.b.dataOut
+
+
+class HdlCycleSimulatorTC(unittest.TestCase):
+    def runSim(self, simCls, serializer):
+        u, model, procs = simPrepare(HandshakedRegChain(),
+                                     serializer=serializer)
+        u.dataIn._ag.data = list(range(50))
+        sim = simCls()
+        sim.simUnit(model, 2000 * Time.ns, extraProcesses=procs)
+        return sim, agInts(u.dataOut)
+
+    def test_hierarchicalSingleClk(self):
+        for ser in [SimModelSerializer, SimModelIntSerializer,
+                    SimModelDirectSerializer, SimModelIntDirectSerializer]:
+            _, ref = self.runSim(HdlSimulator, ser)
+            self.assertEqual(ref, list(range(50)), ser)
+
+            sim, res = self.runSim(HdlCycleSimulator, ser)
+            self.assertEqual(res, ref, ser)
+            self.assertEqual(sim.clk.name, "clk")
+            self.assertEqual(len(sim.clkAliases), 3)
+
+    def test_invertedClkIsNotAlias(self):
+        u, model, procs = simPrepare(InvertedClkReg())
+        sim = HdlCycleSimulator()
+        with self.assertRaises(SimNotSupportedErr):
+            sim.simUnit(model, 100 * Time.ns, extraProcesses=procs)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,87 @@
+import unittest
+
+from hwt.code import If
+from hwt.hdlObjects.constants import Time
+from hwt.interfaces.std import Handshaked
+from hwt.interfaces.utils import addClkRstn
+from hwt.simulator.agentConnector import collectAgents, agInts
+from hwt.simulator.hdlSimulator import HdlSimulator
+from hwt.simulator.shortcuts import simPrepare
+from hwt.synthesizer.interfaceLevel.unit import Unit
+
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+class HandshakedReg(Unit):
+    def _declr(self):
+        addClkRstn(self)
+        self.dataIn = Handshaked()
+        self.dataOut = Handshaked()
+
+    def _impl(self):
+        isOccupied = self._reg("isOccupied", defVal=0)
+        r = self._reg("r", self.dataIn.data._dtype)
+        dIn = self.dataIn
+        dOut = self.dataOut
+
+        dOut.data ** r
+        dOut.vld ** isOccupied
+        dIn.rd ** ~isOccupied
+
+        If(~isOccupied & dIn.vld,
+           r ** dIn.data,
+           isOccupied ** 1
+        ).Elif(dOut.rd,
+           isOccupied ** 0
+        )
+
+
+class SimCheckpointTC(unittest.TestCase):
+    def test_restoreAgentFedByGenerator(self):
+        u, model, procs = simPrepare(HandshakedReg())
+        u.dataIn._ag.data = (i for i in range(20))
+
+        sim = HdlSimulator()
+        sim.simUnit(model, 100 * Time.ns, extraProcesses=procs)
+        progress = len(agInts(u.dataOut))
+        self.assertGreater(progress, 0)
+        cp = sim.checkpoint(collectAgents(u))
+
+        sim.run(until=sim.now + 1000 * Time.ns)
+        first = agInts(u.dataOut)
+        self.assertEqual(first, list(range(20)))
+
+        sim.restore(cp)
+        self.assertEqual(len(agInts(u.dataOut)), progress)
+        sim.run(until=sim.now + 1000 * Time.ns)
+        self.assertEqual(agInts(u.dataOut), first)
+
+    @unittest.skipIf(numpy is None, "numpy is not installed")
+    def test_restoreNpCaptureBuffer(self):
+        from hwt.simulator.npAgentQueue import NpCaptureBuffer, npStimulus
+
+        u, model, procs = simPrepare(HandshakedReg())
+        u.dataIn._ag.data = npStimulus(numpy.arange(20))
+        u.dataOut._ag.data = NpCaptureBuffer()
+
+        sim = HdlSimulator()
+        sim.simUnit(model, 100 * Time.ns, extraProcesses=procs)
+        progress = agInts(u.dataOut)
+        cp = sim.checkpoint(collectAgents(u))
+
+        sim.run(until=sim.now + 1000 * Time.ns)
+        self.assertEqual(agInts(u.dataOut), list(range(20)))
+
+        sim.restore(cp)
+        self.assertIsInstance(u.dataOut._ag.data, NpCaptureBuffer)
+        self.assertEqual(agInts(u.dataOut), progress)
+        sim.run(until=sim.now + 1000 * Time.ns)
+        self.assertEqual(agInts(u.dataOut), list(range(20)))
+
+
+if __name__ == "__main__":
+    unittest.main()